@@ -2,8 +2,10 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import (
     User, Activity, ActivitySignup, QRScan, IdeaProposal, IdeaVote,
-    Group, GroupMembership, GroupPost, Role, Notification, NotificationPreference
+    Group, GroupMembership, GroupPost, Role, Notification, NotificationPreference,
+    UserHoursSummary, DailyActivityStat, EmailOutbox,
 )
+from .services.finalize_service import finalize_activities
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -14,9 +16,20 @@ class UserAdmin(BaseUserAdmin):
 
 @admin.register(Activity)
 class ActivityAdmin(admin.ModelAdmin):
-    list_display = ("title", "category", "datetime", "location", "capacity", "hours_reward", "spots_taken", "is_full")
-    readonly_fields = ("created_at",)
+    list_display = ("title", "category", "datetime", "location", "capacity", "hours_reward", "spots_taken", "is_full", "waitlist_count")
+    readonly_fields = ("created_at", "requested_count", "confirmed_count", "attended_count", "waitlist_count")
     search_fields = ("title", "description")
+    actions = ["finalize_selected"]
+
+    @admin.action(description="ปิดกิจกรรม: check-out อัตโนมัติและสรุปผลการเข้าร่วม")
+    def finalize_selected(self, request, queryset):
+        report = finalize_activities(queryset.values_list("pk", flat=True))
+        checked_out = sum(counts["checked_out"] for counts in report.values())
+        no_show = sum(counts["no_show"] for counts in report.values())
+        self.message_user(
+            request,
+            f"ปิดกิจกรรมแล้ว {len(report)} กิจกรรม (check-out อัตโนมัติ {checked_out} คน, ไม่มาเข้าร่วม {no_show} คน)",
+        )
 
 @admin.register(ActivitySignup)
 class ActivitySignupAdmin(admin.ModelAdmin):
@@ -65,4 +78,27 @@ class NotificationAdmin(admin.ModelAdmin):
 
 @admin.register(NotificationPreference)
 class NotificationPreferenceAdmin(admin.ModelAdmin):
-    list_display = ("user", "in_app_enabled", "email_enabled", "idea_updates", "activity_reminders", "hours_updates")
\ No newline at end of file
+    list_display = ("user", "in_app_enabled", "email_enabled", "email_digest", "idea_updates", "activity_reminders", "hours_updates")
+    list_filter = ("email_digest",)
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ("to_email", "subject", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("to_email", "subject")
+    readonly_fields = ("created_at", "sent_at", "last_error")
+
+
+@admin.register(UserHoursSummary)
+class UserHoursSummaryAdmin(admin.ModelAdmin):
+    list_display = ("user", "qr_hours", "checkout_hours", "total_hours", "updated_at")
+    search_fields = ("user__username", "user__student_id")
+    readonly_fields = ("qr_hours", "checkout_hours", "total_hours", "updated_at")
+
+
+@admin.register(DailyActivityStat)
+class DailyActivityStatAdmin(admin.ModelAdmin):
+    list_display = ("day", "activity", "faculty", "scan_count", "checkin_count", "checkout_count", "hours_earned")
+    list_filter = ("day", "faculty")
+    date_hierarchy = "day"
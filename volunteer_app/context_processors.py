@@ -1,13 +1,15 @@
 from django.utils import timezone
 
+from .services import unread_counter
+
 def unread_notifications(request):
     """Context processor that adds unread notifications count for the current user."""
     count = 0
     user = getattr(request, 'user', None)
     try:
         if user and user.is_authenticated:
-            # assume related manager `notifications` exists on user
-            count = user.notifications.filter(is_read=False).count()
+            # cached; see services/unread_counter.py
+            count = unread_counter.get(user)
     except Exception:
         # be defensive: if notifications relation isn't present, return 0
         count = 0
@@ -0,0 +1,59 @@
+import io
+import time
+
+import qrcode
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from volunteer_app.tokens import KIND_CHECKIN, encode_token
+from volunteer_app.utils import read_qr_code_from_image
+
+
+class Command(BaseCommand):
+    help = "Compare v1 and v2 token QR codes: modules, render time and decode rate at small sizes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--samples", type=int, default=20)
+        parser.add_argument("--base-url", default="https://volunteer.example.ac.th")
+        parser.add_argument(
+            "--size",
+            type=int,
+            action="append",
+            dest="sizes",
+            help="Width in pixels to shrink each code to before decoding (can be repeated)",
+        )
+
+    def _data(self, version, base_url, i):
+        token = encode_token(KIND_CHECKIN, 1000 + i, 1_900_000_000 + i, version=version)
+        if version == 2:
+            return f"{base_url}/t/{token}/"
+        return f"{base_url}/check-in/?token={token}"
+
+    def handle(self, *args, **options):
+        samples = options["samples"]
+        sizes = options["sizes"] or [100, 150, 200]
+        self.stdout.write(f"{'format':<8}{'modules':>9}{'render ms':>11}" + "".join(f"{f'ok@{s}px':>10}" for s in sizes))
+
+        for version in (1, 2):
+            modules = 0
+            render_seconds = 0.0
+            decoded = {size: 0 for size in sizes}
+            for i in range(samples):
+                data = self._data(version, options["base_url"], i)
+                start = time.perf_counter()
+                qr = qrcode.QRCode(border=4)
+                qr.add_data(data)
+                qr.make(fit=True)
+                image = qr.make_image().get_image().convert("L")
+                render_seconds += time.perf_counter() - start
+                modules = max(modules, qr.modules_count)
+
+                for size in sizes:
+                    buffer = io.BytesIO()
+                    image.resize((size, size), Image.BILINEAR).save(buffer, format="PNG")
+                    ok, text, _ = read_qr_code_from_image(buffer.getvalue())
+                    decoded[size] += int(ok and text == data)
+
+            line = f"{f'v{version}':<8}{modules:>9}{render_seconds / samples * 1000:>11.2f}"
+            line += "".join(f"{decoded[size] / samples:>10.0%}" for size in sizes)
+            self.stdout.write(line)
@@ -0,0 +1,66 @@
+import base64
+import hashlib
+import hmac
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from volunteer_app.tokens import KIND_CHECKOUT, decode_token, encode_token
+
+
+def _legacy_verify(token: str, prefix: str):
+    """Copy of the verify_*_token functions before the shared codec (key re-derived on every call)."""
+    try:
+        raw = base64.urlsafe_b64decode(token.encode()).decode()
+        parts = raw.split(":")
+        if prefix:
+            if len(parts) != 4 or parts[0] != prefix:
+                return False, None
+            parts = parts[1:]
+        elif len(parts) != 3:
+            return False, None
+        activity_id, ts, sig = int(parts[0]), int(parts[1]), parts[2]
+        if ts < int(time.time()):
+            return False, None
+        payload = f"{prefix}:{activity_id}:{ts}" if prefix else f"{activity_id}:{ts}"
+        expected = hmac.new(settings.QR_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
+        return (True, activity_id) if hmac.compare_digest(expected, sig) else (False, None)
+    except Exception:
+        return False, None
+
+
+class Command(BaseCommand):
+    help = "Measure single-core token verify throughput (shared decode vs. the old verifier chain)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20000)
+
+    def _rate(self, func, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - start
+        return iterations / elapsed if elapsed else float("inf")
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        expires_at = int(time.time()) + 3600
+        # the old verifiers only read v1, so both sides get the same v1 token
+        token = encode_token(KIND_CHECKOUT, 1, expires_at, version=1)
+        compact = encode_token(KIND_CHECKOUT, 1, expires_at, version=2)
+
+        def legacy_chain():
+            # what qr_upload used to do for a check-out token
+            for prefix in ("", "CHECKIN", "CHECKOUT", "CHECKIN", "CHECKOUT"):
+                _legacy_verify(token, prefix)
+
+        rows = [
+            ("encode_token", self._rate(lambda: encode_token(KIND_CHECKOUT, 1, expires_at), iterations)),
+            ("decode_token v1", self._rate(lambda: decode_token(token), iterations)),
+            ("decode_token v2", self._rate(lambda: decode_token(compact), iterations)),
+            ("old verify_checkout_token", self._rate(lambda: _legacy_verify(token, "CHECKOUT"), iterations)),
+            ("old verifier chain (5)", self._rate(legacy_chain, iterations)),
+        ]
+        for name, rate in rows:
+            self.stdout.write(f"{name:<26} {rate:>12,.0f} ops/s")
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from volunteer_app.services.email_outbox import deliver_pending
+
+
+class Command(BaseCommand):
+    help = "Send queued EmailOutbox messages in batches over one SMTP connection per batch"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Messages per connection (default 100)")
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running as a worker, polling for new mail every --interval seconds",
+        )
+        parser.add_argument("--interval", type=float, default=10, help="Seconds between polls with --loop")
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = deliver_pending(batch_size=options["batch_size"])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f"Sent {sent}, failed {failed}")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Delivered {total_sent} emails ({total_failed} failed attempts)"))
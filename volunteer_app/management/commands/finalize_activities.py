@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from volunteer_app.models import Activity
+from volunteer_app.services.finalize_service import activity_end, finalize_activities
+
+
+class Command(BaseCommand):
+    help = "Auto check-out open check-ins, finalize signup statuses and mark activities completed"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "activity_ids",
+            nargs="*",
+            type=int,
+            help="Activities to finalize (default: every activity that has ended and is not completed/cancelled)",
+        )
+
+    def handle(self, *args, **options):
+        activity_ids = options["activity_ids"]
+        if not activity_ids:
+            now = timezone.now()
+            activity_ids = [
+                activity.pk
+                for activity in Activity.objects.filter(datetime__lte=now)
+                .exclude(status__in=("completed", "cancelled"))
+                .only("pk", "datetime", "hours_reward")
+                if activity_end(activity) <= now
+            ]
+        report = finalize_activities(activity_ids)
+        for activity_id, counts in report.items():
+            self.stdout.write(
+                f"Activity {activity_id}: checked out {counts['checked_out']}, "
+                f"attended {counts['attended']}, no-show {counts['no_show']}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Finalized {len(report)} activities"))
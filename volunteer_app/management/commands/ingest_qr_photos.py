@@ -0,0 +1,48 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from volunteer_app.services.batch_ingest import MAX_BATCH_BYTES, MAX_BATCH_IMAGES, BatchTooLarge, ingest_qr_images
+
+
+class Command(BaseCommand):
+    help = "Record attendance from QR photos named <student_id|username>.<ext> (files, folders or zip archives)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Image files, zip archives or folders")
+        parser.add_argument(
+            "--allow-expired",
+            action="store_true",
+            help="Accept correctly signed tokens past their expiry (photos processed after the event)",
+        )
+
+    def _collect(self, paths):
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, names in os.walk(path):
+                    for name in sorted(names):
+                        yield os.path.join(root, name)
+            elif os.path.isfile(path):
+                yield path
+            else:
+                raise CommandError(f"No such file or folder: {path}")
+
+    def handle(self, *args, **options):
+        files = []
+        for path in self._collect(options["paths"]):
+            with open(path, "rb") as fh:
+                files.append((path, fh.read()))
+
+        try:
+            reports = ingest_qr_images(files, allow_expired=options["allow_expired"])
+        except BatchTooLarge:
+            raise CommandError(
+                f"Batch too large: at most {MAX_BATCH_IMAGES} images and {MAX_BATCH_BYTES // (1024 * 1024)} MB per run"
+            )
+        for report in reports:
+            line = f"{report['file']}: {report['code']}"
+            if report.get("message"):
+                line += f" ({report['message']})"
+            self.stdout.write(line if report["ok"] else self.style.WARNING(line))
+        recorded = sum(1 for r in reports if r["code"] == "recorded")
+        self.stdout.write(self.style.SUCCESS(f"Recorded {recorded} of {len(reports)} images"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from volunteer_app.models import UserHoursSummary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user volunteer hours ledger (UserHoursSummary) from QRScan and CheckInOut rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Only rebuild the given user id (can be repeated)",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        written = UserHoursSummary.rebuild(
+            user_ids=options["user_ids"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt hours summary for {written} users"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from volunteer_app.services.signup_service import recount_activity_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute Activity signup counters (requested/confirmed/attended/waitlist) from ActivitySignup rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--activity",
+            type=int,
+            action="append",
+            dest="activity_ids",
+            help="Only repair the given activity id (can be repeated)",
+        )
+
+    def handle(self, *args, **options):
+        updated = recount_activity_counters(options["activity_ids"])
+        self.stdout.write(self.style.SUCCESS(f"Recounted signups for {updated} activities"))
@@ -0,0 +1,38 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from volunteer_app.services.reporting_service import (
+    DEFAULT_CHUNK_DAYS, first_event_day, pending_days, rollup_days,
+)
+
+
+class Command(BaseCommand):
+    help = "Roll up QRScan/CheckInOut rows into DailyActivityStat (only new days unless --backfill/--since)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backfill", action="store_true", help="Rebuild every day since the first recorded scan")
+        parser.add_argument("--since", help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument("--until", help="Last day to rebuild (YYYY-MM-DD), defaults to yesterday")
+        parser.add_argument("--chunk-days", type=int, default=DEFAULT_CHUNK_DAYS)
+
+    def handle(self, *args, **options):
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        try:
+            since = datetime.date.fromisoformat(options["since"]) if options["since"] else None
+            until = datetime.date.fromisoformat(options["until"]) if options["until"] else yesterday
+        except ValueError as exc:
+            raise CommandError(f"Invalid date: {exc}")
+
+        if options["backfill"]:
+            since = first_event_day()
+        elif since is None:
+            window = pending_days()
+            since = window[0] if window else None
+        if since is None or since > until:
+            self.stdout.write("Nothing to roll up")
+            return
+
+        written = rollup_days(since, until, chunk_days=options["chunk_days"])
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {since}..{until}: {written} rows"))
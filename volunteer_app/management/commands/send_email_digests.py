@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from volunteer_app.services.email_digest import FREQUENCY_PREFS, send_digests
+
+
+class Command(BaseCommand):
+    help = "Queue digest emails for users who chose hourly/daily notification summaries (schedule hourly and daily)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("frequency", choices=sorted(FREQUENCY_PREFS), help="Which digest run this is")
+
+    def handle(self, *args, **options):
+        queued = send_digests(options["frequency"])
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} {options['frequency']} digests"))
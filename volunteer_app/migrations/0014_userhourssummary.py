@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:30
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteer_app', '0013_user_email_verified_user_email_verified_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserHoursSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qr_hours', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=8)),
+                ('checkout_hours', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=8)),
+                ('total_hours', models.DecimalField(db_index=True, decimal_places=2, default=Decimal('0'), max_digits=8)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='hours_summary', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:32
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteer_app', '0014_userhourssummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivityStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('faculty', models.CharField(blank=True, max_length=120)),
+                ('scan_count', models.PositiveIntegerField(default=0)),
+                ('checkin_count', models.PositiveIntegerField(default=0)),
+                ('checkout_count', models.PositiveIntegerField(default=0)),
+                ('hours_earned', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='checkinout',
+            index=models.Index(fields=['checked_at'], name='volunteer_a_checked_7804a8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='qrscan',
+            index=models.Index(fields=['scanned_at'], name='volunteer_a_scanned_2684fd_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyactivitystat',
+            name='activity',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='volunteer_app.activity'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyactivitystat',
+            index=models.Index(fields=['day'], name='volunteer_a_day_1146a0_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyactivitystat',
+            unique_together={('day', 'activity', 'faculty')},
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:33
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_signup_counters(apps, schema_editor):
+    Activity = apps.get_model("volunteer_app", "Activity")
+    ActivitySignup = apps.get_model("volunteer_app", "ActivitySignup")
+
+    def count_for(status):
+        return Coalesce(
+            Subquery(
+                ActivitySignup.objects.filter(activity=OuterRef("pk"), status=status)
+                .order_by()
+                .values("activity")
+                .annotate(n=Count("id"))
+                .values("n")[:1]
+            ),
+            Value(0),
+        )
+
+    Activity.objects.update(
+        requested_count=count_for("requested"),
+        confirmed_count=count_for("confirmed"),
+        attended_count=count_for("attended"),
+        waitlist_count=count_for("waitlist"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteer_app', '0015_dailyactivitystat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='attended_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='confirmed_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='requested_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='waitlist_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_signup_counters, migrations.RunPython.noop),
+    ]
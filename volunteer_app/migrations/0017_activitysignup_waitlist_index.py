@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteer_app', '0016_activity_signup_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitysignup',
+            index=models.Index(fields=['activity', 'status', 'joined_at'], name='volunteer_a_activit_0cbdfc_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteer_app', '0017_activitysignup_waitlist_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='checkinout',
+            name='checked_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='qrscan',
+            name='scanned_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
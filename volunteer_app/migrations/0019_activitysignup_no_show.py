@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteer_app', '0018_attendance_client_timestamps'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activitysignup',
+            name='status',
+            field=models.CharField(choices=[('requested', 'Requested'), ('confirmed', 'Confirmed'), ('attended', 'Attended'), ('waitlist', 'Waitlist'), ('cancelled', 'Cancelled'), ('no_show', 'No-show')], default='requested', max_length=20),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteer_app', '0020_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationpreference',
+            name='email_digest',
+            field=models.CharField(choices=[('immediate', 'ส่งทันที'), ('hourly', 'สรุปรายชั่วโมง'), ('daily', 'สรุปรายวัน')], default='immediate', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='EmailDigestItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('general', 'ทั่วไป'), ('idea', 'ไอเดีย'), ('activity', 'กิจกรรม'), ('hours', 'ชั่วโมงจิตอาสา')], default='general', max_length=20)),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='digest_items', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='volunteer_a_user_id_d673e4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteer_app', '0021_email_digest'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read'], name='volunteer_a_user_id_4af209_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Sum
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 import uuid, secrets
@@ -21,23 +22,16 @@ class User(AbstractUser):
     email_verified_at = models.DateTimeField(null=True, blank=True)
 
     def total_hours(self):
-        """Calculate total volunteer hours from both QRScan (legacy) and CheckInOut (new)."""
-        # Legacy: hours from QRScan (uses activity.hours_reward)
-        qr_scan_hours = sum(scan.activity.hours_reward for scan in self.qr_scans.all())
-        
-        # New: hours from CheckInOut (uses calculated_hours from actual time worked)
-        # Only count check-out records that have calculated_hours
-        # Check if CheckInOut table exists (for migration compatibility)
+        """Total volunteer hours from QRScan (legacy) and CheckInOut (new).
+
+        Reads the materialised ``UserHoursSummary`` row, which signals keep in
+        sync with the raw rows; the summary is built on first access.
+        """
         try:
-            checkout_hours = sum(
-                float(checkout.calculated_hours) 
-                for checkout in self.check_ins_outs.filter(check_type="checkout", calculated_hours__isnull=False)
-            )
-        except Exception:
-            # Table doesn't exist yet (during migration) or other error
-            checkout_hours = 0
-        
-        return qr_scan_hours + checkout_hours
+            summary = self.hours_summary
+        except UserHoursSummary.DoesNotExist:
+            summary = UserHoursSummary.refresh_for_user(self.pk)
+        return float(summary.total_hours)
 
     def has_role(self, *codes):
         """Return True if user is assigned to any of the provided role codes."""
@@ -84,6 +78,15 @@ class Role(models.Model):
         return self.name
 
 # -------------------- ACTIVITY --------------------
+# ActivitySignup status -> counter column maintained on Activity
+SIGNUP_COUNTER_FIELDS = {
+    "requested": "requested_count",
+    "confirmed": "confirmed_count",
+    "attended": "attended_count",
+    "waitlist": "waitlist_count",
+}
+
+
 class Activity(models.Model):
     TYPE_CHOICES = [
         ("environment", "Environment"),
@@ -110,30 +113,72 @@ class Activity(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="created_activities")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Denormalised signup counters, kept in sync by the ActivitySignup signals
+    # and services.signup_service; repair with `manage.py repair_activity_counters`.
+    requested_count = models.PositiveIntegerField(default=0)
+    confirmed_count = models.PositiveIntegerField(default=0)
+    attended_count = models.PositiveIntegerField(default=0)
+    waitlist_count = models.PositiveIntegerField(default=0)
+
+    def save(self, *args, **kwargs):
+        # counters only move through F() updates; a plain edit must not
+        # write back the (possibly stale) values it loaded
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            counters = set(SIGNUP_COUNTER_FIELDS.values())
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in counters
+            ]
+        super().save(*args, **kwargs)
+
     def spots_taken(self):
         # count only confirmed/attended signups
-        return self.signups.filter(status__in=("confirmed", "attended")).count()
+        return self.confirmed_count + self.attended_count
 
     def is_full(self):
         return self.spots_taken() >= self.capacity
 
+    # token lifetimes (seconds); also the window length for aligned tokens
+    QR_TOKEN_TTL = 900
+    CHECK_TOKEN_TTL = 300
+
     def qr_token(self):
         # return signed, time-limited token
         if not self.pk:
             return None
-        return make_qr_token(self.pk)
+        return make_qr_token(self.pk, expires_in=self.QR_TOKEN_TTL)
     
     def checkin_token(self):
         """Generate check-in token (expires in 5 minutes)."""
         if not self.pk:
             return None
-        return make_checkin_token(self.pk, expires_in=300)
+        return make_checkin_token(self.pk, expires_in=self.CHECK_TOKEN_TTL)
     
     def checkout_token(self):
         """Generate check-out token (expires in 5 minutes)."""
         if not self.pk:
             return None
-        return make_checkout_token(self.pk, expires_in=300)
+        return make_checkout_token(self.pk, expires_in=self.CHECK_TOKEN_TTL)
+
+    @classmethod
+    def adjust_signup_counters(cls, activity_id, deltas, instance=None):
+        """Apply ``{status: delta}`` to the counter columns in one ``F()`` UPDATE.
+
+        ``instance`` (an already loaded Activity) is updated in memory too.
+        """
+        updates = {}
+        for status, delta in deltas.items():
+            field = SIGNUP_COUNTER_FIELDS.get(status)
+            if field and delta:
+                updates[field] = updates.get(field, 0) + delta
+        if not updates:
+            return
+        cls.objects.filter(pk=activity_id).update(
+            **{field: F(field) + delta for field, delta in updates.items()}
+        )
+        if instance is not None:
+            for field, delta in updates.items():
+                setattr(instance, field, getattr(instance, field) + delta)
 
     def __str__(self):
         return self.title
@@ -150,16 +195,29 @@ class ActivitySignup(models.Model):
         ("attended", "Attended"),
         ("waitlist", "Waitlist"),
         ("cancelled", "Cancelled"),
+        ("no_show", "No-show"),
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="requested")
 
     class Meta:
         unique_together = ("activity", "user")
+        indexes = [
+            # waitlist promotion reads the oldest signups per activity/status
+            models.Index(fields=["activity", "status", "joined_at"]),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so the counter signals can tell which status a save replaced
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
 
 class QRScan(models.Model):
     activity = models.ForeignKey(Activity, on_delete=models.CASCADE, related_name="qr_scans")
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="qr_scans")
-    scanned_at = models.DateTimeField(auto_now_add=True)
+    # default rather than auto_now_add so offline kiosk syncs can keep the scan time
+    scanned_at = models.DateTimeField(default=timezone.now)
     token = models.CharField(max_length=200)
 
     # audit fields
@@ -172,6 +230,9 @@ class QRScan(models.Model):
 
     class Meta:
         unique_together = ("activity", "user")
+        indexes = [
+            models.Index(fields=["scanned_at"]),
+        ]
 
 
 # -------------------- CHECK-IN / CHECK-OUT --------------------
@@ -186,7 +247,7 @@ class CheckInOut(models.Model):
     activity = models.ForeignKey(Activity, on_delete=models.CASCADE, related_name="check_ins_outs")
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="check_ins_outs")
     check_type = models.CharField(max_length=10, choices=TYPE_CHOICES)
-    checked_at = models.DateTimeField(auto_now_add=True)
+    checked_at = models.DateTimeField(default=timezone.now)
     token = models.CharField(max_length=200)
     
     # Calculated hours (only set when check-out is completed)
@@ -204,11 +265,159 @@ class CheckInOut(models.Model):
         ordering = ["-checked_at"]
         indexes = [
             models.Index(fields=["activity", "user", "check_type"]),
+            models.Index(fields=["checked_at"]),
         ]
     
     def __str__(self):
         return f"{self.user.username} - {self.activity.title} - {self.get_check_type_display()} at {self.checked_at}"
 
+# -------------------- HOURS SUMMARY --------------------
+class UserHoursSummary(models.Model):
+    """Per-user volunteer hours ledger, derived from QRScan and CheckInOut rows.
+
+    A new scan or check-out adds its hours to the row; edits and deletes
+    recompute it. Rows can be rebuilt in bulk with the
+    ``rebuild_hours_summary`` management command.
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="hours_summary")
+    qr_hours = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal("0"))
+    checkout_hours = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal("0"))
+    total_hours = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal("0"), db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} - {self.total_hours} hours"
+
+    @staticmethod
+    def _qr_hours_by_user():
+        return QRScan.objects.values("user_id").annotate(total=Sum("activity__hours_reward"))
+
+    @staticmethod
+    def _checkout_hours_by_user():
+        return (
+            CheckInOut.objects.filter(check_type="checkout", calculated_hours__isnull=False)
+            .values("user_id")
+            .annotate(total=Sum("calculated_hours"))
+        )
+
+    @classmethod
+    def refresh_for_user(cls, user_id, create=True):
+        """Recompute one user's totals with two indexed aggregates.
+
+        With ``create=False`` only an existing row is updated; this is used
+        from delete signals so a cascading user delete never re-inserts a row.
+        """
+        qr_hours = QRScan.objects.filter(user_id=user_id).aggregate(
+            total=Sum("activity__hours_reward")
+        )["total"] or Decimal("0")
+        checkout_hours = CheckInOut.objects.filter(
+            user_id=user_id, check_type="checkout", calculated_hours__isnull=False
+        ).aggregate(total=Sum("calculated_hours"))["total"] or Decimal("0")
+        values = {
+            "qr_hours": qr_hours,
+            "checkout_hours": checkout_hours,
+            "total_hours": qr_hours + checkout_hours,
+            "updated_at": timezone.now(),
+        }
+        with transaction.atomic():
+            if not create:
+                cls.objects.filter(user_id=user_id).update(**values)
+                return None
+            summary, _ = cls.objects.update_or_create(user_id=user_id, defaults=values)
+        return summary
+
+    @classmethod
+    def add_hours(cls, user_id, qr_hours=Decimal("0"), checkout_hours=Decimal("0")):
+        """Add newly earned hours to a user's totals with one UPDATE.
+
+        Used when a scan or check-out is inserted; falls back to
+        ``refresh_for_user`` when the user has no summary row yet.
+        """
+        qr_hours, checkout_hours = Decimal(str(qr_hours)), Decimal(str(checkout_hours))
+        updated = cls.objects.filter(user_id=user_id).update(
+            qr_hours=F("qr_hours") + qr_hours,
+            checkout_hours=F("checkout_hours") + checkout_hours,
+            total_hours=F("total_hours") + qr_hours + checkout_hours,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            cls.refresh_for_user(user_id)
+
+    @classmethod
+    def rebuild(cls, user_ids=None, batch_size=500):
+        """Rebuild summaries from raw rows in bulk and return the number written.
+
+        ``user_ids`` limits the rebuild to some users; by default every user
+        with hours (or an existing summary row) is recomputed.
+        """
+        qr_rows = cls._qr_hours_by_user()
+        checkout_rows = cls._checkout_hours_by_user()
+        existing = cls.objects.all()
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            qr_rows = qr_rows.filter(user_id__in=user_ids)
+            checkout_rows = checkout_rows.filter(user_id__in=user_ids)
+            existing = existing.filter(user_id__in=user_ids)
+
+        totals = {}
+        for row in qr_rows:
+            totals.setdefault(row["user_id"], [Decimal("0"), Decimal("0")])[0] = row["total"] or Decimal("0")
+        for row in checkout_rows:
+            totals.setdefault(row["user_id"], [Decimal("0"), Decimal("0")])[1] = row["total"] or Decimal("0")
+
+        now = timezone.now()
+        summaries = [
+            cls(
+                user_id=user_id,
+                qr_hours=qr_hours,
+                checkout_hours=checkout_hours,
+                total_hours=qr_hours + checkout_hours,
+                updated_at=now,
+            )
+            for user_id, (qr_hours, checkout_hours) in totals.items()
+        ]
+        with transaction.atomic():
+            cls.objects.bulk_create(
+                summaries,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=["user"],
+                update_fields=["qr_hours", "checkout_hours", "total_hours", "updated_at"],
+            )
+            # Users whose scans were all removed keep a row, reset to zero.
+            existing.exclude(user_id__in=list(totals)).update(
+                qr_hours=Decimal("0"), checkout_hours=Decimal("0"), total_hours=Decimal("0"), updated_at=now
+            )
+        return len(summaries)
+
+# -------------------- DAILY ROLLUPS --------------------
+class DailyActivityStat(models.Model):
+    """Attendance rolled up per (day, activity, faculty) for reporting.
+
+    Filled by the ``rollup_daily_stats`` management command from QRScan and
+    CheckInOut rows so week/month/semester reports never scan the raw tables.
+    """
+
+    day = models.DateField()
+    activity = models.ForeignKey(Activity, on_delete=models.CASCADE, related_name="daily_stats")
+    faculty = models.CharField(max_length=120, blank=True)
+    scan_count = models.PositiveIntegerField(default=0)
+    checkin_count = models.PositiveIntegerField(default=0)
+    checkout_count = models.PositiveIntegerField(default=0)
+    hours_earned = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0"))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [("day", "activity", "faculty")]
+        ordering = ["-day"]
+        indexes = [
+            models.Index(fields=["day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.activity_id} - {self.faculty or '-'}"
+
 # -------------------- IDEA --------------------
 class IdeaProposal(models.Model):
     STATUS_CHOICES = [
@@ -263,18 +472,36 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # inbox pages: keyset range scan newest first (notification_page)
+            models.Index(fields=["user", "-created_at", "-id"]),
+            # unread-only pages; its (user, is_read) prefix also serves the unread badge recount
+            models.Index(fields=["user", "is_read", "-created_at", "-id"]),
+        ]
 
     def mark_read(self):
-        if not self.is_read:
-            self.is_read = True
-            self.read_at = timezone.now()
-            self.save(update_fields=["is_read", "read_at"])
+        if self.is_read:
+            return
+        from .services import unread_counter
+
+        self.is_read = True
+        self.read_at = timezone.now()
+        # conditional so two concurrent clicks decrement the unread count once
+        if Notification.objects.filter(pk=self.pk, is_read=False).update(is_read=True, read_at=self.read_at):
+            unread_counter.adjust(self.user_id, -1)
 
 
 class NotificationPreference(models.Model):
+    DIGEST_CHOICES = [
+        ("immediate", "ส่งทันที"),
+        ("hourly", "สรุปรายชั่วโมง"),
+        ("daily", "สรุปรายวัน"),
+    ]
+
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="notification_pref")
     in_app_enabled = models.BooleanField(default=True)
     email_enabled = models.BooleanField(default=True)
+    email_digest = models.CharField(max_length=10, choices=DIGEST_CHOICES, default="immediate")
     idea_updates = models.BooleanField(default=True)
     activity_reminders = models.BooleanField(default=True)
     hours_updates = models.BooleanField(default=True)
@@ -284,6 +511,51 @@ class NotificationPreference(models.Model):
     def __str__(self):
         return f"Notification Preference for {self.user}"
 
+
+class EmailDigestItem(models.Model):
+    """An email notification held for the user's hourly/daily digest (``send_email_digests``)."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="digest_items")
+    category = models.CharField(max_length=20, choices=Notification.CATEGORY_CHOICES, default="general")
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at"]),
+        ]
+
+
+class EmailOutbox(models.Model):
+    """Emails waiting for the ``deliver_emails`` worker; requests only enqueue."""
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="outbox_emails")
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the worker polls for due pending rows
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.to_email}: {self.subject} ({self.status})"
+
 # -------------------- GROUP --------------------
 class Group(models.Model):
     name = models.CharField(max_length=200)
@@ -327,7 +599,7 @@ class GroupPost(models.Model):
 
 
 # -------------------- SIGNALS --------------------
-from django.db.models.signals import post_save  # noqa: E402
+from django.db.models.signals import post_save, post_delete, pre_save  # noqa: E402
 from django.dispatch import receiver  # noqa: E402
 
 
@@ -335,3 +607,120 @@ from django.dispatch import receiver  # noqa: E402
 def ensure_notification_pref(sender, instance, created, **kwargs):
     if created:
         NotificationPreference.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=QRScan)
+def sync_hours_summary_on_scan_save(sender, instance, created, **kwargs):
+    if created and QRScan.activity.is_cached(instance):
+        UserHoursSummary.add_hours(instance.user_id, qr_hours=instance.activity.hours_reward)
+    else:
+        UserHoursSummary.refresh_for_user(instance.user_id)
+
+
+@receiver(post_delete, sender=QRScan)
+def sync_hours_summary_on_scan_delete(sender, instance, **kwargs):
+    UserHoursSummary.refresh_for_user(instance.user_id, create=False)
+
+
+def forget_recent_scan(sender, instance, **kwargs):
+    from .services import recent_scans
+
+    recent_scans.forget_row(instance)
+
+
+for _model in (QRScan, CheckInOut):
+    post_delete.connect(forget_recent_scan, sender=_model, dispatch_uid=f"recent_scan_forget_{_model.__name__}")
+
+
+@receiver(post_save, sender=CheckInOut)
+def sync_hours_summary_on_checkout_save(sender, instance, created, **kwargs):
+    if instance.check_type != "checkout":
+        return
+    if created:
+        if instance.calculated_hours is not None:
+            UserHoursSummary.add_hours(instance.user_id, checkout_hours=instance.calculated_hours)
+    else:
+        UserHoursSummary.refresh_for_user(instance.user_id)
+
+
+@receiver(post_delete, sender=CheckInOut)
+def sync_hours_summary_on_checkout_delete(sender, instance, **kwargs):
+    if instance.check_type == "checkout":
+        UserHoursSummary.refresh_for_user(instance.user_id, create=False)
+
+
+@receiver(pre_save, sender=Activity)
+def remember_activity_hours_reward(sender, instance, **kwargs):
+    if instance.pk:
+        old_reward = Activity.objects.filter(pk=instance.pk).values_list("hours_reward", flat=True).first()
+        instance._hours_reward_changed = old_reward is not None and old_reward != instance.hours_reward
+
+
+@receiver(post_save, sender=Activity)
+def sync_hours_summary_on_reward_change(sender, instance, created, **kwargs):
+    # QR hours are derived from activity.hours_reward, so editing it changes
+    # the totals of everyone who already scanned this activity.
+    if not created and getattr(instance, "_hours_reward_changed", False):
+        UserHoursSummary.rebuild(
+            user_ids=QRScan.objects.filter(activity=instance).values_list("user_id", flat=True)
+        )
+        instance._hours_reward_changed = False
+
+
+@receiver(post_save, sender=Notification)
+def count_unread_notification(sender, instance, created, **kwargs):
+    from .services import unread_counter
+
+    if created and not instance.is_read:
+        unread_counter.adjust(instance.user_id, 1)
+    elif not created:
+        # an arbitrary save may have flipped is_read; recount on the next read
+        unread_counter.forget(instance.user_id)
+
+
+@receiver(post_delete, sender=Notification)
+def forget_unread_count(sender, instance, **kwargs):
+    from .services import unread_counter
+
+    unread_counter.forget(instance.user_id)
+
+
+def mark_dashboard_stale(sender, **kwargs):
+    # Logins save last_login on every request burst; they do not move any counter.
+    update_fields = kwargs.get("update_fields")
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    from .services.dashboard_service import DashboardSnapshot
+
+    DashboardSnapshot.mark_stale()
+
+
+for _model in (User, Activity, ActivitySignup, QRScan, CheckInOut, IdeaProposal):
+    post_save.connect(mark_dashboard_stale, sender=_model, dispatch_uid=f"dashboard_stale_save_{_model.__name__}")
+    post_delete.connect(mark_dashboard_stale, sender=_model, dispatch_uid=f"dashboard_stale_delete_{_model.__name__}")
+
+
+def _cached_activity(signup):
+    return signup.activity if ActivitySignup.activity.is_cached(signup) else None
+
+
+@receiver(post_save, sender=ActivitySignup)
+def sync_activity_counters_on_signup_save(sender, instance, created, **kwargs):
+    if getattr(instance, "_counters_applied", False):
+        # the signup service already counted this write
+        instance._counters_applied = False
+    elif created:
+        Activity.adjust_signup_counters(instance.activity_id, {instance.status: 1}, _cached_activity(instance))
+    else:
+        old_status = getattr(instance, "_loaded_status", None)
+        if old_status is not None and old_status != instance.status:
+            Activity.adjust_signup_counters(
+                instance.activity_id, {old_status: -1, instance.status: 1}, _cached_activity(instance)
+            )
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=ActivitySignup)
+def sync_activity_counters_on_signup_delete(sender, instance, **kwargs):
+    status = getattr(instance, "_loaded_status", None) or instance.status
+    Activity.adjust_signup_counters(instance.activity_id, {status: -1}, _cached_activity(instance))
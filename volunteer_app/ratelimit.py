@@ -0,0 +1,118 @@
+"""Token-bucket rate limiting for the scan, upload and chatbot endpoints.
+
+``@rate_limit("scan")`` charges one token per request to two buckets for
+that scope, one per user (when logged in) and one per client IP. A request
+is refused with a JSON 429 and ``Retry-After`` when either bucket is empty,
+and a refused request is charged to neither.
+Budgets come from ``settings.RATE_LIMITS``::
+
+    RATE_LIMITS = {"scan": {"user": "30/m", "ip": "600/m"}, ...}
+
+``"30/m"`` is a bucket of 30 tokens refilled at 30 per minute, so short
+bursts pass and sustained abuse is held to the rate. Buckets live in the
+Django cache (shared across workers when ``CACHES`` is). The read-modify-write
+is not atomic, so a burst of parallel requests may slip a few extra through.
+That is fine for throttling. Rejections are counted per scope; see
+``rejection_counts``.
+"""
+import logging
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {"s": 1, "m": 60, "h": 3600}
+
+
+def parse_rate(rate: str):
+    """``"30/m"`` -> (capacity 30, refill 0.5 tokens per second)."""
+    count, _, period = rate.partition("/")
+    count = int(count)
+    return count, count / _PERIODS[period or "s"]
+
+
+def _client_ip(request) -> str:
+    header = getattr(settings, "RATE_LIMIT_IP_META", "REMOTE_ADDR")
+    # X-Forwarded-For style headers list the original client first
+    return (request.META.get(header) or request.META.get("REMOTE_ADDR") or "unknown").split(",")[0].strip()
+
+
+def _level(key: str, rate: str, now: float) -> float:
+    """Tokens in bucket ``key`` at ``now``, refilled since it was last charged."""
+    capacity, refill = parse_rate(rate)
+    tokens, updated = cache.get(key) or (capacity, now)
+    return min(capacity, tokens + (now - updated) * refill)
+
+
+def _charge(key: str, rate: str, tokens: float, now: float):
+    capacity, refill = parse_rate(rate)
+    # keep the bucket only as long as it takes to refill completely
+    cache.set(key, (tokens - 1, now), math.ceil(capacity / refill) + 1)
+
+
+def _count_rejection(scope: str):
+    key = f"ratelimit:rejected:{scope}"
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:  # evicted between add and incr
+        cache.set(key, 1, None)
+
+
+def rejection_counts(scopes=None) -> dict:
+    """Requests refused per scope since the cache was last cleared."""
+    scopes = scopes or getattr(settings, "RATE_LIMITS", {}).keys()
+    return {scope: cache.get(f"ratelimit:rejected:{scope}", 0) for scope in scopes}
+
+
+def check_rate(request, scope: str) -> float:
+    """Charge the request to its buckets; 0 if allowed, else the Retry-After in seconds."""
+    limits = getattr(settings, "RATE_LIMITS", {}).get(scope)
+    if not limits or not getattr(settings, "RATE_LIMIT_ENABLED", True):
+        return 0
+    now = time.time()
+    buckets = [("ip", _client_ip(request))]
+    if request.user.is_authenticated:
+        buckets.insert(0, ("user", request.user.pk))
+    levels = []
+    for kind, ident in buckets:
+        if kind in limits:
+            key = f"ratelimit:{scope}:{kind}:{ident}"
+            levels.append((key, limits[kind], _level(key, limits[kind], now)))
+    # a refused request charges no bucket, so it costs the user nothing
+    waits = [(1 - tokens) / parse_rate(rate)[1] for _, rate, tokens in levels if tokens < 1]
+    if waits:
+        return max(waits)
+    for key, rate, tokens in levels:
+        _charge(key, rate, tokens, now)
+    return 0
+
+
+def rate_limit(scope: str):
+    """Decorator refusing requests over the ``scope`` budget with a 429 response."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            wait = check_rate(request, scope)
+            if not wait:
+                return view(request, *args, **kwargs)
+            retry_after = max(1, math.ceil(wait))
+            _count_rejection(scope)
+            logger.warning("Rate limit %s exceeded by user=%s ip=%s", scope, request.user.pk, _client_ip(request))
+            response = JsonResponse({
+                "ok": False,
+                "code": "rate_limited",
+                "message": f"มีคำขอมากเกินไป กรุณารอ {retry_after} วินาทีแล้วลองใหม่",
+            }, status=429)
+            response["Retry-After"] = str(retry_after)
+            return response
+
+        return wrapped
+
+    return decorator
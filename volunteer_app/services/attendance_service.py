@@ -0,0 +1,159 @@
+"""Record a student's QR confirm, check-in or check-out for one activity.
+
+Every scan endpoint (``qr_verify``, ``qr_confirm``, ``check_in``,
+``check_out`` and uploaded photos) ends up here once the token is verified.
+``record_attendance`` validates with a single query, which loads the signup
+joined to its activity along with the student's existing rows as
+subqueries. It then writes the new row and the signup transition in one
+transaction. Only when that query finds no signup does a second lookup tell
+a missing or cancelled activity apart from a student who never signed up.
+
+Repeats of a recorded scan are answered from ``recent_scans`` before any
+query runs.
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from ..models import Activity, ActivitySignup, CheckInOut, QRScan
+from ..tokens import KIND_CHECKIN, KIND_CHECKOUT, KIND_QR
+from . import recent_scans
+from .signup_service import change_signup_status
+
+SUCCESS_CODES = {"success", "checkin_success", "checkout_success"}
+
+
+class AttendanceResult(NamedTuple):
+    code: str
+    activity: Optional[Activity] = None
+    checked_in_at: Optional[datetime] = None
+    checked_out_at: Optional[datetime] = None
+    calculated_hours: Optional[float] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.code in SUCCESS_CODES
+
+
+def hours_between(checked_in_at, checked_out_at, hours_reward) -> Decimal:
+    """Hours worked, falling back to ``hours_reward`` below 0.1 h (6 minutes)."""
+    hours_worked = (checked_out_at - checked_in_at).total_seconds() / 3600.0
+    if hours_worked >= 0.1:
+        return Decimal(str(round(hours_worked, 2)))
+    return Decimal(hours_reward)
+
+
+def _load_signup(user, activity_id: int, kind: str) -> Optional[ActivitySignup]:
+    checks = CheckInOut.objects.filter(activity_id=OuterRef("activity_id"), user_id=OuterRef("user_id"))
+    annotations = {}
+    if kind == KIND_QR:
+        annotations["scanned"] = Exists(
+            QRScan.objects.filter(activity_id=OuterRef("activity_id"), user_id=OuterRef("user_id"))
+        )
+    else:
+        annotations["checkin_at"] = Subquery(checks.filter(check_type="checkin").values("checked_at")[:1])
+    if kind == KIND_CHECKOUT:
+        checkout = checks.filter(check_type="checkout")
+        annotations["checkout_at"] = Subquery(checkout.values("checked_at")[:1])
+        annotations["checkout_hours"] = Subquery(checkout.values("calculated_hours")[:1])
+    return (
+        ActivitySignup.objects.select_related("activity")
+        .filter(activity_id=activity_id, user=user)
+        .annotate(**annotations)
+        .first()
+    )
+
+
+def _existing_result(activity, kind, checked_in_at, checked_out_at=None, hours=None) -> AttendanceResult:
+    if kind == KIND_QR:
+        return AttendanceResult("already_attended", activity)
+    if kind == KIND_CHECKIN:
+        return AttendanceResult("already_checked_in", activity, checked_in_at)
+    return AttendanceResult(
+        "already_checked_out", activity, checked_in_at, checked_out_at,
+        float(hours) if hours else float(activity.hours_reward),
+    )
+
+
+def record_attendance(
+    user,
+    kind: str,
+    activity_id: int,
+    token: str,
+    *,
+    ip_address: Optional[str] = None,
+    user_agent: str = "",
+    device_id: Optional[str] = None,
+) -> AttendanceResult:
+    """Record a verified ``kind`` token for ``user``; the result's ``code`` says what happened.
+
+    Any signup status counts (as before); a QR confirm or check-out moves the
+    signup to ``attended``.
+    """
+    cached = recent_scans.get(activity_id, user.pk, kind)
+    if cached is not None:
+        return cached
+    result = _record(user, kind, activity_id, token, ip_address, user_agent, device_id)
+    recent_scans.remember(user.pk, kind, result)
+    return result
+
+
+def _record(user, kind, activity_id, token, ip_address, user_agent, device_id) -> AttendanceResult:
+    signup = _load_signup(user, activity_id, kind)
+    if signup is None:
+        activity = Activity.objects.filter(pk=activity_id).first()
+        if activity is None:
+            return AttendanceResult("activity_not_found")
+        if activity.status == "cancelled":
+            return AttendanceResult("activity_cancelled", activity)
+        return AttendanceResult("not_signed_up", activity)
+
+    activity = signup.activity
+    if activity.status == "cancelled":
+        return AttendanceResult("activity_cancelled", activity)
+    checked_in_at = getattr(signup, "checkin_at", None)
+    if kind == KIND_QR and signup.scanned:
+        return _existing_result(activity, kind, None)
+    if kind == KIND_CHECKIN and checked_in_at:
+        return _existing_result(activity, kind, checked_in_at)
+    if kind == KIND_CHECKOUT:
+        if not checked_in_at:
+            return AttendanceResult("not_checked_in", activity)
+        if signup.checkout_at:
+            return _existing_result(activity, kind, checked_in_at, signup.checkout_at, signup.checkout_hours)
+
+    now = timezone.now()
+    client = {"token": token, "ip_address": ip_address, "user_agent": (user_agent or "")[:512], "device_id": device_id}
+    try:
+        with transaction.atomic():
+            if kind == KIND_QR:
+                QRScan.objects.create(activity=activity, user=user, scanned_at=now, **client)
+                result = AttendanceResult("success", activity)
+            elif kind == KIND_CHECKIN:
+                CheckInOut.objects.create(activity=activity, user=user, check_type="checkin", checked_at=now, **client)
+                result = AttendanceResult("checkin_success", activity, now)
+            else:
+                hours = hours_between(checked_in_at, now, activity.hours_reward)
+                CheckInOut.objects.create(
+                    activity=activity, user=user, check_type="checkout", checked_at=now,
+                    calculated_hours=hours, **client,
+                )
+                result = AttendanceResult("checkout_success", activity, checked_in_at, now, float(hours))
+            if kind != KIND_CHECKIN:
+                change_signup_status(signup, "attended")
+    except IntegrityError:
+        # a parallel request from the same student won the unique constraint
+        if kind == KIND_QR:
+            return _existing_result(activity, kind, None)
+        check_type = "checkin" if kind == KIND_CHECKIN else "checkout"
+        existing = CheckInOut.objects.filter(activity=activity, user=user, check_type=check_type).first()
+        if existing is None:
+            return AttendanceResult("database_error", activity)
+        if kind == KIND_CHECKIN:
+            return _existing_result(activity, kind, existing.checked_at)
+        return _existing_result(activity, kind, checked_in_at, existing.checked_at, existing.calculated_hours)
+    return result
@@ -0,0 +1,239 @@
+"""Ingest a batch of QR photos (zip or many files) taken by staff after an event.
+
+Each file is named after the student it belongs to (``<student_id>.jpg`` or
+``<username>.png``). Images are decoded in parallel, tokens verified, users
+and signups resolved in one query each and the resulting
+``QRScan``/``CheckInOut`` rows written with ``bulk_create(ignore_conflicts=True)``.
+The same rules as a live scan apply: the student must have signed up, and
+a check-out needs a check-in, with hours measured from it. Photos are often
+processed long after the event, so rows are not stamped with the ingestion
+time: each one gets the time its code was on screen, read from the token's
+expiry and kept within the activity's hours (``scan_time``). Bulk writes
+skip the model signals, so hours summaries, signup counters and the
+dashboard snapshot are refreshed explicitly afterwards.
+"""
+import io
+import os
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+from typing import Iterable, List, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import Activity, ActivitySignup, CheckInOut, QRScan, User, UserHoursSummary
+from ..tokens import KIND_CHECKIN, KIND_CHECKOUT, KIND_QR, decode_token, token_from_qr_data
+from .attendance_service import hours_between
+from .dashboard_service import DashboardSnapshot
+from .finalize_service import activity_end
+from .reporting_service import reroll_days
+from .qr_decode import decode_qr_image
+from .signup_service import transition_signups
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MAX_BATCH_IMAGES = 2000
+MAX_BATCH_BYTES = 500 * 1024 * 1024
+
+
+class BatchTooLarge(ValueError):
+    """The batch has more images, or more uncompressed bytes, than one ingest accepts."""
+
+
+def iter_image_files(files: Iterable[Tuple[str, bytes]]) -> List[Tuple[str, bytes]]:
+    """Flatten ``(name, data)`` pairs, expanding zip archives; non-images are skipped.
+
+    Zip entries are counted and sized from the archive's directory before any
+    of them is read, so a batch over ``MAX_BATCH_IMAGES`` images or
+    ``MAX_BATCH_BYTES`` bytes raises ``BatchTooLarge`` without inflating it.
+    """
+    files = list(files)
+    entries, count, total = [], 0, 0
+    for name, data in files:
+        ext = os.path.splitext(name)[1].lower()
+        if ext == ".zip":
+            archive = zipfile.ZipFile(io.BytesIO(data))
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir()
+                and os.path.splitext(info.filename)[1].lower() in IMAGE_EXTENSIONS
+                and info.file_size <= MAX_IMAGE_BYTES
+            ]
+            entries.append((archive, members))
+            count += len(members)
+            total += sum(info.file_size for info in members)
+        elif ext in IMAGE_EXTENSIONS and len(data) <= MAX_IMAGE_BYTES:
+            entries.append(((name, data), None))
+            count += 1
+            total += len(data)
+        if count > MAX_BATCH_IMAGES or total > MAX_BATCH_BYTES:
+            for source, members in entries:
+                if members is not None:
+                    source.close()
+            raise BatchTooLarge(count, total)
+
+    images = []
+    for source, members in entries:
+        if members is None:
+            images.append(source)
+            continue
+        with source as archive:
+            images.extend((info.filename, archive.read(info)) for info in members)
+    return images
+
+
+def _decode_all(datas: List[bytes]):
+    workers = getattr(settings, "QR_DECODE_WORKERS", None) or os.cpu_count() or 2
+    pool_class = ThreadPoolExecutor if getattr(settings, "QR_DECODE_EXECUTOR", "process") == "thread" else ProcessPoolExecutor
+    max_side = getattr(settings, "QR_DECODE_MAX_SIDE", 1600)
+    with pool_class(max_workers=min(workers, max(len(datas), 1))) as pool:
+        return list(pool.map(decode_qr_image, datas, [max_side] * len(datas)))
+
+
+def resolve_users(stems: Iterable[str]) -> dict:
+    stems = set(stems)
+    users = {}
+    for user in User.objects.filter(Q(student_id__in=stems) | Q(username__in=stems)):
+        # student_id wins over a username that happens to look the same
+        users.setdefault(user.username, user)
+        if user.student_id:
+            users[user.student_id] = user
+    return users
+
+
+def scan_time(activity, expires_at: int, now: datetime) -> datetime:
+    """When a photographed code was on screen, kept within the activity's hours.
+
+    A code is shown until its expiry less ``QR_TOKEN_GRACE``; that moment is
+    clamped to ``activity.datetime .. activity_end`` (and never after ``now``),
+    so a late ingest cannot stretch the hours past the activity.
+    """
+    grace = int(getattr(settings, "QR_TOKEN_GRACE", 60))
+    shown = datetime.fromtimestamp(expires_at - grace, tz=dt_timezone.utc)
+    return min(max(activity.datetime, min(shown, activity_end(activity))), now)
+
+
+def ingest_qr_images(files: Iterable[Tuple[str, bytes]], allow_expired: bool = False) -> List[dict]:
+    """Decode, verify and record every image; return one report dict per file.
+
+    ``allow_expired`` accepts correctly signed tokens past their expiry, for
+    photos processed after the event's QR window has closed.
+    """
+    images = iter_image_files(files)
+    decoded = _decode_all([data for _, data in images]) if images else []
+    users = resolve_users(os.path.splitext(os.path.basename(name))[0] for name, _ in images)
+
+    reports, accepted = [], []
+    for (name, _), result in zip(images, decoded):
+        stem = os.path.splitext(os.path.basename(name))[0]
+        report = {"file": name, "ok": False, "user": stem}
+        reports.append(report)
+        if not result.ok:
+            report.update(code="qr_read_failed", message=result.error)
+            continue
+        token = token_from_qr_data(result.data)
+        verified = decode_token(token)
+        if not (verified.ok or (allow_expired and verified.error == "expired")):
+            report.update(code="invalid_token", message=verified.error)
+            continue
+        user = users.get(stem)
+        if user is None:
+            report.update(code="user_not_found", message="ไม่พบนักศึกษาตามชื่อไฟล์ (รหัสนักศึกษาหรือ username)")
+            continue
+        report.update(kind=verified.kind, activity_id=verified.activity_id)
+        accepted.append((report, user, verified, token))
+
+    activity_ids = {v.activity_id for _, _, v, _ in accepted}
+    user_ids = {user.pk for _, user, _, _ in accepted}
+    activities = Activity.objects.in_bulk(activity_ids)
+    signed_up = set(
+        ActivitySignup.objects.filter(activity_id__in=activity_ids, user_id__in=user_ids)
+        .values_list("activity_id", "user_id")
+    )
+    existing = set(
+        QRScan.objects.filter(activity_id__in=activity_ids, user_id__in=user_ids)
+        .values_list("activity_id", "user_id")
+    )
+    checked_in_at = {}
+    for activity_id, user_id, check_type, checked_at in (
+        CheckInOut.objects.filter(activity_id__in=activity_ids, user_id__in=user_ids)
+        .order_by().values_list("activity_id", "user_id", "check_type", "checked_at")
+    ):
+        existing.add((activity_id, user_id, check_type))
+        if check_type == "checkin":
+            checked_in_at[(activity_id, user_id)] = checked_at
+
+    now = timezone.now()
+    scans, checks = {}, {}
+    # check-ins first so a check-out photo in the same batch finds its check-in
+    for report, user, verified, token in sorted(accepted, key=lambda item: item[2].kind == KIND_CHECKOUT):
+        activity = activities.get(verified.activity_id)
+        if activity is None or activity.status == "cancelled":
+            report.update(code="activity_not_found" if activity is None else "activity_cancelled")
+            continue
+        pair = (activity.pk, user.pk)
+        if pair not in signed_up:
+            report["code"] = "not_signed_up"
+            continue
+        key = pair
+        at = scan_time(activity, verified.expires_at, now)
+        if verified.kind != KIND_QR:
+            key += ("checkin" if verified.kind == KIND_CHECKIN else "checkout",)
+        if key in existing or key in scans or key in checks:
+            report.update(ok=True, code="already_recorded")
+            continue
+        if verified.kind == KIND_QR:
+            scans[key] = QRScan(activity=activity, user=user, token=token, scanned_at=at, scanned_from_staff=True)
+        elif key[2] == "checkin":
+            checks[key] = CheckInOut(activity=activity, user=user, check_type="checkin", token=token, checked_at=at)
+            checked_in_at[pair] = at
+        else:
+            if pair not in checked_in_at:
+                report["code"] = "not_checked_in"
+                continue
+            # same rule as a live check-out: time since the check-in, activity hours below 0.1 h
+            hours = hours_between(checked_in_at[pair], at, activity.hours_reward)
+            checks[key] = CheckInOut(
+                activity=activity, user=user, check_type="checkout", token=token,
+                checked_at=at, calculated_hours=hours,
+            )
+            report["calculated_hours"] = float(hours)
+        report.update(ok=True, code="recorded")
+
+    write_attendance_rows(scans, checks)
+    return reports
+
+
+def write_attendance_rows(scans: dict, checks: dict):
+    """Bulk-insert scan/check rows keyed by (activity_id, user_id[, check_type]) in one transaction.
+
+    Rows that already exist are skipped by the unique constraints. Signals do
+    not fire for bulk inserts, so signups, hours summaries, daily rollups and
+    the dashboard snapshot are brought up to date here.
+    """
+    if not scans and not checks:
+        return
+    with transaction.atomic():
+        QRScan.objects.bulk_create(scans.values(), ignore_conflicts=True)
+        CheckInOut.objects.bulk_create(checks.values(), ignore_conflicts=True)
+
+        attended = defaultdict(set)
+        for activity_id, user_id in scans:
+            attended[activity_id].add(user_id)
+        for activity_id, user_id, check_type in checks:
+            if check_type == "checkout":
+                attended[activity_id].add(user_id)
+        for activity_id, attended_user_ids in attended.items():
+            transition_signups(
+                ActivitySignup.objects.filter(activity_id=activity_id, user_id__in=attended_user_ids), "attended"
+            )
+
+        user_ids = {key[1] for key in scans} | {key[1] for key in checks}
+        UserHoursSummary.rebuild(user_ids=user_ids)
+    # kiosk and photo rows carry when they were scanned, which may be a day already rolled up
+    reroll_days([scan.scanned_at for scan in scans.values()] + [check.checked_at for check in checks.values()])
+    DashboardSnapshot.mark_stale()
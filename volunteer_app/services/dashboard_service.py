@@ -0,0 +1,91 @@
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from ..models import Activity, ActivitySignup, DailyActivityStat, IdeaProposal, QRScan
+
+
+def _local_day_start(day: datetime.date) -> datetime.datetime:
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+class DashboardSnapshot:
+    """Headline counters for the admin dashboard, computed in a handful of grouped queries.
+
+    The snapshot lives in the cache until a model that feeds it changes; the
+    ``post_save``/``post_delete`` receivers in ``models.py`` call ``mark_stale()``.
+    """
+
+    CACHE_KEY = "dashboard:snapshot"
+
+    @classmethod
+    def get(cls) -> dict:
+        snapshot = cache.get(cls.CACHE_KEY)
+        if snapshot is None:
+            snapshot = cls.compute()
+            cache.set(cls.CACHE_KEY, snapshot, getattr(settings, "DASHBOARD_SNAPSHOT_TTL", 600))
+        return snapshot
+
+    @classmethod
+    def mark_stale(cls):
+        cache.delete(cls.CACHE_KEY)
+
+    @classmethod
+    def compute(cls) -> dict:
+        today = timezone.localdate()
+        today_start = _local_day_start(today)
+        week_start = _local_day_start(today - datetime.timedelta(days=7))
+
+        users = get_user_model().objects.aggregate(
+            total=Count("id"),
+            today=Count("id", filter=Q(date_joined__gte=today_start)),
+            week=Count("id", filter=Q(date_joined__gte=week_start)),
+        )
+        activities = Activity.objects.aggregate(
+            total=Count("id"),
+            upcoming=Count("id", filter=Q(status="upcoming")),
+            ongoing=Count("id", filter=Q(status="ongoing")),
+            completed=Count("id", filter=Q(status="completed")),
+        )
+        # Days of the week already rolled up (rollup_daily_stats) come from
+        # DailyActivityStat; later days, today included, are counted live.
+        from .reporting_service import rolled_up_through
+
+        week_first_day = today - datetime.timedelta(days=7)
+        rolled_end = rolled_up_through()
+        scans_rolled_up = 0
+        live_from = week_first_day
+        if rolled_end is not None and rolled_end >= week_first_day:
+            scans_rolled_up = DailyActivityStat.objects.filter(
+                day__gte=week_first_day, day__lte=rolled_end
+            ).aggregate(total=Sum("scan_count"))["total"] or 0
+            live_from = rolled_end + datetime.timedelta(days=1)
+        scans = QRScan.objects.aggregate(
+            total=Count("id"),
+            today=Count("id", filter=Q(scanned_at__gte=today_start)),
+            week_live=Count("id", filter=Q(scanned_at__gte=_local_day_start(live_from))),
+            hours=Sum("activity__hours_reward"),
+        )
+
+        return {
+            "total_users": users["total"],
+            "new_users_today": users["today"],
+            "new_users_week": users["week"],
+            "total_activities": activities["total"],
+            "activities_upcoming": activities["upcoming"],
+            "activities_ongoing": activities["ongoing"],
+            "activities_completed": activities["completed"],
+            "total_qr_scans": scans["total"],
+            "qr_scans_today": scans["today"],
+            "qr_scans_week": scans_rolled_up + scans["week_live"],
+            # Calculate total hours from QR scans (actual volunteer hours)
+            "total_hours": scans["hours"] or Decimal("0"),
+            "total_signups": ActivitySignup.objects.count(),
+            "pending_ideas": IdeaProposal.objects.filter(status="pending").count(),
+            "computed_at": timezone.now(),
+        }
@@ -0,0 +1,123 @@
+"""Run QR photo decoding off the request thread.
+
+``submit_decode`` hands the image bytes to a bounded pool and returns a job
+id straight away; the pool's done-callback writes the decoded text into the
+cache. Any web worker can then finish the job on the next status poll, so
+with more than one server process ``CACHES`` must be shared (e.g. Redis).
+
+Settings:
+    QR_DECODE_EXECUTOR   "process" (default) or "thread"
+    QR_DECODE_WORKERS    pool size (default: CPU count)
+    QR_DECODE_QUEUE_SIZE max jobs queued or running per process
+    QR_DECODE_JOB_TTL    seconds a job's state is kept in the cache
+"""
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .qr_decode import decode_qr_image
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+DECODED = "decoded"
+DONE = "done"
+
+_lock = threading.Lock()
+_executor = None
+_in_flight = 0
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _job_key(job_id: str) -> str:
+    return f"qr:job:{job_id}"
+
+
+def _ttl() -> int:
+    return getattr(settings, "QR_DECODE_JOB_TTL", 600)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, "QR_DECODE_WORKERS", None) or os.cpu_count() or 2
+        if getattr(settings, "QR_DECODE_EXECUTOR", "process") == "thread":
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qr-decode")
+        else:
+            _executor = ProcessPoolExecutor(max_workers=workers)
+    return _executor
+
+
+def shutdown_executor(wait: bool = True):
+    """Stop the pool (the next submit starts a fresh one with current settings)."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def submit_decode(image_data: bytes, user_id: int) -> str:
+    """Queue ``image_data`` for decoding and return the job id.
+
+    Raises ``QueueFull`` when this process already has
+    ``QR_DECODE_QUEUE_SIZE`` jobs queued or running.
+    """
+    global _in_flight
+    with _lock:
+        if _in_flight >= getattr(settings, "QR_DECODE_QUEUE_SIZE", 32):
+            raise QueueFull
+        _in_flight += 1
+        executor = _get_executor()
+
+    job_id = uuid.uuid4().hex
+    cache.set(_job_key(job_id), {"status": PENDING, "user_id": user_id}, _ttl())
+    try:
+        future = executor.submit(decode_qr_image, image_data, getattr(settings, "QR_DECODE_MAX_SIDE", 1600))
+    except Exception:
+        _finished()
+        cache.delete(_job_key(job_id))
+        raise
+    future.add_done_callback(lambda f: _store_decoded(job_id, user_id, f))
+    return job_id
+
+
+def _finished():
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+
+
+def _store_decoded(job_id: str, user_id: int, future):
+    _finished()
+    try:
+        result = future.result()
+        state = {"status": DECODED, "user_id": user_id, "ok": result.ok, "data": result.data,
+                 "error": result.error, "timings": result.timings}
+    except Exception as exc:  # worker crashed or pool broke
+        logger.warning("QR decode job %s failed: %s", job_id, exc)
+        state = {"status": DECODED, "user_id": user_id, "ok": False, "data": None,
+                 "error": f"เกิดข้อผิดพลาดในการอ่าน QR code: {exc}", "timings": {}}
+    cache.set(_job_key(job_id), state, _ttl())
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    return cache.get(_job_key(job_id))
+
+
+def claim_job(job_id: str) -> bool:
+    """Let exactly one status poll turn a decoded job into its final response."""
+    return cache.add(f"{_job_key(job_id)}:claim", 1, _ttl())
+
+
+def finish_job(job_id: str, user_id: int, response: dict):
+    cache.set(_job_key(job_id), {"status": DONE, "user_id": user_id, "response": response}, _ttl())
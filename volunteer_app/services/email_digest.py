@@ -0,0 +1,64 @@
+"""Coalesce held email notifications into one digest per user.
+
+Users whose ``NotificationPreference.email_digest`` is ``hourly`` or
+``daily`` get no email per notification. ``notify_users`` stores an
+``EmailDigestItem`` instead, and ``send_digests`` (run by the scheduled
+``send_email_digests`` command) groups the items by user and category. It
+renders one message per user from ``emails/notification_digest.txt`` and
+queues them all in ``EmailOutbox`` with a single insert.
+
+The hourly run also flushes items left behind by users who have since
+switched back to ``immediate``. Items of users who turned email off are
+dropped.
+"""
+from collections import defaultdict
+from itertools import groupby
+
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from ..models import EmailDigestItem, Notification
+from .email_outbox import enqueue_emails
+
+# which preference values each scheduled run delivers
+FREQUENCY_PREFS = {
+    "hourly": ("hourly", "immediate"),
+    "daily": ("daily",),
+}
+PERIOD_LABELS = {"hourly": "รายชั่วโมง", "daily": "รายวัน"}
+CATEGORY_LABELS = dict(Notification.CATEGORY_CHOICES)
+
+
+def send_digests(frequency: str) -> int:
+    """Queue one digest email per user for the ``frequency`` run; returns the number queued."""
+    with transaction.atomic():
+        items = list(
+            EmailDigestItem.objects.filter(user__notification_pref__email_digest__in=FREQUENCY_PREFS[frequency])
+            .select_related("user", "user__notification_pref")
+            .order_by("user_id", "category", "created_at", "id")
+        )
+        if not items:
+            return 0
+        messages, user_ids = [], []
+        for user_id, user_items in groupby(items, key=lambda item: item.user_id):
+            user_items = list(user_items)
+            user = user_items[0].user
+            if not (user.email and user.notification_pref.email_enabled):
+                continue
+            sections = defaultdict(list)
+            for item in user_items:
+                sections[item.category].append(item)
+            body = render_to_string("emails/notification_digest.txt", {
+                "user": user,
+                "period": PERIOD_LABELS[frequency],
+                "count": len(user_items),
+                "sections": [
+                    {"label": CATEGORY_LABELS.get(category, category), "items": category_items}
+                    for category, category_items in sections.items()
+                ],
+            })
+            messages.append((user.email, f"สรุปการแจ้งเตือน{PERIOD_LABELS[frequency]} ({len(user_items)} รายการ)", body))
+            user_ids.append(user_id)
+        enqueue_emails(messages, user_ids=user_ids)
+        EmailDigestItem.objects.filter(id__in=[item.id for item in items]).delete()
+    return len(messages)
@@ -0,0 +1,105 @@
+"""Queue notification emails and deliver them outside the request.
+
+Notification code calls ``enqueue_emails``, which costs one INSERT no matter
+how many recipients there are. The ``deliver_emails`` command drains the
+queue with ``deliver_pending``. Each batch is sent over one connection from
+``get_connection()``, opened once and reused for every message. A message
+that fails is retried later with exponential backoff: after its n-th
+failure it waits ``EMAIL_OUTBOX_RETRY_DELAY`` * 2^(n-1) seconds, so the
+first retry comes after the base delay. After
+``EMAIL_OUTBOX_MAX_ATTEMPTS`` failures it stays ``failed`` with the last
+error kept for the admin.
+
+Rows are claimed by pushing their ``next_attempt_at`` forward by
+``EMAIL_OUTBOX_LEASE``, so two workers do not send the same batch. If a
+worker dies mid-batch, its rows become due again once the lease runs out.
+"""
+import logging
+from datetime import timedelta
+from typing import Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from ..models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_emails(messages: Iterable[Tuple], user_ids: Optional[Iterable] = None) -> int:
+    """Queue ``(to_email, subject, body)`` tuples; ``user_ids`` (same order) links rows to users."""
+    user_ids = list(user_ids) if user_ids is not None else None
+    rows = [
+        EmailOutbox(to_email=to_email, subject=subject[:255], body=body,
+                    user_id=user_ids[i] if user_ids is not None else None)
+        for i, (to_email, subject, body) in enumerate(messages)
+    ]
+    EmailOutbox.objects.bulk_create(rows)
+    return len(rows)
+
+
+def _claim(batch_size: int, now):
+    due = list(
+        EmailOutbox.objects.filter(status="pending", next_attempt_at__lte=now)
+        .order_by("next_attempt_at", "id")
+        .values_list("id", flat=True)[:batch_size]
+    )
+    if not due:
+        return []
+    lease = now + timedelta(seconds=_setting("EMAIL_OUTBOX_LEASE", 300))
+    # only rows still due are ours; another worker may have claimed some in between
+    EmailOutbox.objects.filter(id__in=due, status="pending", next_attempt_at__lte=now).update(next_attempt_at=lease)
+    return list(EmailOutbox.objects.filter(id__in=due, next_attempt_at=lease).order_by("id"))
+
+
+def deliver_pending(batch_size: int = 100, now=None, connection=None) -> Tuple[int, int]:
+    """Send one batch of due emails over a single connection; returns ``(sent, failed)``."""
+    now = now or timezone.now()
+    rows = _claim(batch_size, now)
+    if not rows:
+        return 0, 0
+
+    from_email = _setting("DEFAULT_FROM_EMAIL", "noreply@example.com")
+    max_attempts = _setting("EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+    retry_delay = _setting("EMAIL_OUTBOX_RETRY_DELAY", 60)
+    connection = connection or get_connection()
+    sent_ids, failed = [], []
+    try:
+        connection.open()
+    except Exception as exc:
+        # mail server unreachable: every row in the batch counts as a failed attempt
+        logger.warning("เชื่อมต่อเซิร์ฟเวอร์อีเมลไม่สำเร็จ: %s", exc)
+        failed = [(row, exc) for row in rows]
+    else:
+        try:
+            for row in rows:
+                message = EmailMessage(row.subject, row.body, from_email, [row.to_email], connection=connection)
+                try:
+                    connection.send_messages([message])
+                except Exception as exc:
+                    failed.append((row, exc))
+                else:
+                    sent_ids.append(row.id)
+        finally:
+            connection.close()
+
+    if sent_ids:
+        EmailOutbox.objects.filter(id__in=sent_ids).update(status="sent", sent_at=timezone.now(), last_error="")
+    for row, exc in failed:
+        row.attempts += 1
+        row.last_error = str(exc)[:1000]
+        if row.attempts >= max_attempts:
+            row.status = "failed"
+        else:
+            row.next_attempt_at = now + timedelta(seconds=retry_delay * 2 ** (row.attempts - 1))
+    if failed:
+        EmailOutbox.objects.bulk_update(
+            [row for row, _ in failed], ["attempts", "last_error", "status", "next_attempt_at"]
+        )
+        logger.warning("ส่งอีเมลไม่สำเร็จ %d ฉบับ (จะลองใหม่ภายหลัง)", len(failed))
+    return len(sent_ids), len(failed)
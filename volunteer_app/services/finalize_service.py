@@ -0,0 +1,122 @@
+"""Close finished activities in bulk.
+
+``finalize_activities`` runs after an event ends (management command
+``finalize_activities`` or the "close activity" admin action). For every
+given activity it:
+
+1. checks out everyone who checked in but never out, at the activity's end
+   (``datetime + hours_reward``, or now if that is still ahead). The time
+   worked is computed in SQL for all of them at once, and the rows are
+   written with one ``bulk_create``.
+2. moves signups with a scan or check-in to ``attended`` and the remaining
+   requested/confirmed ones to ``no_show``, with ``transition_signups``
+3. sets ``status="completed"``
+
+Steps 1-3 run in one transaction. Hours summaries, the daily rollups of
+past days and the dashboard are then refreshed, and each activity's auto-checked-out students get one
+batched notification. Running it again on a completed activity changes
+nothing.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable
+
+from django.db import transaction
+from django.db.models import Case, DateTimeField, DurationField, Exists, ExpressionWrapper, F, OuterRef, Value, When
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Activity, ActivitySignup, CheckInOut, QRScan, UserHoursSummary
+from .attendance_service import hours_between
+from .dashboard_service import DashboardSnapshot
+from .notification_service import notify_users
+from .reporting_service import reroll_days
+from .signup_service import transition_signups
+
+
+def activity_end(activity) -> datetime:
+    return activity.datetime + timedelta(hours=float(activity.hours_reward))
+
+
+def _open_checkins(ends: Dict[int, datetime]):
+    """Check-ins without a check-out, annotated with the time worked until their activity's end."""
+    end_time = Case(
+        *[When(activity_id=activity_id, then=Value(end)) for activity_id, end in ends.items()],
+        output_field=DateTimeField(),
+    )
+    checked_out = CheckInOut.objects.filter(
+        activity_id=OuterRef("activity_id"), user_id=OuterRef("user_id"), check_type="checkout"
+    )
+    return (
+        CheckInOut.objects.filter(activity_id__in=list(ends), check_type="checkin")
+        .exclude(Exists(checked_out))
+        .annotate(worked=ExpressionWrapper(end_time - F("checked_at"), output_field=DurationField()))
+        .select_related("user")
+        .order_by()
+    )
+
+
+def finalize_activities(activity_ids: Iterable[int], now=None) -> Dict[int, dict]:
+    """Finalize the given activities; returns ``{activity_id: {"checked_out", "attended", "no_show"}}``.
+
+    Cancelled and already completed activities are skipped.
+    """
+    now = now or timezone.now()
+    activities = {
+        activity.pk: activity
+        for activity in Activity.objects.filter(pk__in=list(activity_ids)).exclude(status__in=("cancelled", "completed"))
+    }
+    if not activities:
+        return {}
+    ends = {pk: min(activity_end(activity), now) for pk, activity in activities.items()}
+    report = {pk: {"checked_out": 0, "attended": 0, "no_show": 0} for pk in activities}
+    checked_out_users = defaultdict(list)
+
+    with transaction.atomic():
+        checkouts = []
+        for checkin in _open_checkins(ends):
+            activity = activities[checkin.activity_id]
+            checkouts.append(CheckInOut(
+                activity_id=checkin.activity_id,
+                user_id=checkin.user_id,
+                check_type="checkout",
+                checked_at=ends[checkin.activity_id],
+                token="auto-checkout",
+                # same 0.1 h rule as a live check-out, on the duration the database worked out
+                calculated_hours=hours_between(now - checkin.worked, now, activity.hours_reward),
+            ))
+            checked_out_users[checkin.activity_id].append(checkin.user)
+            report[checkin.activity_id]["checked_out"] += 1
+        CheckInOut.objects.bulk_create(checkouts, ignore_conflicts=True)
+
+        present = Exists(QRScan.objects.filter(activity_id=OuterRef("activity_id"), user_id=OuterRef("user_id"))) | Exists(
+            CheckInOut.objects.filter(activity_id=OuterRef("activity_id"), user_id=OuterRef("user_id"))
+        )
+        signups = ActivitySignup.objects.filter(activity_id__in=list(activities))
+        attended = signups.filter(present).exclude(status="cancelled")
+        no_show = signups.filter(status__in=("requested", "confirmed")).exclude(present)
+        for activity_id in attended.exclude(status="attended").values_list("activity_id", flat=True):
+            report[activity_id]["attended"] += 1
+        for activity_id in no_show.values_list("activity_id", flat=True):
+            report[activity_id]["no_show"] += 1
+        transition_signups(attended, "attended")
+        transition_signups(no_show, "no_show")
+
+        Activity.objects.filter(pk__in=list(activities)).update(status="completed")
+
+        for activity_id, users in checked_out_users.items():
+            activity = activities[activity_id]
+            transaction.on_commit(lambda activity=activity, users=users: notify_users(
+                users,
+                "ระบบ check-out ให้อัตโนมัติ",
+                f"กิจกรรม \"{activity.title}\" สิ้นสุดแล้ว ระบบได้ check-out และบันทึกชั่วโมงจิตอาสาให้คุณ",
+                category="hours",
+                target_url=reverse("volunteer_app:profile"),
+            ))
+
+    if checkouts:
+        UserHoursSummary.rebuild(user_ids={c.user_id for c in checkouts})
+        # check-outs are stamped at the activity's end, possibly a day already rolled up
+        reroll_days(c.checked_at for c in checkouts)
+    DashboardSnapshot.mark_stale()
+    return report
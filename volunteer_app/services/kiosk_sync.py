@@ -0,0 +1,154 @@
+"""Sync scans queued by an offline staff kiosk.
+
+The kiosk page holds the activity token, scans student cards while offline
+and stores ``{id, token, student, scanned_at, device_id}`` entries locally.
+When it gets a connection it posts the whole queue here.
+
+``sync_kiosk_scans`` verifies each distinct token once (against the time the
+scan was taken, not the time it arrived), resolves students and signups with
+one ``IN`` query each and writes every ``QRScan``/``CheckInOut`` row in a
+single transaction. Check-out hours come from the client-recorded check-in
+and check-out times. Entries that are already stored report
+``already_recorded`` with ``ok`` set, so a kiosk may resend its queue as
+often as it likes.
+"""
+from datetime import timedelta
+from typing import Callable, Iterable, List, Optional
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import Activity, ActivitySignup, CheckInOut, QRScan
+from ..tokens import KIND_CHECKIN, KIND_QR, decode_token
+from .attendance_service import hours_between
+from .batch_ingest import resolve_users, write_attendance_rows
+
+# scans stamped further in the future than this are refused (kiosk clock drift)
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+MAX_BATCH = 500
+
+
+def _parse_scan_time(value):
+    scanned_at = parse_datetime(value) if isinstance(value, str) else None
+    if scanned_at is not None and timezone.is_naive(scanned_at):
+        scanned_at = timezone.make_aware(scanned_at)
+    return scanned_at
+
+
+def sync_kiosk_scans(
+    entries: Iterable[dict], device_id: str = "", can_manage: Optional[Callable[[Activity], bool]] = None
+) -> List[dict]:
+    """Record queued kiosk scans and return one result dict per entry, in input order.
+
+    ``can_manage(activity)`` (if given) decides whether the caller may record
+    for that activity; entries for other activities get ``not_allowed``.
+    """
+    now = timezone.now()
+    results, pending = [], []
+    for entry in entries:
+        result = {"id": str(entry.get("id") or ""), "ok": False}
+        results.append(result)
+        scanned_at = _parse_scan_time(entry.get("scanned_at"))
+        token, student = entry.get("token"), entry.get("student")
+        entry_device_id = entry.get("device_id") or ""
+        if not all(isinstance(value, str) for value in (token, student, entry_device_id)):
+            result["code"] = "invalid_entry"
+            continue
+        token, student = token.strip(), student.strip()
+        if scanned_at is None or not token or not student:
+            result["code"] = "invalid_entry"
+            continue
+        if scanned_at > now + MAX_CLOCK_SKEW:
+            result["code"] = "bad_timestamp"
+            continue
+        pending.append((result, entry, token, student, min(scanned_at, now)))
+
+    # the tokens on a kiosk rarely change, so verify each distinct one once
+    verified = {}
+    for result, entry, token, student, scanned_at in pending:
+        key = (token, int(scanned_at.timestamp()))
+        if key not in verified:
+            verified[key] = decode_token(token, now=key[1])
+    users = resolve_users(student for _, _, _, student, _ in pending)
+
+    accepted = []
+    for result, entry, token, student, scanned_at in pending:
+        token_result = verified[(token, int(scanned_at.timestamp()))]
+        if not token_result.ok:
+            result.update(code="invalid_token", message=token_result.error)
+            continue
+        user = users.get(student)
+        if user is None:
+            result.update(code="user_not_found", message="ไม่พบนักศึกษา (รหัสนักศึกษาหรือ username)")
+            continue
+        result.update(kind=token_result.kind, activity_id=token_result.activity_id, user=user.username)
+        accepted.append((result, entry, token, user, token_result.kind, scanned_at))
+
+    activity_ids = {r["activity_id"] for r, *_ in accepted}
+    user_ids = {user.pk for _, _, _, user, _, _ in accepted}
+    activities = Activity.objects.in_bulk(activity_ids)
+    signed_up = set(
+        ActivitySignup.objects.filter(activity_id__in=activity_ids, user_id__in=user_ids)
+        .values_list("activity_id", "user_id")
+    )
+    existing = set(
+        QRScan.objects.filter(activity_id__in=activity_ids, user_id__in=user_ids)
+        .values_list("activity_id", "user_id")
+    )
+    checked_in_at = {}
+    for activity_id, user_id, check_type, checked_at in (
+        CheckInOut.objects.filter(activity_id__in=activity_ids, user_id__in=user_ids)
+        .order_by().values_list("activity_id", "user_id", "check_type", "checked_at")
+    ):
+        existing.add((activity_id, user_id, check_type))
+        if check_type == "checkin":
+            checked_in_at[(activity_id, user_id)] = checked_at
+
+    scans, checks = {}, {}
+    allowed = {}  # activity id -> can_manage answer, asked once per activity
+    # oldest first so a check-in queued in the same batch precedes its check-out
+    for result, entry, token, user, kind, scanned_at in sorted(accepted, key=lambda item: item[5]):
+        activity = activities.get(result["activity_id"])
+        if activity is None or activity.status == "cancelled":
+            result["code"] = "activity_not_found" if activity is None else "activity_cancelled"
+            continue
+        if can_manage is not None and activity.pk not in allowed:
+            allowed[activity.pk] = can_manage(activity)
+        if can_manage is not None and not allowed[activity.pk]:
+            result.update(code="not_allowed", message="ไม่มีสิทธิ์บันทึกการเข้าร่วมของกิจกรรมนี้")
+            continue
+        pair = (activity.pk, user.pk)
+        if pair not in signed_up:
+            result["code"] = "not_signed_up"
+            continue
+        key = pair if kind == KIND_QR else pair + ("checkin" if kind == KIND_CHECKIN else "checkout",)
+        if key in existing or key in scans or key in checks:
+            result.update(ok=True, code="already_recorded")
+            continue
+
+        row_device_id = (entry.get("device_id") or device_id or "")[:128] or None
+        if kind == KIND_QR:
+            scans[key] = QRScan(
+                activity=activity, user=user, token=token, scanned_at=scanned_at,
+                device_id=row_device_id, scanned_from_staff=True,
+            )
+        elif key[2] == "checkin":
+            checks[key] = CheckInOut(
+                activity=activity, user=user, check_type="checkin", token=token,
+                checked_at=scanned_at, device_id=row_device_id,
+            )
+            checked_in_at[pair] = scanned_at
+        else:
+            if pair not in checked_in_at:
+                result["code"] = "not_checked_in"
+                continue
+            hours = hours_between(checked_in_at[pair], scanned_at, activity.hours_reward)
+            checks[key] = CheckInOut(
+                activity=activity, user=user, check_type="checkout", token=token,
+                checked_at=scanned_at, device_id=row_device_id, calculated_hours=hours,
+            )
+            result["calculated_hours"] = float(hours)
+        result.update(ok=True, code="recorded")
+
+    write_attendance_rows(scans, checks)
+    return results
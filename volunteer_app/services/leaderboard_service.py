@@ -0,0 +1,127 @@
+import datetime
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import CheckInOut, QRScan
+
+LEADERBOARD_CACHE_PREFIX = "leaderboard:top_volunteers"
+HOURS_FIELD = DecimalField(max_digits=10, decimal_places=2)
+
+
+def _day_start(day: datetime.date) -> datetime.datetime:
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _in_range(qs, field: str, date_from: Optional[datetime.date], date_to: Optional[datetime.date]):
+    # Half-open datetime ranges keep the (user, <time>) lookups index friendly,
+    # unlike ``__date`` which wraps the column in a function call.
+    if date_from:
+        qs = qs.filter(**{f"{field}__gte": _day_start(date_from)})
+    if date_to:
+        qs = qs.filter(**{f"{field}__lt": _day_start(date_to + datetime.timedelta(days=1))})
+    return qs
+
+
+def _per_user(qs, aggregate, output_field):
+    """Correlated subquery returning one aggregate for ``OuterRef('pk')``."""
+    return Subquery(
+        qs.filter(user=OuterRef("pk"))
+        .order_by()
+        .values("user")
+        .annotate(value=aggregate)
+        .values("value")[:1],
+        output_field=output_field,
+    )
+
+
+def leaderboard_queryset(
+    *,
+    faculty: Optional[str] = None,
+    department: Optional[str] = None,
+    year: Optional[int] = None,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+):
+    """Users annotated with ``qr_hours``, ``checkout_hours``, ``hours_total`` and ``scan_count``.
+
+    Everything is computed by the database in one statement; only users with
+    hours in the selected range are returned, best first.
+    """
+    scans = _in_range(QRScan.objects.all(), "scanned_at", date_from, date_to)
+    checkouts = _in_range(
+        CheckInOut.objects.filter(check_type="checkout", calculated_hours__isnull=False),
+        "checked_at",
+        date_from,
+        date_to,
+    )
+    zero = Value(0, output_field=HOURS_FIELD)
+
+    users = get_user_model().objects.all()
+    if faculty:
+        users = users.filter(faculty=faculty)
+    if department:
+        users = users.filter(department=department)
+    if year:
+        users = users.filter(year=year)
+
+    return (
+        users.annotate(
+            qr_hours=Coalesce(_per_user(scans, Sum("activity__hours_reward"), HOURS_FIELD), zero),
+            checkout_hours=Coalesce(_per_user(checkouts, Sum("calculated_hours"), HOURS_FIELD), zero),
+            scan_count=Coalesce(_per_user(scans, Count("id"), IntegerField()), Value(0)),
+        )
+        .annotate(hours_total=Coalesce("qr_hours", zero) + Coalesce("checkout_hours", zero))
+        .filter(hours_total__gt=0)
+        .order_by("-hours_total", "username")
+    )
+
+
+def _cache_key(limit, **filters) -> str:
+    parts = [str(limit)] + [f"{name}={filters[name] or ''}" for name in sorted(filters)]
+    return f"{LEADERBOARD_CACHE_PREFIX}:" + "|".join(parts)
+
+
+def top_volunteers(
+    limit: int = 10,
+    *,
+    faculty: Optional[str] = None,
+    department: Optional[str] = None,
+    year: Optional[int] = None,
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+    use_cache: bool = True,
+) -> list:
+    """Return the top ``limit`` volunteers as ``{"user", "total_hours", "scan_count"}`` dicts.
+
+    Results are cached for ``LEADERBOARD_CACHE_TTL`` seconds per filter combination.
+    """
+    filters = {
+        "faculty": faculty,
+        "department": department,
+        "year": year,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+    key = _cache_key(limit, **filters)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    rows = [
+        {
+            "user": user,
+            "total_hours": float(user.hours_total),
+            "scan_count": user.scan_count,
+        }
+        for user in leaderboard_queryset(**filters)[:limit]
+    ]
+    if use_cache:
+        cache.set(key, rows, getattr(settings, "LEADERBOARD_CACHE_TTL", 300))
+    return rows
@@ -1,12 +1,15 @@
 import logging
-from typing import Optional, Sequence
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
 
 from django.conf import settings
-from django.core.mail import send_mail
+from django.db.models import Q, QuerySet
 from django.urls import reverse
 from django.utils import timezone
 
-from ..models import Notification, NotificationPreference
+from ..models import EmailDigestItem, Notification, NotificationPreference
+from . import unread_counter
+from .email_outbox import enqueue_emails
 
 logger = logging.getLogger(__name__)
 
@@ -51,61 +54,165 @@ def notify_user(
     """
     if not user or not user.is_authenticated:
         return None
+    notifications = notify_users(
+        [user], title, message,
+        category=category, target_url=target_url, channel=channel,
+        extra_data=extra_data, email_override=email_override,
+    )
+    return notifications[0] if notifications else None
+
+
+def _chunked(users, size: int):
+    """Yield lists of at most ``size`` users; querysets are walked by primary key."""
+    if isinstance(users, QuerySet):
+        users = users.order_by("pk")
+        last_pk = None
+        while True:
+            page = users if last_pk is None else users.filter(pk__gt=last_pk)
+            chunk = list(page[:size])
+            if chunk:
+                yield chunk
+            if len(chunk) < size:
+                return
+            last_pk = chunk[-1].pk
+    else:
+        users = [u for u in users if u is not None]
+        for start in range(0, len(users), size):
+            yield users[start:start + size]
+
+
+def _load_prefs(users) -> dict:
+    prefs = {
+        pref.user_id: pref
+        for pref in NotificationPreference.objects.filter(user__in=[u.pk for u in users])
+    }
+    missing = [NotificationPreference(user=u) for u in users if u.pk not in prefs]
+    if missing:
+        NotificationPreference.objects.bulk_create(missing, ignore_conflicts=True)
+        prefs.update((pref.user_id, pref) for pref in missing)
+    return prefs
+
+
+def notify_users(
+    users: Union[Iterable, QuerySet],
+    title: str,
+    message: str,
+    *,
+    category: str = "general",
+    target_url: Optional[str] = None,
+    channel: str = "in_app",
+    extra_data: Optional[dict] = None,
+    email_override: bool = False,
+    batch_size: Optional[int] = None,
+) -> List[Notification]:
+    """
+    แจ้งเตือนผู้ใช้หลายคนพร้อมกัน: โหลด preference ครั้งละ batch,
+    สร้างแจ้งเตือนด้วย bulk_create และเข้าคิวอีเมลทั้งหมดใน EmailOutbox
+    (ส่งจริงโดย ``manage.py deliver_emails``) ผู้ใช้ที่เลือกรับอีเมลแบบสรุป
+    จะถูกเก็บเป็น EmailDigestItem รอ ``manage.py send_email_digests`` แทน
 
-    pref = get_or_create_pref(user)
+    ``users`` เป็น list หรือ QuerySet ของ User ก็ได้ (QuerySet จะถูกอ่านทีละ
+    ``NOTIFY_BATCH_SIZE`` แถว) ใช้ 2-3 query ต่อ batch ไม่ว่าจะมีผู้รับกี่คน
+    """
+    batch_size = batch_size or getattr(settings, "NOTIFY_BATCH_SIZE", 500)
+    attr = CATEGORY_PREF_MAP.get(category)
+    created = []
+    emails = []
+    digest_user_ids = []
+    for chunk in _chunked(users, batch_size):
+        prefs = _load_prefs(chunk)
+        notifications = []
+        for user in chunk:
+            pref = prefs[user.pk]
+            category_enabled = not attr or getattr(pref, attr, True)
+            send_in_app = category_enabled and channel in ("in_app", "both") and pref.in_app_enabled
+            if email_override:
+                send_email_flag = pref.email_enabled
+            else:
+                send_email_flag = category_enabled and channel in ("email", "both") and pref.email_enabled
+            send_email_flag = send_email_flag and bool(user.email)
+            if send_in_app:
+                notifications.append(Notification(
+                    user=user,
+                    title=title,
+                    message=message,
+                    category=category,
+                    target_url=target_url or "",
+                    data=extra_data or {},
+                    channel="both" if send_email_flag else "in_app",
+                ))
+            if send_email_flag and pref.email_digest != "immediate" and not email_override:
+                digest_user_ids.append(user.pk)
+            elif send_email_flag:
+                emails.append((user.pk, user.email))
+        created.extend(Notification.objects.bulk_create(notifications))
+        # bulk_create skips post_save, so count the new rows here
+        unread_counter.adjust_many(n.user_id for n in notifications)
 
-    send_in_app = channel in ("in_app", "both") and pref.in_app_enabled
-    send_email_flag = channel in ("email", "both") and pref.email_enabled
+    email_body = message
+    if target_url:
+        email_body += f"\n\nดูรายละเอียดเพิ่มเติม: {target_url}"
+    if emails:
+        _queue_email_notification(emails, title, email_body)
+    if digest_user_ids:
+        EmailDigestItem.objects.bulk_create([
+            EmailDigestItem(user_id=user_id, category=category, subject=title[:255], body=email_body)
+            for user_id in digest_user_ids
+        ])
+    return created
 
-    attr = CATEGORY_PREF_MAP.get(category)
-    if attr and not getattr(pref, attr, True):
-        send_in_app = False
-        send_email_flag = False
 
-    if email_override:
-        send_email_flag = pref.email_enabled
+def _queue_email_notification(recipients: Sequence, subject: str, email_body: str):
+    """Queue one email per ``(user_id, email)`` recipient; ``deliver_emails`` sends them."""
+    enqueue_emails(
+        [(email, subject, email_body) for _, email in recipients],
+        user_ids=[user_id for user_id, _ in recipients],
+    )
 
-    if not (send_in_app or send_email_flag):
-        return None
 
-    notif = None
-    if send_in_app:
-        notif = Notification.objects.create(
-            user=user,
-            title=title,
-            message=message,
-            category=category,
-            target_url=target_url or "",
-            data=extra_data or {},
-            channel="both" if send_email_flag else "in_app",
-        )
+def mark_notifications_read(user, notification_ids: Optional[Sequence[int]] = None):
+    qs = user.notifications.filter(is_read=False)
+    if notification_ids:
+        qs = qs.filter(id__in=notification_ids)
+    unread_counter.adjust(user.pk, -qs.update(is_read=True, read_at=timezone.now()))
 
-    if send_email_flag and user.email:
-        _send_email_notification(user.email, title, message, target_url)
 
-    return notif
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
 
 
-def _send_email_notification(recipient: str, subject: str, message: str, target_url: Optional[str]):
-    email_body = message
-    if target_url:
-        email_body += f"\n\nดูรายละเอียดเพิ่มเติม: {target_url}"
+def encode_cursor(notification: Notification) -> str:
+    """Opaque position after ``notification``: ``<created_at in µs>_<id>``."""
+    micros = (notification.created_at - _EPOCH) // timedelta(microseconds=1)
+    return f"{micros}_{notification.pk}"
+
 
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
     try:
-        send_mail(
-            subject=subject,
-            message=email_body,
-            from_email=getattr(settings, "DEFAULT_FROM_EMAIL", "noreply@example.com"),
-            recipient_list=[recipient],
-            fail_silently=True,
-        )
-    except Exception as exc:  # pragma: no cover - logging only
-        logger.warning("ส่งอีเมลแจ้งเตือนไม่สำเร็จ: %s", exc)
+        micros, pk = cursor.split("_")
+        return _EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
 
 
-def mark_notifications_read(user, notification_ids: Optional[Sequence[int]] = None):
-    qs = user.notifications.filter(is_read=False)
-    if notification_ids:
-        qs = qs.filter(id__in=notification_ids)
-    qs.update(is_read=True, read_at=timezone.now())
+def notification_page(
+    user, cursor: Optional[str] = None, *, unread_only: bool = False, limit: Optional[int] = None
+) -> Tuple[List[Notification], Optional[str]]:
+    """
+    หน้าหนึ่งของกล่องแจ้งเตือน (ใหม่สุดก่อน) และ cursor ของหน้าถัดไป (None ถ้าหมดแล้ว)
 
+    ใช้ keyset pagination บน (created_at, id) แทน OFFSET และไม่นับจำนวนทั้งหมด
+    ทุกหน้าจึงเป็น index range scan เดียวบน (user, [is_read,] -created_at, -id)
+    ไม่ว่ากล่องจะมีกี่แถว cursor ที่อ่านไม่ออกจะเริ่มจากหน้าแรก
+    """
+    limit = limit or getattr(settings, "NOTIFICATION_PAGE_SIZE", 20)
+    qs = Notification.objects.filter(user=user)
+    if unread_only:
+        qs = qs.filter(is_read=False)
+    position = decode_cursor(cursor)
+    if position is not None:
+        created_at, pk = position
+        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    # one extra row tells us whether another page exists
+    rows = list(qs.order_by("-created_at", "-id")[:limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
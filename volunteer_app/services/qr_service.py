@@ -0,0 +1,78 @@
+"""Render QR images once and serve repeats from a bounded cache.
+
+Rendering with ``qrcode`` is pure Python and costs tens of milliseconds per
+image, so the bytes are kept in a small per-process LRU and, behind it, in
+the configured Django cache so other workers can reuse them.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.core.cache import cache
+
+QR_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+_lock = threading.Lock()
+_renders: "OrderedDict[tuple, bytes]" = OrderedDict()
+
+
+def _local_size() -> int:
+    return getattr(settings, "QR_RENDER_CACHE_SIZE", 256)
+
+
+def _cache_key(data: str, size: int, fmt: str) -> str:
+    digest = hashlib.sha1(f"{fmt}:{size}:{data}".encode()).hexdigest()
+    return f"qr:render:{digest}"
+
+
+def _render(data: str, size: int, fmt: str) -> bytes:
+    buffer = BytesIO()
+    if fmt == "svg":
+        image = qrcode.make(data, box_size=size, image_factory=qrcode.image.svg.SvgPathImage)
+        image.save(buffer)
+    else:
+        image = qrcode.make(data, box_size=size)
+        image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def render_qr(data: str, *, size: int = 10, fmt: str = "png", timeout: int = None) -> bytes:
+    """Return the encoded QR image for ``data`` (usually a URL embedding a token).
+
+    ``timeout`` bounds how long the shared cache keeps the bytes; pass the
+    token lifetime so images never outlive the token they encode.
+    """
+    if fmt not in QR_FORMATS:
+        raise ValueError(f"unsupported QR format: {fmt}")
+    key = (data, size, fmt)
+    with _lock:
+        image = _renders.get(key)
+        if image is not None:
+            _renders.move_to_end(key)
+            return image
+
+    shared_key = _cache_key(data, size, fmt)
+    image = cache.get(shared_key)
+    if image is None:
+        image = _render(data, size, fmt)
+        cache.set(shared_key, image, timeout if timeout is not None else getattr(settings, "QR_RENDER_CACHE_TTL", 900))
+
+    with _lock:
+        _renders[key] = image
+        _renders.move_to_end(key)
+        while len(_renders) > _local_size():
+            _renders.popitem(last=False)
+    return image
+
+
+def clear_render_cache():
+    """Drop the per-process LRU (the shared cache entries expire by themselves)."""
+    with _lock:
+        _renders.clear()
@@ -0,0 +1,61 @@
+"""Answer repeat scans from a cache instead of the database.
+
+Students double-tap, rescan and refresh. Once a QR confirm, check-in or
+check-out has been recorded, the "already ..." reply for that
+``(activity, user, kind)`` is kept in the ``recent_scans`` cache alias
+(bounded, with a TTL; see ``RECENT_SCAN_TTL`` and ``RECENT_SCAN_CACHE_SIZE``).
+Deleting a ``QRScan`` or ``CheckInOut`` row clears its entry through the
+model's ``post_delete`` signal, so with more than one server process the
+alias must point at a shared cache (e.g. Redis).
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from ..tokens import KIND_CHECKIN, KIND_CHECKOUT, KIND_QR
+
+# check_type on CheckInOut -> token kind
+CHECK_TYPE_KINDS = {"checkin": KIND_CHECKIN, "checkout": KIND_CHECKOUT}
+
+# code of a fresh write -> code of every repeat after it
+REPEAT_CODES = {
+    "success": "already_attended",
+    "checkin_success": "already_checked_in",
+    "checkout_success": "already_checked_out",
+    "already_attended": "already_attended",
+    "already_checked_in": "already_checked_in",
+    "already_checked_out": "already_checked_out",
+}
+
+
+def _cache():
+    return caches[getattr(settings, "RECENT_SCAN_CACHE", "recent_scans")]
+
+
+def _key(activity_id: int, user_id: int, kind: str) -> str:
+    return f"{kind}:{activity_id}:{user_id}"
+
+
+def get(activity_id: int, user_id: int, kind: str):
+    """The cached repeat reply (an ``AttendanceResult``) or None."""
+    return _cache().get(_key(activity_id, user_id, kind))
+
+
+def remember(user_id: int, kind: str, result):
+    """Store the repeat form of a recorded or already-recorded ``result``."""
+    code = REPEAT_CODES.get(result.code)
+    if code is not None:
+        _cache().set(_key(result.activity.pk, user_id, kind), result._replace(code=code))
+
+
+def forget(activity_id: int, user_id: int, kind: str):
+    _cache().delete(_key(activity_id, user_id, kind))
+
+
+def forget_row(row):
+    """Drop the entry for a deleted ``QRScan`` or ``CheckInOut``."""
+    kind = CHECK_TYPE_KINDS[row.check_type] if hasattr(row, "check_type") else KIND_QR
+    forget(row.activity_id, row.user_id, kind)
+
+
+def clear():
+    _cache().clear()
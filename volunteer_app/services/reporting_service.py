@@ -0,0 +1,229 @@
+import datetime
+from decimal import Decimal
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import CheckInOut, DailyActivityStat, QRScan
+from .dashboard_service import DashboardSnapshot
+
+DEFAULT_CHUNK_DAYS = 31
+PERIOD_DAYS = {"week": 7, "month": 30}
+
+
+def _day_start(day: datetime.date) -> datetime.datetime:
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _window(qs, field: str, start: datetime.date, end: datetime.date):
+    """Rows whose ``field`` falls on local days ``start``..``end`` (inclusive)."""
+    return qs.filter(**{
+        f"{field}__gte": _day_start(start),
+        f"{field}__lt": _day_start(end + datetime.timedelta(days=1)),
+    })
+
+
+def _grouped(qs, field: str, **aggregates):
+    return (
+        qs.annotate(day=TruncDate(field))
+        .order_by()
+        .values("day", "activity_id", "user__faculty")
+        .annotate(**aggregates)
+    )
+
+
+def _collect(start: datetime.date, end: datetime.date, faculty: Optional[str] = None) -> dict:
+    """Aggregate raw rows of ``start``..``end`` into ``{(day, activity_id, faculty): counters}``.
+
+    ``faculty`` limits the rows to students of that faculty.
+    """
+    rows = {}
+    students = {"user__faculty": faculty} if faculty else {}
+
+    def bucket(row):
+        key = (row["day"], row["activity_id"], row["user__faculty"] or "")
+        return rows.setdefault(key, {
+            "scan_count": 0,
+            "checkin_count": 0,
+            "checkout_count": 0,
+            "hours_earned": Decimal("0"),
+        })
+
+    scans = _window(QRScan.objects.filter(**students), "scanned_at", start, end)
+    for row in _grouped(scans, "scanned_at", n=Count("id"), hours=Sum("activity__hours_reward")):
+        counters = bucket(row)
+        counters["scan_count"] += row["n"]
+        counters["hours_earned"] += row["hours"] or Decimal("0")
+
+    checks = _window(CheckInOut.objects.filter(**students), "checked_at", start, end)
+    for row in _grouped(checks.filter(check_type="checkin"), "checked_at", n=Count("id")):
+        bucket(row)["checkin_count"] += row["n"]
+    for row in _grouped(checks.filter(check_type="checkout"), "checked_at", n=Count("id"), hours=Sum("calculated_hours")):
+        counters = bucket(row)
+        counters["checkout_count"] += row["n"]
+        counters["hours_earned"] += row["hours"] or Decimal("0")
+    return rows
+
+
+def rollup_days(start: datetime.date, end: datetime.date, chunk_days: int = DEFAULT_CHUNK_DAYS) -> int:
+    """(Re)build rollups for ``start``..``end`` and return the number of rows written.
+
+    Each chunk of days is replaced atomically, so re-running a range is idempotent.
+    """
+    written = 0
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + datetime.timedelta(days=chunk_days - 1), end)
+        stats = [
+            DailyActivityStat(day=day, activity_id=activity_id, faculty=faculty, **counters)
+            for (day, activity_id, faculty), counters in _collect(chunk_start, chunk_end).items()
+        ]
+        with transaction.atomic():
+            DailyActivityStat.objects.filter(day__gte=chunk_start, day__lte=chunk_end).delete()
+            DailyActivityStat.objects.bulk_create(stats, batch_size=500)
+        written += len(stats)
+        chunk_start = chunk_end + datetime.timedelta(days=1)
+    DashboardSnapshot.mark_stale()
+    return written
+
+
+def first_event_day() -> Optional[datetime.date]:
+    """Local date of the oldest scan or check-in/out, or ``None`` with no data."""
+    candidates = [
+        QRScan.objects.aggregate(first=Min("scanned_at"))["first"],
+        CheckInOut.objects.aggregate(first=Min("checked_at"))["first"],
+    ]
+    candidates = [value for value in candidates if value]
+    return timezone.localdate(min(candidates)) if candidates else None
+
+
+def pending_days():
+    """Return ``(start, end)`` of complete days not rolled up yet, or ``None``.
+
+    The last rolled-up day is included again in case it was rolled up while
+    still in progress; today is never rolled up (reports read it live).
+    Rows written later into earlier days are handled by ``reroll_days``.
+    """
+    yesterday = timezone.localdate() - datetime.timedelta(days=1)
+    last = DailyActivityStat.objects.aggregate(last=Max("day"))["last"]
+    start = last or first_event_day()
+    if start is None or start > yesterday:
+        return None
+    return start, yesterday
+
+
+def rolled_up_through() -> Optional[datetime.date]:
+    """Last day the rollups cover (never today), or ``None`` before the first rollup.
+
+    Readers take days up to here from ``DailyActivityStat`` and count any
+    later day live, so a missed or not-yet-run rollup never reads as zero.
+    """
+    last = DailyActivityStat.objects.aggregate(last=Max("day"))["last"]
+    if last is None:
+        return None
+    return min(last, timezone.localdate() - datetime.timedelta(days=1))
+
+
+def reroll_days(moments) -> int:
+    """Rebuild the rollups of already rolled-up days that ``moments`` fall on.
+
+    ``pending_days`` only moves forward, so writers that store rows in the
+    past (kiosk sync, photo batches, finalize) call this with the times they
+    wrote. Days not rolled up yet are left to the nightly job.
+    """
+    today = timezone.localdate()
+    days = sorted({timezone.localdate(moment) for moment in moments} - {today})
+    if not days:
+        return 0  # the usual case, rows of today: nothing to look up
+    rolled_end = rolled_up_through()
+    if rolled_end is None:
+        return 0
+    return sum(rollup_days(day, day) for day in days if day <= rolled_end)
+
+
+def period_bounds(period: str, today: Optional[datetime.date] = None):
+    """Return ``(start, end)`` dates for ``week``, ``month`` or ``semester``."""
+    today = today or timezone.localdate()
+    if period == "semester":
+        start_months = sorted(getattr(settings, "SEMESTER_START_MONTHS", (6, 11)))
+        year, month = today.year, None
+        for candidate in reversed(start_months):
+            if candidate <= today.month:
+                month = candidate
+                break
+        if month is None:
+            year, month = year - 1, start_months[-1]
+        return datetime.date(year, month, 1), today
+    days = PERIOD_DAYS.get(period)
+    if days is None:
+        raise ValueError(f"Unknown period: {period}")
+    return today - datetime.timedelta(days=days), today
+
+
+def period_stats(start: datetime.date, end: datetime.date, faculty: Optional[str] = None) -> dict:
+    """Totals for ``start``..``end``: rollups for rolled-up days, live range queries after them.
+
+    ``faculty`` limits both parts to students of that faculty.
+    """
+    today = timezone.localdate()
+    rolled_end = rolled_up_through()
+    totals = {"scan_count": 0, "checkin_count": 0, "checkout_count": 0, "hours_earned": 0}
+    if rolled_end is not None and rolled_end >= start:
+        rolled = DailyActivityStat.objects.filter(day__gte=start, day__lte=min(end, rolled_end))
+        if faculty:
+            rolled = rolled.filter(faculty=faculty)
+        rolled = rolled.aggregate(
+            scan_count=Sum("scan_count"),
+            checkin_count=Sum("checkin_count"),
+            checkout_count=Sum("checkout_count"),
+            hours_earned=Sum("hours_earned"),
+        )
+        totals = {key: value or 0 for key, value in rolled.items()}
+        live_start = rolled_end + datetime.timedelta(days=1)
+    else:
+        live_start = start
+    live_end = min(end, today)
+    if live_start <= live_end:
+        for counters in _collect(live_start, live_end, faculty).values():
+            for key, value in counters.items():
+                totals[key] += value
+    totals["hours_earned"] = Decimal(totals["hours_earned"])
+    return totals
+
+
+def daily_series(start: datetime.date, end: datetime.date, faculty: Optional[str] = None) -> list:
+    """Per-day totals for charts: rollups for rolled-up days, live range queries after them."""
+    rolled_end = rolled_up_through()
+    series = []
+    if rolled_end is not None and rolled_end >= start:
+        qs = DailyActivityStat.objects.filter(day__gte=start, day__lte=min(end, rolled_end))
+        if faculty:
+            qs = qs.filter(faculty=faculty)
+        series = list(
+            qs.order_by("day")
+            .values("day")
+            .annotate(
+                scan_count=Sum("scan_count"),
+                checkin_count=Sum("checkin_count"),
+                checkout_count=Sum("checkout_count"),
+                hours_earned=Sum("hours_earned"),
+            )
+        )
+        live_start = rolled_end + datetime.timedelta(days=1)
+    else:
+        live_start = start
+    live_end = min(end, timezone.localdate())
+    if live_start <= live_end:
+        days = {}
+        for (day, _, _), counters in _collect(live_start, live_end, faculty).items():
+            totals = days.setdefault(day, {
+                "day": day, "scan_count": 0, "checkin_count": 0, "checkout_count": 0, "hours_earned": Decimal("0"),
+            })
+            for key, value in counters.items():
+                totals[key] += value
+        series.extend(days[day] for day in sorted(days))
+    return series
@@ -0,0 +1,156 @@
+from collections import Counter, defaultdict
+from typing import Iterable, List, NamedTuple, Optional
+
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from ..models import SIGNUP_COUNTER_FIELDS, Activity, ActivitySignup
+from .notification_service import notify_users
+
+
+class SignupResult(NamedTuple):
+    outcome: str  # "confirmed", "waitlist" or "duplicate"
+    signup: Optional[ActivitySignup]
+
+
+def claim_seat(activity_id: int, user, note: str = "") -> SignupResult:
+    """Sign ``user`` up, confirming them only if a seat is still free.
+
+    The seat is claimed with a conditional UPDATE on ``confirmed_count``
+    (``confirmed + attended < capacity``), which the database serialises, so
+    capacity holds under any number of parallel requests. Overflow goes to the
+    waitlist. A duplicate signup rolls the whole claim back.
+    """
+    try:
+        with transaction.atomic():
+            claimed = Activity.objects.filter(
+                pk=activity_id,
+                confirmed_count__lt=F("capacity") - F("attended_count"),
+            ).update(confirmed_count=F("confirmed_count") + 1)
+            status = "confirmed" if claimed else "waitlist"
+            if not claimed:
+                Activity.objects.filter(pk=activity_id).update(waitlist_count=F("waitlist_count") + 1)
+
+            signup = ActivitySignup(activity_id=activity_id, user=user, note=note, status=status)
+            signup._counters_applied = True
+            signup.save(force_insert=True)
+    except IntegrityError:
+        return SignupResult("duplicate", None)
+    return SignupResult(status, signup)
+
+
+def change_signup_status(signup: ActivitySignup, status: str) -> bool:
+    """Move one loaded signup to ``status`` and adjust the activity counters.
+
+    The UPDATE is conditional on the status we loaded, so two concurrent
+    requests cannot both count the same transition. Returns True if changed.
+    """
+    old_status = signup.status
+    if old_status == status:
+        return False
+    with transaction.atomic():
+        changed = ActivitySignup.objects.filter(pk=signup.pk, status=old_status).update(status=status)
+        if changed:
+            activity = signup.activity if ActivitySignup.activity.is_cached(signup) else None
+            Activity.adjust_signup_counters(signup.activity_id, {old_status: -1, status: 1}, activity)
+    if changed:
+        signup.status = signup._loaded_status = status
+    return bool(changed)
+
+
+def cancel_signup(signup: ActivitySignup) -> bool:
+    """Cancel a signup and, if it held a seat, hand the seat to the waitlist."""
+    held_seat = signup.status == "confirmed"
+    changed = change_signup_status(signup, "cancelled")
+    if changed and held_seat:
+        promote_waitlist(signup.activity_id)
+    return changed
+
+
+def promote_waitlist(activity_id: int) -> List[ActivitySignup]:
+    """Confirm the oldest waitlisted signups (by ``joined_at``) up to the free capacity.
+
+    The seats are claimed with the same conditional counter UPDATE as
+    ``claim_seat`` and the signups move with one bulk UPDATE, all in one
+    transaction. Promoted users get a single batched notification after commit.
+    """
+    with transaction.atomic():
+        activity = Activity.objects.select_for_update().get(pk=activity_id)
+        free = activity.capacity - activity.confirmed_count - activity.attended_count
+        if free <= 0 or activity.waitlist_count <= 0:
+            return []
+        promoted = list(
+            ActivitySignup.objects.filter(activity_id=activity_id, status="waitlist")
+            .select_related("user")
+            .order_by("joined_at", "id")[:free]
+        )
+        if not promoted:
+            return []
+        n = len(promoted)
+        claimed = Activity.objects.filter(
+            pk=activity_id,
+            confirmed_count__lte=F("capacity") - F("attended_count") - n,
+        ).update(confirmed_count=F("confirmed_count") + n, waitlist_count=F("waitlist_count") - n)
+        if not claimed:
+            # a concurrent claim took the seats first; leave the waitlist alone
+            return []
+        ActivitySignup.objects.filter(id__in=[s.id for s in promoted]).update(status="confirmed")
+        for signup in promoted:
+            signup.status = signup._loaded_status = "confirmed"
+
+        users = [s.user for s in promoted]
+        transaction.on_commit(lambda: notify_users(
+            users,
+            "ได้รับการยืนยันเข้าร่วมกิจกรรม",
+            f"คุณได้เลื่อนจากรายชื่อสำรองเป็นผู้เข้าร่วมกิจกรรม {activity.title}",
+            category="activity",
+            target_url=reverse("volunteer_app:activity_detail", args=[activity_id]),
+            channel="both",
+        ))
+    return promoted
+
+
+def transition_signups(queryset, status: str) -> int:
+    """Bulk version of ``queryset.update(status=...)`` that keeps counters in sync.
+
+    Counter deltas are grouped per activity, so the cost is one SELECT, one
+    UPDATE for the signups and one UPDATE per affected activity.
+    """
+    with transaction.atomic():
+        rows = list(
+            queryset.exclude(status=status)
+            .select_for_update()
+            .values_list("id", "activity_id", "status")
+        )
+        if not rows:
+            return 0
+        ActivitySignup.objects.filter(id__in=[row[0] for row in rows]).update(status=status)
+        deltas = defaultdict(Counter)
+        for _, activity_id, old_status in rows:
+            deltas[activity_id][old_status] -= 1
+            deltas[activity_id][status] += 1
+        for activity_id, activity_deltas in deltas.items():
+            Activity.adjust_signup_counters(activity_id, activity_deltas)
+    return len(rows)
+
+
+def recount_activity_counters(activity_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute every counter column from ActivitySignup rows in one UPDATE statement."""
+    def count_for(status):
+        return Coalesce(
+            Subquery(
+                ActivitySignup.objects.filter(activity=OuterRef("pk"), status=status)
+                .order_by()
+                .values("activity")
+                .annotate(n=Count("id"))
+                .values("n")[:1]
+            ),
+            Value(0),
+        )
+
+    activities = Activity.objects.all()
+    if activity_ids is not None:
+        activities = activities.filter(pk__in=list(activity_ids))
+    return activities.update(**{field: count_for(status) for status, field in SIGNUP_COUNTER_FIELDS.items()})
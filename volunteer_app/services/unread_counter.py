@@ -0,0 +1,49 @@
+"""Per-user unread notification count kept in the cache.
+
+The ``unread_notifications`` context processor runs on every page, so it
+reads the count here rather than running ``COUNT(*)``. Only a cache miss
+queries the database, through the ``(user, is_read)`` index. After that
+the value is kept current in place:
+
+* ``Notification`` rows created one at a time increment it (``post_save``)
+* ``notify_users`` bulk inserts increment every recipient
+* ``Notification.mark_read`` and ``mark_notifications_read`` decrement it
+  by the rows their conditional UPDATE actually changed
+* deleting a notification drops the entry, and the next read recounts
+
+Adjusting a missing key is a no-op, because the next read recounts anyway.
+``UNREAD_COUNT_TTL`` bounds how long any drift can last.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _key(user_id: int) -> str:
+    return f"unread-notifications:{user_id}"
+
+
+def get(user) -> int:
+    count = cache.get(_key(user.pk))
+    if count is None:
+        count = user.notifications.filter(is_read=False).count()
+        # add, not set: a concurrent adjust may already have stored a newer value
+        cache.add(_key(user.pk), count, getattr(settings, "UNREAD_COUNT_TTL", 3600))
+    return max(count, 0)
+
+
+def adjust(user_id: int, delta: int):
+    if not delta:
+        return
+    try:
+        cache.incr(_key(user_id), delta)
+    except ValueError:  # not cached; the next read counts
+        pass
+
+
+def adjust_many(user_ids, delta: int = 1):
+    for user_id in user_ids:
+        adjust(user_id, delta)
+
+
+def forget(user_id: int):
+    cache.delete(_key(user_id))
@@ -0,0 +1,51 @@
+/**
+ * notifications.js
+ * Infinite scroll for the notification inbox.
+ * Watches #notification-more (data-api-url, data-cursor, data-unread); when it scrolls into view,
+ * fetches the next page as JSON { ok, html, next_cursor } and appends html to #notification-items.
+ * Without JS (or IntersectionObserver) the link still loads the next page normally.
+ */
+(function () {
+  "use strict";
+
+  function initNotificationScroll() {
+    var more = document.getElementById("notification-more");
+    var list = document.getElementById("notification-items");
+    if (!more || !list || !("IntersectionObserver" in window)) return;
+
+    var loading = false;
+    var observer = new IntersectionObserver(function (entries) {
+      if (!entries[0].isIntersecting || loading) return;
+      loading = true;
+      var url = more.getAttribute("data-api-url") + "?cursor=" + encodeURIComponent(more.getAttribute("data-cursor"));
+      if (more.getAttribute("data-unread")) url += "&unread=1";
+
+      fetch(url, { credentials: "same-origin", headers: { "X-Requested-With": "XMLHttpRequest" } })
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          if (!data.ok) return;
+          list.insertAdjacentHTML("beforeend", data.html);
+          if (data.next_cursor) {
+            more.setAttribute("data-cursor", data.next_cursor);
+            more.href = "?cursor=" + encodeURIComponent(data.next_cursor) + (more.getAttribute("data-unread") ? "&unread=1" : "");
+          } else {
+            observer.disconnect();
+            more.parentNode.removeChild(more);
+          }
+        })
+        .catch(function (err) {
+          console.error("Failed to load notifications:", err);
+        })
+        .finally(function () {
+          loading = false;
+        });
+    });
+    observer.observe(more);
+  }
+
+  if (document.readyState === "loading") {
+    document.addEventListener("DOMContentLoaded", initNotificationScroll);
+  } else {
+    initNotificationScroll();
+  }
+})();
@@ -2,6 +2,7 @@
  * qr_scan_page.js
  * Handles QR upload form and manual token form on the QR scan page.
  * Expects container with data-verify-url and data-upload-url (e.g. <main data-verify-url="..." data-upload-url="...">).
+ * Kiosk pages also carry data-kiosk-token and data-kiosk-sync-url.
  * Depends: qr_scanner_main.js (for initQrScanner).
  */
 (function () {
@@ -37,6 +38,9 @@
     not_signed_up: "คุณยังไม่ได้สมัครกิจกรรมนี้",
     already_attended: "คุณยืนยันชั่วโมงกิจกรรมนี้แล้ว",
     database_error: "เกิดข้อผิดพลาดในการบันทึก ลองอีกครั้ง",
+    busy: "มีผู้อัปโหลดจำนวนมาก กรุณาลองใหม่อีกครั้งในอีกสักครู่",
+    rate_limited: "มีคำขอมากเกินไป กรุณารอสักครู่แล้วลองใหม่",
+    job_not_found: "ไม่พบงานอ่าน QR code นี้หรือหมดอายุแล้ว",
     unknown: "เกิดข้อผิดพลาดที่ไม่ทราบสาเหตุ",
   };
 
@@ -61,7 +65,7 @@
         '<svg class="animate-spin h-12 w-12 text-emerald-500" xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24">' +
         '<circle class="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" stroke-width="4"></circle>' +
         '<path class="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z"></path>' +
-        "</svg></div></div>' +
+        '</svg></div></div>' +
         '<p class="text-gray-600 font-medium">กำลังอ่าน QR code และยืนยัน...</p></div>';
       activityDetailsDiv.classList.add("hidden");
       errorHelpDiv.classList.add("hidden");
@@ -159,6 +163,7 @@
       showUploadLoading();
       var formData = new FormData();
       formData.append("image", file);
+      formData.append("async", "1");
       fetch(uploadUrl, {
         method: "POST",
         headers: { "X-CSRFToken": getCookie("csrftoken") },
@@ -167,6 +172,11 @@
         .then(function (r) {
           return r.json();
         })
+        .then(function (data) {
+          // the server decodes in the background; poll until the job finishes
+          if (data.code === "queued") return pollUploadJob(data.status_url, data.poll_timeout);
+          return data;
+        })
         .then(function (data) {
           if (data.ok) showUploadSuccess(data);
           else showUploadError(data);
@@ -181,6 +191,32 @@
     });
   }
 
+  function pollUploadJob(statusUrl, timeoutSeconds) {
+    // give up when the job can no longer finish (worker died, job evicted from the cache)
+    var deadline = Date.now() + (timeoutSeconds || 600) * 1000;
+    return new Promise(function (resolve, reject) {
+      function poll() {
+        fetch(statusUrl, { headers: { Accept: "application/json" } })
+          .then(function (r) {
+            return r.json();
+          })
+          .then(function (data) {
+            if (data.code !== "pending") resolve(data);
+            else if (Date.now() < deadline) setTimeout(poll, 1000);
+            else
+              resolve({
+                ok: false,
+                code: "job_timeout",
+                message: "อ่าน QR code นานเกินไป",
+                help: "กรุณาลองอัปโหลดรูปภาพอีกครั้ง",
+              });
+          })
+          .catch(reject);
+      }
+      setTimeout(poll, 500);
+    });
+  }
+
   function initQrManualToken(verifyUrl) {
     var form = document.getElementById("manual-token-form");
     if (!form || !verifyUrl) return;
@@ -197,7 +233,7 @@
         '<svg class="animate-spin h-12 w-12 text-emerald-500" xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24">' +
         '<circle class="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" stroke-width="4"></circle>' +
         '<path class="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z"></path>' +
-        "</svg></div></div>' +
+        '</svg></div></div>' +
         '<p class="text-gray-600 font-medium">กำลังยืนยัน...</p></div>';
       activityDetailsDiv.classList.add("hidden");
       errorHelpDiv.classList.add("hidden");
@@ -304,8 +340,13 @@
     var verifyUrl = config.verifyUrl || (document.querySelector("[data-verify-url]") && document.querySelector("[data-verify-url]").getAttribute("data-verify-url"));
     var uploadUrl = config.uploadUrl || (document.querySelector("[data-upload-url]") && document.querySelector("[data-upload-url]").getAttribute("data-upload-url"));
 
+    var pageEl = document.querySelector("[data-qr-scan-page]");
+    var kiosk = pageEl && pageEl.getAttribute("data-kiosk-sync-url")
+      ? { token: pageEl.getAttribute("data-kiosk-token"), syncUrl: pageEl.getAttribute("data-kiosk-sync-url") }
+      : null;
+
     if (typeof initQrScanner === "function" && verifyUrl) {
-      initQrScanner(verifyUrl);
+      initQrScanner(verifyUrl, kiosk);
     }
     if (uploadUrl) initQrUploadForm(uploadUrl);
     if (verifyUrl) initQrManualToken(verifyUrl);
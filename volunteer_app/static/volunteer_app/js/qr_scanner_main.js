@@ -4,7 +4,110 @@
 // Prevent multiple initializations
 let scannerInitialized = false;
 
-function initQrScanner(verifyUrl){
+// Kiosk mode: staff scan student cards against one activity token. Scans are
+// queued in localStorage with the time they were taken and synced in bulk
+// whenever the device is online, so the venue may have no connectivity.
+const KIOSK_QUEUE_KEY = 'kioskScanQueue';
+const KIOSK_DEVICE_KEY = 'kioskDeviceId';
+const KIOSK_SYNC_INTERVAL_MS = 15000;
+const KIOSK_SYNC_BATCH = 200;
+const KIOSK_REPEAT_MS = 3000;
+
+function newScanId() {
+  if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+  return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+function loadKioskQueue() {
+  try {
+    return JSON.parse(localStorage.getItem(KIOSK_QUEUE_KEY) || '[]');
+  } catch (e) {
+    return [];
+  }
+}
+
+function saveKioskQueue(queue) {
+  localStorage.setItem(KIOSK_QUEUE_KEY, JSON.stringify(queue));
+}
+
+function startKioskQueue(kiosk, getCookie) {
+  let deviceId = localStorage.getItem(KIOSK_DEVICE_KEY);
+  if (!deviceId) {
+    deviceId = newScanId();
+    localStorage.setItem(KIOSK_DEVICE_KEY, deviceId);
+  }
+  const statusEl = document.getElementById('kiosk-queue-status');
+  let flushing = false;
+  let failed = 0;
+  let lastStudent = null;
+  let lastScanAt = 0;
+
+  function showStatus() {
+    if (!statusEl) return;
+    const pending = loadKioskQueue().length;
+    statusEl.textContent = `รอส่ง ${pending} รายการ` + (failed ? ` · ไม่สำเร็จ ${failed} รายการ` : '') +
+      (navigator.onLine ? '' : ' · ออฟไลน์');
+  }
+
+  function flush() {
+    const queue = loadKioskQueue();
+    if (flushing || queue.length === 0 || !navigator.onLine) {
+      showStatus();
+      return;
+    }
+    flushing = true;
+    const batch = queue.slice(0, KIOSK_SYNC_BATCH);
+    fetch(kiosk.syncUrl, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'X-CSRFToken': getCookie('csrftoken') || '' },
+      body: JSON.stringify({ device_id: deviceId, scans: batch })
+    }).then(r => {
+      // a redirect means the session expired (login page), not a sync answer
+      if (!r.ok || r.redirected) throw new Error(`HTTP error! status: ${r.status}${r.redirected ? ' (redirected)' : ''}`);
+      return r.json();
+    }).then(data => {
+      // every returned id has a final answer; the server is idempotent so
+      // entries lost between here and saveKioskQueue are safe to resend
+      const done = new Set(data.results.map(result => result.id));
+      failed += data.results.filter(result => !result.ok).length;
+      saveKioskQueue(loadKioskQueue().filter(entry => !done.has(entry.id)));
+      flushing = false;
+      if (loadKioskQueue().length > 0) flush(); else showStatus();
+    }).catch(err => {
+      console.warn('Kiosk sync failed, will retry:', err);
+      flushing = false;
+      showStatus();
+    });
+  }
+
+  window.addEventListener('online', flush);
+  window.addEventListener('offline', showStatus);
+  setInterval(flush, KIOSK_SYNC_INTERVAL_MS);
+  flush();
+
+  return {
+    // returns false for the same card read again within KIOSK_REPEAT_MS
+    add(student) {
+      const now = Date.now();
+      if (student === lastStudent && now - lastScanAt < KIOSK_REPEAT_MS) return false;
+      lastStudent = student;
+      lastScanAt = now;
+      const queue = loadKioskQueue();
+      queue.push({
+        id: newScanId(),
+        token: kiosk.token,
+        student: student,
+        scanned_at: new Date(now).toISOString(),
+        device_id: deviceId
+      });
+      saveKioskQueue(queue);
+      flush();
+      return true;
+    }
+  };
+}
+
+function initQrScanner(verifyUrl, kiosk){
   // Prevent multiple initializations
   if (scannerInitialized) {
     console.warn('QR scanner already initialized, skipping...');
@@ -16,14 +119,14 @@ function initQrScanner(verifyUrl){
   // Wait for DOM to be ready
   if (document.readyState === 'loading') {
     document.addEventListener('DOMContentLoaded', () => {
-      initializeScanner(verifyUrl);
+      initializeScanner(verifyUrl, kiosk);
     });
   } else {
-    initializeScanner(verifyUrl);
+    initializeScanner(verifyUrl, kiosk);
   }
 }
 
-function initializeScanner(verifyUrl) {
+function initializeScanner(verifyUrl, kiosk) {
   try {
     // Check if HTTPS is required (for camera access)
     const isSecureContext = window.isSecureContext || location.protocol === 'https:' || location.hostname === 'localhost' || location.hostname === '127.0.0.1';
@@ -200,11 +303,22 @@ function initializeScanner(verifyUrl) {
     
     let isScanning = false;
     let scanProcessed = false;
+    const kioskQueue = kiosk ? startKioskQueue(kiosk, getCookie) : null;
     
     html5QrCode.start(
       cameraConfig || { facingMode: "environment" },
       qrConfig,
       qrCodeMessage => {
+        // Kiosk: queue the student card and keep the camera running
+        if (kioskQueue) {
+          const student = qrCodeMessage.trim();
+          if (student && kioskQueue.add(student) && resultDiv) {
+            resultDiv.classList.remove('hidden');
+            resultDiv.textContent = `บันทึก ${student} แล้ว`;
+          }
+          return;
+        }
+
         // Prevent multiple scans
         if (scanProcessed) {
           return;
@@ -1,14 +1,45 @@
-from django.test import TestCase, Client
+import base64
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+
+import qrcode
+from PIL import Image
+
+from django.db import OperationalError, close_old_connections
+from django.test import TestCase, TransactionTestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
 
 from .models import (
     Activity, ActivitySignup, QRScan, IdeaProposal, IdeaVote,
-    Group, GroupMembership
+    Group, GroupMembership, CheckInOut, UserHoursSummary, DailyActivityStat,
+    Notification, NotificationPreference, EmailOutbox, EmailDigestItem
+)
+from .utils import (
+    make_qr_token, verify_qr_token, make_checkin_token, verify_checkin_token, token_expiry,
+    read_qr_code_from_image
+)
+from .services.leaderboard_service import top_volunteers
+from .services.dashboard_service import DashboardSnapshot
+from .services.notification_service import mark_notifications_read, notification_page, notify_user, notify_users
+from .services import batch_ingest, decode_jobs, email_digest, email_outbox, finalize_service, kiosk_sync, qr_decode, qr_service, recent_scans, reporting_service
+from . import context_processors, ratelimit, tokens
+from .services.signup_service import (
+    cancel_signup, change_signup_status, claim_seat, promote_waitlist, transition_signups
 )
-from .utils import make_qr_token, verify_qr_token
 
 User = get_user_model()
 
@@ -46,6 +77,249 @@ class UserModelTests(TestCase):
         self.assertEqual(self.user.total_hours(), 2.5)
 
 
+class UserHoursSummaryTests(TestCase):
+    """Tests for the materialised volunteer hours ledger"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="ledger",
+            email="ledger@ubu.ac.th",
+            password="testpass123"
+        )
+        self.activity = Activity.objects.create(
+            title="Ledger Activity",
+            datetime=timezone.now(),
+            location="Test Location",
+            hours_reward=2.0
+        )
+
+    def test_summary_follows_scans_and_checkouts(self):
+        """Test summary is updated when scans and check-outs are written or deleted"""
+        scan = QRScan.objects.create(activity=self.activity, user=self.user, token="t")
+        checkout = CheckInOut.objects.create(
+            activity=self.activity, user=self.user, check_type="checkout", token="t"
+        )
+        checkout.calculated_hours = 1.5
+        checkout.save(update_fields=["calculated_hours"])
+
+        summary = UserHoursSummary.objects.get(user=self.user)
+        self.assertEqual(float(summary.total_hours), 3.5)
+
+        scan.delete()
+        summary.refresh_from_db()
+        self.assertEqual(float(summary.total_hours), 1.5)
+
+    def test_total_hours_is_single_row_fetch(self):
+        """Test total_hours() reads one summary row"""
+        QRScan.objects.create(activity=self.activity, user=self.user, token="t")
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.total_hours(), 2.0)
+
+    def test_hours_reward_change_updates_summary(self):
+        """Test editing hours_reward re-derives QR hours"""
+        QRScan.objects.create(activity=self.activity, user=self.user, token="t")
+        self.activity.hours_reward = 4
+        self.activity.save()
+        self.assertEqual(float(UserHoursSummary.objects.get(user=self.user).total_hours), 4.0)
+
+    def test_rebuild_command_reconciles(self):
+        """Test rebuild_hours_summary repairs drifted rows"""
+        QRScan.objects.create(activity=self.activity, user=self.user, token="t")
+        UserHoursSummary.objects.filter(user=self.user).update(total_hours=99)
+        call_command("rebuild_hours_summary", stdout=StringIO())
+        self.assertEqual(float(UserHoursSummary.objects.get(user=self.user).total_hours), 2.0)
+
+    def test_deleting_user_does_not_recreate_summary(self):
+        """Test cascading user delete leaves no orphan summary"""
+        QRScan.objects.create(activity=self.activity, user=self.user, token="t")
+        self.user.delete()
+        self.assertFalse(UserHoursSummary.objects.exists())
+
+
+class LeaderboardTests(TestCase):
+    """Tests for the database-side top volunteers leaderboard"""
+
+    def setUp(self):
+        cache.clear()
+        self.activity = Activity.objects.create(
+            title="Board Activity",
+            datetime=timezone.now(),
+            location="Test Location",
+            hours_reward=2.0
+        )
+        self.alice = User.objects.create_user(username="alice", password="x", faculty="Science", year=2)
+        self.bob = User.objects.create_user(username="bob", password="x", faculty="Arts", year=3)
+        User.objects.create_user(username="idle", password="x", faculty="Science")
+        QRScan.objects.create(activity=self.activity, user=self.alice, token="t")
+        QRScan.objects.create(activity=self.activity, user=self.bob, token="t")
+        CheckInOut.objects.create(
+            activity=self.activity, user=self.bob, check_type="checkout", token="t", calculated_hours=1.25
+        )
+
+    def test_ranking_combines_scans_and_checkouts(self):
+        """Test ranking uses scan hours plus check-out hours in one query"""
+        with self.assertNumQueries(1):
+            rows = top_volunteers(limit=10, use_cache=False)
+        self.assertEqual([row["user"] for row in rows], [self.bob, self.alice])
+        self.assertEqual(rows[0]["total_hours"], 3.25)
+        self.assertEqual(rows[0]["scan_count"], 1)
+
+    def test_filters(self):
+        """Test faculty, year and date filters"""
+        rows = top_volunteers(faculty="Science", use_cache=False)
+        self.assertEqual([row["user"] for row in rows], [self.alice])
+        rows = top_volunteers(year=3, use_cache=False)
+        self.assertEqual([row["user"] for row in rows], [self.bob])
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        self.assertEqual(top_volunteers(date_from=tomorrow, use_cache=False), [])
+
+    def test_result_is_cached(self):
+        """Test repeated calls are served from the cache"""
+        top_volunteers(limit=5)
+        with self.assertNumQueries(0):
+            rows = top_volunteers(limit=5)
+        self.assertEqual(len(rows), 2)
+
+    def test_admin_dashboard_renders_leaderboard(self):
+        """Test admin dashboard shows the leaderboard"""
+        User.objects.create_user(username="boss", password="x", is_staff=True)
+        self.client.login(username="boss", password="x")
+        response = self.client.get(reverse("volunteer_app:admin_dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["top_users"][0]["user"], self.bob)
+
+
+class DashboardSnapshotTests(TestCase):
+    """Tests for the cached admin dashboard counters"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="snap", password="x")
+        self.activity = Activity.objects.create(
+            title="Snapshot Activity",
+            datetime=timezone.now(),
+            location="Test Location",
+            hours_reward=1.5,
+            status="ongoing"
+        )
+
+    def test_counters(self):
+        """Test grouped counters match the data"""
+        QRScan.objects.create(activity=self.activity, user=self.user, token="t")
+        stats = DashboardSnapshot.get()
+        self.assertEqual(stats["total_users"], 1)
+        self.assertEqual(stats["new_users_today"], 1)
+        self.assertEqual(stats["activities_ongoing"], 1)
+        self.assertEqual(stats["qr_scans_today"], 1)
+        self.assertEqual(float(stats["total_hours"]), 1.5)
+
+    def test_snapshot_is_cached_until_stale(self):
+        """Test cached snapshot is served without queries and invalidated by signals"""
+        DashboardSnapshot.get()
+        with self.assertNumQueries(0):
+            DashboardSnapshot.get()
+        QRScan.objects.create(activity=self.activity, user=self.user, token="t")
+        self.assertEqual(DashboardSnapshot.get()["total_qr_scans"], 1)
+
+    def test_signups_invalidate_snapshot(self):
+        """Test signing up and cancelling by deletion refresh total_signups"""
+        self.assertEqual(DashboardSnapshot.get()["total_signups"], 0)
+        signup = ActivitySignup.objects.create(activity=self.activity, user=self.user, status="confirmed")
+        self.assertEqual(DashboardSnapshot.get()["total_signups"], 1)
+        signup.delete()
+        self.assertEqual(DashboardSnapshot.get()["total_signups"], 0)
+
+
+class DailyRollupTests(TestCase):
+    """Tests for daily attendance rollups"""
+
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        self.activity = Activity.objects.create(
+            title="Rollup Activity",
+            datetime=timezone.now(),
+            location="Test Location",
+            hours_reward=2.0
+        )
+        self.users = [
+            User.objects.create_user(username=f"r{i}", password="x", faculty="Science" if i else "Arts")
+            for i in range(3)
+        ]
+        for days_ago, user in zip((3, 3, 0), self.users):
+            scan = QRScan.objects.create(activity=self.activity, user=user, token="t")
+            QRScan.objects.filter(pk=scan.pk).update(scanned_at=timezone.now() - timedelta(days=days_ago))
+        checkin = CheckInOut.objects.create(activity=self.activity, user=self.users[1], check_type="checkin", token="t")
+        CheckInOut.objects.filter(pk=checkin.pk).update(checked_at=timezone.now() - timedelta(days=3))
+
+    def test_rollup_is_idempotent_and_grouped_by_faculty(self):
+        """Test rolling up the same range twice yields the same rows"""
+        day = self.today - timedelta(days=3)
+        for _ in range(2):
+            reporting_service.rollup_days(day - timedelta(days=10), self.today - timedelta(days=1), chunk_days=4)
+        rows = {row.faculty: row for row in DailyActivityStat.objects.filter(day=day)}
+        self.assertEqual(set(rows), {"Arts", "Science"})
+        self.assertEqual(rows["Science"].scan_count, 1)
+        self.assertEqual(rows["Science"].checkin_count, 1)
+        self.assertEqual(float(rows["Arts"].hours_earned), 2.0)
+
+    def test_period_stats_add_today_live(self):
+        """Test period stats combine rollups with today's raw rows"""
+        call_command("rollup_daily_stats", stdout=StringIO())
+        totals = reporting_service.period_stats(*reporting_service.period_bounds("week"))
+        self.assertEqual(totals["scan_count"], 3)
+        self.assertEqual(totals["checkin_count"], 1)
+        self.assertEqual(DashboardSnapshot.get()["qr_scans_week"], 3)
+
+    def test_days_not_rolled_up_counted_live(self):
+        """Test days after the last rollup (or with no rollup at all) are counted live, not as zero"""
+        week = reporting_service.period_bounds("week")
+        self.assertEqual(reporting_service.period_stats(*week)["scan_count"], 3)
+        self.assertEqual(DashboardSnapshot.get()["qr_scans_week"], 3)
+
+        # the nightly job last ran five days ago; the scans from three days ago are in the gap
+        reporting_service.rollup_days(self.today - timedelta(days=6), self.today - timedelta(days=5))
+        DailyActivityStat.objects.create(day=self.today - timedelta(days=5), activity=self.activity, scan_count=4)
+        DashboardSnapshot.mark_stale()
+        self.assertEqual(reporting_service.period_stats(*week)["scan_count"], 7)
+        self.assertEqual(reporting_service.period_stats(*week)["checkin_count"], 1)
+        self.assertEqual(DashboardSnapshot.get()["qr_scans_week"], 7)
+
+    def test_stats_api(self):
+        """Test admin stats endpoint reads the rollups"""
+        reporting_service.rollup_days(self.today - timedelta(days=7), self.today - timedelta(days=1))
+        User.objects.create_user(username="boss", password="x", is_staff=True)
+        self.client.login(username="boss", password="x")
+        response = self.client.get(reverse("volunteer_app:admin_stats_api"), {"period": "month"})
+        data = response.json()
+        self.assertEqual(data["totals"]["scan_count"], 3)
+        # today is not rolled up yet and is charted from the raw rows
+        self.assertEqual(sum(row["scan_count"] for row in data["series"]), 3)
+        self.assertEqual(data["series"][-1]["day"], self.today.isoformat())
+
+    def test_series_counts_days_after_rollup_live(self):
+        """Test chart days after the last rollup are filled from the raw rows"""
+        reporting_service.rollup_days(self.today - timedelta(days=6), self.today - timedelta(days=5))
+        DailyActivityStat.objects.create(day=self.today - timedelta(days=5), activity=self.activity, scan_count=4)
+        series = {row["day"]: row for row in reporting_service.daily_series(*reporting_service.period_bounds("week"))}
+        self.assertEqual(series[self.today - timedelta(days=5)]["scan_count"], 4)
+        self.assertEqual(series[self.today - timedelta(days=3)]["scan_count"], 2)
+        self.assertEqual(series[self.today - timedelta(days=3)]["checkin_count"], 1)
+        self.assertEqual(series[self.today]["scan_count"], 1)
+
+    def test_stats_api_faculty_filters_totals(self):
+        """Test the faculty filter applies to the totals as well as the series"""
+        reporting_service.rollup_days(self.today - timedelta(days=7), self.today - timedelta(days=1))
+        User.objects.create_user(username="boss", password="x", is_staff=True)
+        self.client.login(username="boss", password="x")
+        response = self.client.get(reverse("volunteer_app:admin_stats_api"), {"period": "month", "faculty": "Science"})
+        data = response.json()
+        # one rolled-up scan three days ago plus today's live scan, both by Science students
+        self.assertEqual((data["totals"]["scan_count"], data["totals"]["checkin_count"]), (2, 1))
+        self.assertEqual(reporting_service.period_stats(*reporting_service.period_bounds("month"), faculty="Arts")["scan_count"], 1)
+
+
 class ActivityModelTests(TestCase):
     """Tests for Activity model"""
     
@@ -90,6 +364,279 @@ class ActivityModelTests(TestCase):
         self.assertTrue(self.activity.is_full())
 
 
+class ActivityCounterTests(TestCase):
+    """Tests for the denormalised signup counters on Activity"""
+
+    def setUp(self):
+        self.activity = Activity.objects.create(
+            title="Counter Activity",
+            datetime=timezone.now(),
+            location="Test Location",
+            capacity=2
+        )
+        self.users = [User.objects.create_user(username=f"c{i}", password="x") for i in range(3)]
+
+    def counts(self):
+        self.activity.refresh_from_db()
+        a = self.activity
+        return (a.requested_count, a.confirmed_count, a.attended_count, a.waitlist_count)
+
+    def test_counters_follow_create_save_and_delete(self):
+        """Test signals keep counters in sync"""
+        signup = ActivitySignup.objects.create(activity=self.activity, user=self.users[0], status="confirmed")
+        ActivitySignup.objects.create(activity=self.activity, user=self.users[1], status="waitlist")
+        self.assertEqual(self.counts(), (0, 1, 0, 1))
+
+        signup = ActivitySignup.objects.get(pk=signup.pk)
+        signup.status = "attended"
+        signup.save()
+        self.assertEqual(self.counts(), (0, 0, 1, 1))
+
+        signup.delete()
+        self.assertEqual(self.counts(), (0, 0, 0, 1))
+
+    def test_transitions_adjust_counters(self):
+        """Test service transitions move counters atomically"""
+        for user in self.users:
+            ActivitySignup.objects.create(activity=self.activity, user=user, status="confirmed")
+        transition_signups(ActivitySignup.objects.filter(user__in=self.users[:2]), "attended")
+        self.assertEqual(self.counts(), (0, 1, 2, 0))
+
+        signup = ActivitySignup.objects.get(user=self.users[2])
+        self.assertTrue(change_signup_status(signup, "cancelled"))
+        self.assertFalse(change_signup_status(signup, "cancelled"))
+        self.assertEqual(self.counts(), (0, 0, 2, 0))
+
+    def test_capacity_checks_cost_no_queries(self):
+        """Test spots_taken/is_full read the counter columns"""
+        ActivitySignup.objects.create(activity=self.activity, user=self.users[0], status="confirmed")
+        activity = Activity.objects.get(pk=self.activity.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(activity.spots_taken(), 1)
+            self.assertFalse(activity.is_full())
+
+    def test_repair_command(self):
+        """Test repair_activity_counters recomputes drifted counters"""
+        ActivitySignup.objects.create(activity=self.activity, user=self.users[0], status="confirmed")
+        Activity.objects.filter(pk=self.activity.pk).update(confirmed_count=7, waitlist_count=3)
+        call_command("repair_activity_counters", stdout=StringIO())
+        self.assertEqual(self.counts(), (0, 1, 0, 0))
+
+
+class SignupEngineTests(TestCase):
+    """Tests for claim_seat"""
+
+    def setUp(self):
+        self.activity = Activity.objects.create(
+            title="Engine Activity",
+            datetime=timezone.now(),
+            location="Test Location",
+            capacity=1
+        )
+        self.users = [User.objects.create_user(username=f"e{i}", password="x") for i in range(2)]
+
+    def test_overflow_goes_to_waitlist(self):
+        """Test the seat after capacity is waitlisted"""
+        self.assertEqual(claim_seat(self.activity.pk, self.users[0]).outcome, "confirmed")
+        self.assertEqual(claim_seat(self.activity.pk, self.users[1]).outcome, "waitlist")
+        self.activity.refresh_from_db()
+        self.assertEqual((self.activity.confirmed_count, self.activity.waitlist_count), (1, 1))
+
+    def test_duplicate_rolls_back_claim(self):
+        """Test a second signup by the same user leaves counters untouched"""
+        claim_seat(self.activity.pk, self.users[0])
+        result = claim_seat(self.activity.pk, self.users[0])
+        self.assertEqual(result, ("duplicate", None))
+        self.activity.refresh_from_db()
+        self.assertEqual((self.activity.confirmed_count, self.activity.waitlist_count), (1, 0))
+
+    def test_signup_view_uses_engine(self):
+        """Test POST to activity_signup confirms then waitlists"""
+        client = Client()
+        for user in self.users:
+            client.force_login(user)
+            client.post(reverse("volunteer_app:activity_signup", args=[self.activity.pk]), {"note": ""})
+        statuses = list(ActivitySignup.objects.order_by("user__username").values_list("status", flat=True))
+        self.assertEqual(statuses, ["confirmed", "waitlist"])
+
+
+class WaitlistPromotionTests(TestCase):
+    """Tests for promote_waitlist"""
+
+    def setUp(self):
+        self.activity = Activity.objects.create(
+            title="Promotion Activity",
+            datetime=timezone.now(),
+            location="Test Location",
+            capacity=1
+        )
+        self.users = [User.objects.create_user(username=f"w{i}", password="x") for i in range(4)]
+        self.signups = [claim_seat(self.activity.pk, user).signup for user in self.users]
+        # make joined_at strictly ordered regardless of clock resolution
+        base = timezone.now() - timedelta(hours=1)
+        for i, signup in enumerate(self.signups):
+            ActivitySignup.objects.filter(pk=signup.pk).update(joined_at=base + timedelta(minutes=i))
+
+    def statuses(self):
+        return list(ActivitySignup.objects.order_by("user__username").values_list("status", flat=True))
+
+    def test_cancel_promotes_oldest_waitlisted(self):
+        """Test a cancelled seat goes to the earliest waitlist signup"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(cancel_signup(self.signups[0]))
+        self.assertEqual(self.statuses(), ["cancelled", "confirmed", "waitlist", "waitlist"])
+        self.activity.refresh_from_db()
+        self.assertEqual((self.activity.confirmed_count, self.activity.waitlist_count), (1, 2))
+        self.assertEqual(Notification.objects.filter(user=self.users[1]).count(), 1)
+
+    def test_capacity_raise_promotes_in_bulk(self):
+        """Test raising capacity promotes several signups with one batched notification"""
+        self.activity.capacity = 3
+        self.activity.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            promoted = promote_waitlist(self.activity.pk)
+        self.assertEqual([s.user for s in promoted], self.users[1:3])
+        self.assertEqual(self.statuses(), ["confirmed", "confirmed", "confirmed", "waitlist"])
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(promote_waitlist(self.activity.pk), [])
+
+    def test_activity_save_keeps_counters(self):
+        """Test saving a stale Activity does not overwrite the counters"""
+        stale = Activity.objects.get(pk=self.activity.pk)
+        claim_seat(self.activity.pk, User.objects.create_user(username="late", password="x"))
+        stale.title = "Renamed"
+        stale.save()
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.waitlist_count, 4)
+
+    def test_cancel_view(self):
+        """Test activity_cancel_signup cancels the user's own signup"""
+        client = Client()
+        client.force_login(self.users[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse("volunteer_app:activity_cancel_signup", args=[self.activity.pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.statuses()[:2], ["cancelled", "confirmed"])
+
+
+class SignupConcurrencyTests(TransactionTestCase):
+    """Parallel signups never push confirmed seats past capacity"""
+
+    def test_parallel_claims_respect_capacity(self):
+        """Test many threads racing for few seats"""
+        activity = Activity.objects.create(
+            title="Race Activity",
+            datetime=timezone.now(),
+            location="Test Location",
+            capacity=3
+        )
+        users = [User.objects.create_user(username=f"r{i}", password="x") for i in range(12)]
+        outcomes = []
+        barrier = threading.Barrier(len(users))
+
+        def worker(user):
+            barrier.wait()
+            try:
+                for _ in range(50):
+                    try:
+                        outcomes.append(claim_seat(activity.pk, user).outcome)
+                        return
+                    except OperationalError:
+                        # SQLite reports writer contention instead of blocking
+                        continue
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=worker, args=(u,)) for u in users]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        activity.refresh_from_db()
+        self.assertEqual(len(outcomes), len(users))
+        self.assertEqual(outcomes.count("confirmed"), 3)
+        self.assertEqual(activity.confirmed_count, 3)
+        self.assertEqual(activity.waitlist_count, 9)
+        self.assertEqual(ActivitySignup.objects.filter(status="confirmed").count(), 3)
+
+
+class QRRenderCacheTests(TestCase):
+    """Tests for qr_service and the QR section of activity_detail"""
+
+    def setUp(self):
+        cache.clear()
+        qr_service.clear_render_cache()
+        self.organizer = User.objects.create_user(username="organizer", password="x")
+        self.student = User.objects.create_user(username="student", password="x")
+        self.activity = Activity.objects.create(
+            title="QR Activity",
+            datetime=timezone.now(),
+            location="Test Location",
+            created_by=self.organizer
+        )
+
+    def test_repeat_render_is_cached(self):
+        """Test the same (data, size, format) renders once"""
+        first = qr_service.render_qr("https://example.com/qr/confirm/abc/")
+        self.assertTrue(first.startswith(b"\x89PNG"))
+        with mock.patch.object(qr_service, "_render", side_effect=AssertionError("re-rendered")):
+            self.assertIs(qr_service.render_qr("https://example.com/qr/confirm/abc/"), first)
+            qr_service.clear_render_cache()
+            self.assertEqual(qr_service.render_qr("https://example.com/qr/confirm/abc/"), first)
+        self.assertIn(b"<svg", qr_service.render_qr("https://example.com/qr/confirm/abc/", fmt="svg"))
+
+    def test_lru_is_bounded(self):
+        """Test the per-process store evicts the least recently used image"""
+        with self.settings(QR_RENDER_CACHE_SIZE=2):
+            for data in ("a", "b", "c"):
+                qr_service.render_qr(data)
+            self.assertEqual([key[0] for key in qr_service._renders], ["b", "c"])
+
+    def test_only_organizer_sees_qr_section(self):
+        """Test students and anonymous visitors get no QR tokens or images"""
+        url = reverse("volunteer_app:activity_detail", args=[self.activity.pk])
+        image_url = reverse("volunteer_app:activity_qr_image", args=[self.activity.pk, "checkin", "png"])
+        self.assertNotIn("qr_token", self.client.get(url).context)
+        self.client.force_login(self.student)
+        self.assertNotIn("qr_token", self.client.get(url).context)
+        self.assertEqual(self.client.get(image_url).status_code, 403)
+
+        self.client.force_login(self.organizer)
+        response = self.client.get(url)
+        self.assertTrue(response.context["can_manage_qr"])
+        self.assertContains(response, image_url)
+        self.assertNotContains(response, "base64,")
+
+    def test_image_endpoint_caching_headers(self):
+        """Test ETag/Cache-Control and 304 on If-None-Match"""
+        self.client.force_login(self.organizer)
+        url = reverse("volunteer_app:activity_qr_image", args=[self.activity.pk, "checkin", "png"])
+        with mock.patch("volunteer_app.utils.time.time", return_value=1_200_000_100):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Type"], "image/png")
+            self.assertIn("max-age=200", response["Cache-Control"])
+            self.assertIn("private", response["Cache-Control"])
+            etag = response["ETag"]
+
+            with mock.patch.object(qr_service, "render_qr", side_effect=AssertionError("rendered")):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+        with mock.patch("volunteer_app.utils.time.time", return_value=1_200_000_400):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_svg_variant(self):
+        """Test the .svg endpoint returns SVG"""
+        self.client.force_login(self.organizer)
+        response = self.client.get(reverse("volunteer_app:activity_qr_image", args=[self.activity.pk, "confirm", "svg"]))
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertIn(b"<svg", response.content)
+
+
 class QRTokenTests(TestCase):
     """Tests for QR Token generation and verification"""
     
@@ -115,6 +662,930 @@ class QRTokenTests(TestCase):
         self.assertFalse(valid)
         self.assertIsNone(activity_id)
 
+    def test_aligned_tokens_are_identical_within_window(self):
+        """Test every token minted in one window is byte-identical"""
+        with mock.patch("volunteer_app.utils.time.time", return_value=1_200_000_010):
+            first = make_checkin_token(self.activity_id)
+        with mock.patch("volunteer_app.utils.time.time", return_value=1_200_000_290):
+            self.assertEqual(make_checkin_token(self.activity_id), first)
+        with mock.patch("volunteer_app.utils.time.time", return_value=1_200_000_310):
+            self.assertNotEqual(make_checkin_token(self.activity_id), first)
+
+    def test_aligned_token_survives_grace(self):
+        """Test a token keeps verifying for QR_TOKEN_GRACE after its window"""
+        with self.settings(QR_TOKEN_GRACE=60):
+            with mock.patch("volunteer_app.utils.time.time", return_value=1_200_000_010):
+                token = make_checkin_token(self.activity_id)
+            with mock.patch("volunteer_app.utils.time.time", return_value=1_200_000_350):
+                self.assertEqual(verify_checkin_token(token), (True, self.activity_id))
+            with mock.patch("volunteer_app.utils.time.time", return_value=1_200_000_361):
+                self.assertEqual(verify_checkin_token(token), (False, None))
+
+    def test_unaligned_mode(self):
+        """Test aligned=False keeps the old now + expires_in expiry"""
+        with mock.patch("volunteer_app.utils.time.time", return_value=1_200_000_010):
+            self.assertEqual(token_expiry(300, aligned=False), 1_200_000_310)
+
+
+class TokenCodecTests(TestCase):
+    """Tests for volunteer_app.tokens"""
+
+    def setUp(self):
+        cache.clear()
+        recent_scans.clear()
+
+    def test_round_trip_dispatches_on_kind(self):
+        """Test one decode reports kind, activity and expiry"""
+        for kind in (tokens.KIND_QR, tokens.KIND_CHECKIN, tokens.KIND_CHECKOUT):
+            result = tokens.decode_token(tokens.encode_token(kind, 7, 1_900_000_000), now=1_800_000_000)
+            self.assertEqual(result, tokens.TokenResult(True, kind, 7, 1_900_000_000, None))
+
+    def test_error_reasons(self):
+        """Test rejected tokens say why"""
+        token = tokens.encode_token(tokens.KIND_CHECKIN, 7, 1_900_000_000)
+        self.assertEqual(tokens.decode_token("not a token").error, "malformed")
+        self.assertEqual(tokens.decode_token(token, now=1_900_000_001).error, "expired")
+        with self.settings(QR_SECRET="another-secret"):
+            self.assertEqual(tokens.decode_token(token, now=1_800_000_000).error, "bad_signature")
+
+    def test_non_ascii_signature_rejected(self):
+        """Test a crafted v1 token with a non-ASCII signature is rejected, not a 500"""
+        token = base64.urlsafe_b64encode("1:9999999999:é".encode()).decode()
+        self.assertEqual(tokens.decode_token(token).error, "bad_signature")
+        user = User.objects.create_user(username="crafted", password="x")
+        self.client.force_login(user)
+        response = self.client.post(reverse("volunteer_app:check_in"), {"token": token})
+        self.assertLess(response.status_code, 500)
+
+    def test_matches_legacy_format(self):
+        """Test codec output verifies with the utils wrappers and vice versa"""
+        token = make_checkin_token(3)
+        self.assertEqual(verify_checkin_token(token), (True, 3))
+        self.assertEqual(verify_qr_token(token), (False, None))
+        self.assertTrue(tokens.decode_token(token).ok)
+
+    def test_compact_v2_format(self):
+        """Test v2 tokens are 32 base32 chars, verify, and reject tampering"""
+        token = tokens.encode_token(tokens.KIND_CHECKOUT, 7, 1_900_000_000, version=2)
+        self.assertRegex(token, r"^[A-Z2-7]{32}$")
+        self.assertEqual(tokens.decode_token(token, now=1_800_000_000), (True, "checkout", 7, 1_900_000_000, None))
+        tampered = ("A" if token[5] != "A" else "B").join([token[:5], token[6:]])
+        self.assertFalse(tokens.decode_token(tampered, now=1_800_000_000).ok)
+
+    def test_v1_tokens_still_verify(self):
+        """Test printed v1 codes keep working when new tokens are v2"""
+        legacy = tokens.encode_token(tokens.KIND_QR, 7, 1_900_000_000, version=1)
+        self.assertFalse(tokens.is_compact(legacy))
+        self.assertEqual(tokens.decode_token(legacy, now=1_800_000_000).activity_id, 7)
+        with self.settings(QR_TOKEN_VERSION=1):
+            self.assertFalse(tokens.is_compact(make_qr_token(7)))
+
+    def test_short_path_dispatches_by_kind(self):
+        """Test /t/<token>/ routes a check-in token to check_in"""
+        user = User.objects.create_user(username="shortpath", password="x")
+        activity = Activity.objects.create(title="Short", datetime=timezone.now(), location="L", created_by=user)
+        ActivitySignup.objects.create(activity=activity, user=user, status="confirmed")
+        self.client.force_login(user)
+        token = activity.checkin_token()
+        self.assertTrue(tokens.is_compact(token))
+        response = self.client.get(reverse("volunteer_app:short_token", args=[token]))
+        self.assertEqual(response.json()["code"], "checkin_success")
+
+        detail = self.client.get(reverse("volunteer_app:activity_detail", args=[activity.pk]))
+        self.assertIn("/t/", detail.context["qr_url"])
+
+    def test_qr_upload_dispatches_by_kind(self):
+        """Test qr_upload records a check-in from a check-in token"""
+        user = User.objects.create_user(username="uploader", password="x")
+        activity = Activity.objects.create(title="Upload", datetime=timezone.now(), location="L")
+        ActivitySignup.objects.create(activity=activity, user=user, status="confirmed")
+        self.client.force_login(user)
+        image = SimpleUploadedFile("qr.png", b"png", content_type="image/png")
+        with mock.patch("volunteer_app.views.read_qr_code_from_image", return_value=(True, activity.checkin_token(), None)):
+            response = self.client.post(reverse("volunteer_app:qr_upload"), {"image": image})
+        self.assertEqual(response.json()["code"], "checkin_success")
+        self.assertTrue(CheckInOut.objects.filter(user=user, check_type="checkin").exists())
+
+
+class QRDecodePipelineTests(TestCase):
+    """Tests for services.qr_decode"""
+
+    def photo(self, data="https://example.com/t/ABC/", canvas=(3000, 2000), fmt="JPEG", exif=None):
+        code = qrcode.make(data, box_size=12).get_image().convert("L")
+        image = Image.new("L", canvas, 200)
+        image.paste(code, (canvas[0] // 3, canvas[1] // 4))
+        buffer = BytesIO()
+        image.save(buffer, format=fmt, **({"exif": exif} if exif else {}))
+        return buffer.getvalue()
+
+    def test_large_photo_is_downscaled_and_decoded(self):
+        """Test a big photo decodes on a bounded working image"""
+        result = qr_decode.decode_qr_image(self.photo(), max_side=1000)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.data, "https://example.com/t/ABC/")
+        self.assertIn("load", result.timings)
+        self.assertTrue(result.stage.startswith("pyzbar@"))
+
+    def test_exif_orientation_applied(self):
+        """Test the working image is upright and grayscale"""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotate 90 degrees clockwise for display
+        image = qr_decode.load_working_image(self.photo(canvas=(300, 200), exif=exif), max_side=1000)
+        self.assertEqual((image.size, image.mode), ((200, 300), "L"))
+
+    def test_opencv_fallback(self):
+        """Test OpenCV runs only after every pyzbar pass misses"""
+        with mock.patch.object(qr_decode, "_pyzbar", return_value=None) as zbar:
+            result = qr_decode.decode_qr_image(self.photo(canvas=(800, 600), fmt="PNG"))
+        self.assertEqual((result.ok, result.stage), (True, "opencv"))
+        self.assertEqual(zbar.call_count, 2 * len(qr_decode.PYRAMID_SCALES))
+
+    def test_non_utf8_payload_is_not_found(self):
+        """Test a QR holding non-UTF-8 bytes, or a failing OpenCV pass, reports not found instead of raising"""
+        binary = mock.Mock(data=b"\xff\xfe\x80 not text")
+        with mock.patch.object(qr_decode.pyzbar, "decode", return_value=[binary]), \
+                mock.patch.object(qr_decode.cv2, "QRCodeDetector", side_effect=UnicodeDecodeError("utf-8", b"\xff", 0, 1, "bad")):
+            result = qr_decode.decode_qr_image(self.photo(data=b"\xff\xfe\x80", canvas=(800, 600), fmt="PNG"))
+        self.assertEqual((result.ok, result.error), (False, qr_decode.NOT_FOUND_MESSAGE))
+
+    def test_not_an_image(self):
+        """Test garbage input reports an error instead of raising"""
+        ok, data, error = read_qr_code_from_image(b"not an image")
+        self.assertFalse(ok)
+        self.assertIsNone(data)
+        self.assertTrue(error)
+
+
+class AsyncQRUploadTests(TestCase):
+    """Tests for the pooled qr_upload mode and its status endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        recent_scans.clear()
+        self.user = User.objects.create_user(username="asyncup", password="x")
+        self.activity = Activity.objects.create(title="Async", datetime=timezone.now(), location="L")
+        ActivitySignup.objects.create(activity=self.activity, user=self.user, status="confirmed")
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        decode_jobs.shutdown_executor()
+
+    def upload(self, data):
+        code = qrcode.make(data).get_image()
+        buffer = BytesIO()
+        code.save(buffer, format="PNG")
+        image = SimpleUploadedFile("qr.png", buffer.getvalue(), content_type="image/png")
+        return self.client.post(reverse("volunteer_app:qr_upload"), {"image": image, "async": "1"})
+
+    def test_job_result_via_status_endpoint(self):
+        """Test upload returns a job id at once and the status poll records the check-in"""
+        with self.settings(QR_DECODE_EXECUTOR="thread", QR_DECODE_WORKERS=1):
+            response = self.upload(f"https://example.com/check-in/?token={self.activity.checkin_token()}")
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.json()["poll_timeout"], 600)
+            status_url = response.json()["status_url"]
+            decode_jobs.shutdown_executor()  # waits for the decode to finish
+
+        result = self.client.get(status_url).json()
+        self.assertEqual(result["code"], "checkin_success")
+        self.assertEqual(self.client.get(status_url).json(), result)
+        self.assertEqual(CheckInOut.objects.filter(user=self.user).count(), 1)
+
+        other = User.objects.create_user(username="other", password="x")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(status_url).status_code, 404)
+
+    def test_back_pressure(self):
+        """Test a full queue answers 429 with Retry-After"""
+        with self.settings(QR_DECODE_EXECUTOR="thread", QR_DECODE_QUEUE_SIZE=0, QR_DECODE_RETRY_AFTER=7):
+            response = self.upload("anything")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "7")
+
+
+class BatchIngestTests(TestCase):
+    """Tests for staff batch QR photo ingestion"""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(username="staff", password="x", is_staff=True)
+        self.alice = User.objects.create_user(username="alice", password="x", student_id="6401")
+        self.bob = User.objects.create_user(username="bob", password="x")
+        User.objects.create_user(username="carol", password="x")
+        dave = User.objects.create_user(username="dave", password="x")
+        self.activity = Activity.objects.create(
+            title="Batch", datetime=timezone.now(), location="L", hours_reward=2
+        )
+        for user in (self.alice, self.bob, dave):
+            ActivitySignup.objects.create(activity=self.activity, user=user, status="confirmed")
+        CheckInOut.objects.create(
+            activity=self.activity, user=self.bob, check_type="checkin", token="t",
+            checked_at=timezone.now() - timedelta(minutes=90),
+        )
+
+    def png(self, data):
+        buffer = BytesIO()
+        qrcode.make(data).get_image().save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def zip_of(self, files):
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for name, data in files:
+                archive.writestr(name, data)
+        return buffer.getvalue()
+
+    def test_zip_and_files_are_recorded(self):
+        """Test users resolve from file names and rows are written in bulk"""
+        archive = self.zip_of([
+            ("event/6401.png", self.png(f"https://x/qr/confirm/{self.activity.qr_token()}/")),
+            ("event/nobody.png", self.png(self.activity.qr_token())),
+            ("event/notes.txt", b"ignored"),
+        ])
+        self.client.force_login(self.staff)
+        with self.settings(QR_DECODE_EXECUTOR="thread"):
+            response = self.client.post(reverse("volunteer_app:admin_qr_batch_upload"), {"files": [
+                SimpleUploadedFile("photos.zip", archive),
+                SimpleUploadedFile("bob.png", self.png(f"https://x/check-out/?token={self.activity.checkout_token()}")),
+                SimpleUploadedFile("6401-again.png", b"not an image"),
+                SimpleUploadedFile("carol.png", self.png(self.activity.qr_token())),
+                SimpleUploadedFile("dave.png", self.png(self.activity.checkout_token())),
+            ]})
+        report = {r["file"]: r["code"] for r in response.json()["files"]}
+        self.assertEqual(report, {
+            "event/6401.png": "recorded",
+            "event/nobody.png": "user_not_found",
+            "bob.png": "recorded",
+            "6401-again.png": "qr_read_failed",
+            "carol.png": "not_signed_up",
+            "dave.png": "not_checked_in",
+        })
+        self.assertTrue(QRScan.objects.filter(user=self.alice, scanned_from_staff=True).exists())
+        # measured from the existing check-in like a live check-out, not the flat activity hours
+        self.assertEqual(float(CheckInOut.objects.get(user=self.bob, check_type="checkout").calculated_hours), 1.5)
+        self.assertEqual(self.alice.total_hours(), 2.0)
+        self.assertFalse(QRScan.objects.filter(user__username="carol").exists())
+        self.activity.refresh_from_db()
+        self.assertEqual((self.activity.confirmed_count, self.activity.attended_count), (1, 2))
+
+    def test_repeat_ingest_reports_duplicates(self):
+        """Test the management command skips rows that already exist"""
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        with open(os.path.join(folder, "6401.png"), "wb") as fh:
+            fh.write(self.png(self.activity.qr_token()))
+        out = StringIO()
+        with self.settings(QR_DECODE_EXECUTOR="thread"):
+            call_command("ingest_qr_photos", folder, stdout=out)
+            call_command("ingest_qr_photos", folder, stdout=out)
+        self.assertIn("already_recorded", out.getvalue())
+        self.assertEqual(QRScan.objects.filter(user=self.alice).count(), 1)
+
+    def test_staff_only(self):
+        """Test students cannot use the batch endpoint"""
+        self.client.force_login(self.alice)
+        response = self.client.post(reverse("volunteer_app:admin_qr_batch_upload"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_late_ingest_uses_token_time(self):
+        """Test hours come from when the codes were shown, not when the photos are ingested"""
+        start = timezone.now() - timedelta(days=1)
+        event = Activity.objects.create(title="Yesterday", datetime=start, location="L", hours_reward=3)
+        erin = User.objects.create_user(username="erin", password="x")
+        for user in (self.alice, self.bob, erin):
+            ActivitySignup.objects.create(activity=event, user=user, status="confirmed")
+        CheckInOut.objects.create(activity=event, user=self.bob, check_type="checkin", token="t", checked_at=start)
+
+        def shown_at(kind, minutes):
+            # a code shown ``minutes`` into the event expires one grace period later
+            return tokens.encode_token(kind, event.pk, int((start + timedelta(minutes=minutes)).timestamp()) + 60)
+
+        files = [
+            ("bob.png", self.png(shown_at(tokens.KIND_CHECKOUT, 120))),
+            ("6401.png", self.png(shown_at(tokens.KIND_CHECKIN, 30))),
+            ("6401.png", self.png(shown_at(tokens.KIND_CHECKOUT, 120))),
+            ("erin.png", self.png(shown_at(tokens.KIND_CHECKIN, 0))),
+            ("erin.png", self.png(shown_at(tokens.KIND_CHECKOUT, 10 * 60))),
+        ]
+        with self.settings(QR_DECODE_EXECUTOR="thread", QR_TOKEN_GRACE=60):
+            # one ingest per photo, as staff upload them the day after
+            for name, data in files:
+                batch_ingest.ingest_qr_images([(name, data)], allow_expired=True)
+
+        def hours(user):
+            return float(CheckInOut.objects.get(activity=event, user=user, check_type="checkout").calculated_hours)
+
+        self.assertEqual(hours(self.bob), 2.0)
+        self.assertEqual(hours(self.alice), 1.5)
+        # a code past the activity's end is held to its hours
+        self.assertEqual(hours(erin), 3.0)
+
+    def test_same_batch_checkin_and_checkout(self):
+        """Test a check-in and check-out photographed together are measured between their codes"""
+        start = timezone.now() - timedelta(days=1)
+        event = Activity.objects.create(title="Together", datetime=start, location="L", hours_reward=3)
+        ActivitySignup.objects.create(activity=event, user=self.alice, status="confirmed")
+
+        def shown_at(kind, minutes):
+            return tokens.encode_token(kind, event.pk, int((start + timedelta(minutes=minutes)).timestamp()) + 60)
+
+        archive = self.zip_of([
+            ("in/6401.png", self.png(shown_at(tokens.KIND_CHECKIN, 15))),
+            ("out/6401.png", self.png(shown_at(tokens.KIND_CHECKOUT, 75))),
+        ])
+        with self.settings(QR_DECODE_EXECUTOR="thread", QR_TOKEN_GRACE=60):
+            batch_ingest.ingest_qr_images([("photos.zip", archive)], allow_expired=True)
+        checkout = CheckInOut.objects.get(activity=event, user=self.alice, check_type="checkout")
+        self.assertEqual(float(checkout.calculated_hours), 1.0)
+
+    def test_oversized_zip_rejected_before_reading(self):
+        """Test a zip over the image cap is refused without reading its entries"""
+        archive = self.zip_of([(f"{i}.png", b"x") for i in range(3)])
+        self.client.force_login(self.staff)
+        with mock.patch.object(batch_ingest, "MAX_BATCH_IMAGES", 2), \
+                mock.patch.object(zipfile.ZipFile, "read", side_effect=AssertionError("entry read")):
+            response = self.client.post(reverse("volunteer_app:admin_qr_batch_upload"), {
+                "files": [SimpleUploadedFile("photos.zip", archive)],
+            })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["code"], "batch_too_large")
+
+
+class AttendanceServiceTests(TestCase):
+    """Tests for the shared check-in/check-out/confirm path"""
+
+    def setUp(self):
+        cache.clear()
+        recent_scans.clear()
+        self.user = User.objects.create_user(username="alice", password="x")
+        self.activity = Activity.objects.create(
+            title="Hot path", datetime=timezone.now(), location="L", hours_reward=2
+        )
+        ActivitySignup.objects.create(activity=self.activity, user=self.user, status="confirmed")
+        UserHoursSummary.objects.create(user=self.user)
+        self.client.force_login(self.user)
+        # warm the session and notification preference so counts cover only the scan itself
+        self.client.get(reverse("volunteer_app:index"))
+
+    def post(self, name, token):
+        return self.client.post(reverse(f"volunteer_app:{name}"), {"token": token}).json()
+
+    def test_check_in_and_out_query_counts(self):
+        """Test check-in and check-out stay within a fixed number of queries"""
+        with self.assertNumQueries(8):
+            data = self.post("check_in", self.activity.checkin_token())
+        self.assertEqual(data["code"], "checkin_success")
+        with self.assertNumQueries(13):
+            data = self.post("check_out", self.activity.checkout_token())
+        self.assertEqual(data["code"], "checkout_success")
+        self.assertEqual(data["calculated_hours"], 2.0)
+        self.assertEqual(ActivitySignup.objects.get(user=self.user).status, "attended")
+        self.activity.refresh_from_db()
+        self.assertEqual((self.activity.confirmed_count, self.activity.attended_count), (0, 1))
+
+    def test_qr_verify_query_count_and_repeat(self):
+        """Test a QR confirm is one validation query plus the writes, and a repeat is served from cache"""
+        with self.assertNumQueries(13):
+            data = self.post("qr_verify", self.activity.qr_token())
+        self.assertEqual(data["code"], "success")
+        # only the session and user lookups remain
+        with self.assertNumQueries(2):
+            data = self.post("qr_verify", self.activity.qr_token())
+        self.assertEqual(data["code"], "already_attended")
+        self.assertEqual(User.objects.get(pk=self.user.pk).total_hours(), 2.0)
+
+    def test_repeat_without_cache_validates_once(self):
+        """Test a repeat that misses the recent-scan cache still costs only the validation query"""
+        self.post("qr_verify", self.activity.qr_token())
+        recent_scans.clear()
+        with self.assertNumQueries(3):
+            data = self.post("qr_verify", self.activity.qr_token())
+        self.assertEqual(data["code"], "already_attended")
+
+    def test_admin_delete_clears_recent_scan(self):
+        """Test deleting a scan lets the student confirm again instead of hitting the cache"""
+        self.post("qr_verify", self.activity.qr_token())
+        self.post("check_in", self.activity.checkin_token())
+        staff = User.objects.create_user(username="staff", password="x", is_staff=True)
+        self.client.force_login(staff)
+        self.client.post(reverse("volunteer_app:admin_delete_qr_scan", args=[QRScan.objects.get().pk]))
+        self.assertIsNone(recent_scans.get(self.activity.pk, self.user.pk, tokens.KIND_QR))
+        self.assertIsNotNone(recent_scans.get(self.activity.pk, self.user.pk, tokens.KIND_CHECKIN))
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.post("qr_verify", self.activity.qr_token())["code"], "success")
+
+    def test_failure_codes(self):
+        """Test the validation outcomes the endpoints report"""
+        self.assertEqual(self.post("check_out", self.activity.checkout_token())["code"], "not_checked_in")
+        other = Activity.objects.create(title="Other", datetime=timezone.now(), location="L")
+        self.assertEqual(self.post("check_in", other.checkin_token())["code"], "not_signed_up")
+        other.status = "cancelled"
+        other.save()
+        self.assertEqual(self.post("check_in", other.checkin_token())["code"], "activity_cancelled")
+        token = tokens.encode_token(tokens.KIND_CHECKIN, 99999, int(timezone.now().timestamp()) + 60)
+        self.assertEqual(self.post("check_in", token)["code"], "activity_not_found")
+
+        self.post("check_in", self.activity.checkin_token())
+        data = self.post("check_in", self.activity.checkin_token())
+        self.assertEqual(data["code"], "already_checked_in")
+        self.assertIn("checked_in_at", data)
+
+
+class RateLimitTests(TestCase):
+    """Tests for the token-bucket rate limiter"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="alice", password="x")
+        self.client.force_login(self.user)
+
+    def test_user_bucket_returns_429_with_retry_after(self):
+        """Test a user over budget gets 429 + Retry-After and the rejection is counted"""
+        url = reverse("volunteer_app:check_in")
+        with self.settings(RATE_LIMITS={"scan": {"user": "2/m", "ip": "100/m"}}):
+            codes = [self.client.post(url, {"token": "x"}).status_code for _ in range(2)]
+            response = self.client.post(url, {"token": "x"})
+            self.assertEqual(codes, [200, 200])
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response["Retry-After"], "30")
+            self.assertEqual(response.json()["code"], "rate_limited")
+            self.assertEqual(ratelimit.rejection_counts(["scan"]), {"scan": 1})
+
+            # another user behind the same IP still has budget
+            self.client.force_login(User.objects.create_user(username="bob", password="x"))
+            self.assertEqual(self.client.post(url, {"token": "x"}).status_code, 200)
+
+    def test_bucket_refills_and_ip_bucket_applies_to_anonymous(self):
+        """Test tokens come back over time and anonymous callers are limited per IP"""
+        self.client.logout()
+        url = reverse("volunteer_app:chatbot_api")
+        with self.settings(RATE_LIMITS={"chatbot": {"ip": "1/s"}}), \
+                mock.patch("volunteer_app.ratelimit.time.time", return_value=1_000_000.0) as now:
+            self.assertEqual(self.client.post(url, {"q": "hi"}).status_code, 200)
+            self.assertEqual(self.client.post(url, {"q": "hi"}).status_code, 429)
+            now.return_value += 1
+            self.assertEqual(self.client.post(url, {"q": "hi"}).status_code, 200)
+
+    def test_ip_refusal_does_not_charge_user(self):
+        """Test a request refused by the IP bucket leaves the user's bucket untouched"""
+        url = reverse("volunteer_app:check_in")
+        with self.settings(RATE_LIMITS={"scan": {"user": "2/h", "ip": "1/m"}}), \
+                mock.patch("volunteer_app.ratelimit.time.time", return_value=1_000_000.0) as now:
+            self.assertEqual(self.client.post(url, {"token": "x"}).status_code, 200)
+            for _ in range(3):
+                self.assertEqual(self.client.post(url, {"token": "x"}).status_code, 429)
+            # the IP bucket refills one token; the user still has the second of their two
+            now.return_value += 60
+            self.assertEqual(self.client.post(url, {"token": "x"}).status_code, 200)
+
+    def test_upload_has_its_own_budget(self):
+        """Test exhausting the upload budget leaves scanning untouched"""
+        limits = {"upload": {"user": "1/m"}, "scan": {"user": "5/m"}}
+        with self.settings(RATE_LIMITS=limits):
+            self.client.post(reverse("volunteer_app:qr_upload"))
+            self.assertEqual(self.client.post(reverse("volunteer_app:qr_upload")).status_code, 429)
+            self.assertEqual(self.client.post(reverse("volunteer_app:qr_verify"), {"token": "x"}).status_code, 200)
+
+
+class KioskSyncTests(TestCase):
+    """Tests for the offline kiosk bulk sync endpoint"""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(username="staff", password="x", is_staff=True)
+        self.alice = User.objects.create_user(username="alice", password="x", student_id="6401")
+        self.bob = User.objects.create_user(username="bob", password="x")
+        self.carol = User.objects.create_user(username="carol", password="x")
+        self.activity = Activity.objects.create(
+            title="Kiosk", datetime=timezone.now(), location="L", hours_reward=2
+        )
+        for user in (self.alice, self.bob):
+            ActivitySignup.objects.create(activity=self.activity, user=user, status="confirmed")
+        self.start = timezone.now() - timedelta(hours=3)
+        self.checkin = tokens.encode_token(tokens.KIND_CHECKIN, self.activity.pk, int(self.start.timestamp()) + 600)
+        self.checkout = tokens.encode_token(
+            tokens.KIND_CHECKOUT, self.activity.pk, int(self.start.timestamp()) + 4 * 3600
+        )
+
+    def entry(self, id, token, student, minutes):
+        return {"id": id, "token": token, "student": student,
+                "scanned_at": (self.start + timedelta(minutes=minutes)).isoformat(), "device_id": "kiosk-1"}
+
+    def sync(self, scans):
+        self.client.force_login(self.staff)
+        return self.client.post(
+            reverse("volunteer_app:kiosk_sync_scans"),
+            json.dumps({"device_id": "kiosk-1", "scans": scans}),
+            content_type="application/json",
+        )
+
+    def test_batch_records_with_client_times(self):
+        """Test queued scans keep their times, hours come from them and one IN query resolves signups"""
+        scans = [
+            # out of order on purpose: the check-out is matched to the check-in from the same batch
+            self.entry("3", self.checkout, "6401", 90),
+            self.entry("1", self.checkin, "6401", 0),
+            self.entry("2", self.checkin, "carol", 1),
+            self.entry("4", self.checkout, "bob", 95),
+            self.entry("5", "garbage", "bob", 2),
+        ]
+        # one more when the scans fall on yesterday (just after midnight), to look for its rollup
+        with self.assertNumQueries(19 if timezone.localdate(self.start) == timezone.localdate() else 20):
+            results = kiosk_sync.sync_kiosk_scans(scans)
+        codes = {r["id"]: r["code"] for r in results}
+        self.assertEqual(codes, {
+            "1": "recorded", "2": "not_signed_up", "3": "recorded", "4": "not_checked_in", "5": "invalid_token",
+        })
+
+        checkin = CheckInOut.objects.get(user=self.alice, check_type="checkin")
+        checkout = CheckInOut.objects.get(user=self.alice, check_type="checkout")
+        self.assertEqual(checkin.checked_at, self.start)
+        self.assertEqual(checkout.device_id, "kiosk-1")
+        self.assertEqual(float(checkout.calculated_hours), 1.5)
+        self.assertEqual(ActivitySignup.objects.get(user=self.alice).status, "attended")
+        self.assertEqual(self.alice.total_hours(), 1.5)
+
+    def test_retry_is_idempotent(self):
+        """Test resending the same queue reports already_recorded and writes nothing new"""
+        scans = [self.entry("1", self.checkin, "bob", 0), self.entry("2", self.checkout, "bob", 3)]
+        self.sync(scans)
+        results = self.sync(scans).json()["results"]
+        self.assertEqual([(r["ok"], r["code"]) for r in results], [(True, "already_recorded")] * 2)
+        self.assertEqual(CheckInOut.objects.filter(user=self.bob).count(), 2)
+        # under 6 minutes falls back to the activity's hours like the live check-out
+        self.assertEqual(float(CheckInOut.objects.get(user=self.bob, check_type="checkout").calculated_hours), 2.0)
+
+    def test_non_string_fields_are_invalid_entries(self):
+        """Test entries with non-string token/student/device_id fail alone instead of the whole batch"""
+        results = self.sync([
+            {"id": "1", "token": 123, "student": "bob", "scanned_at": self.start.isoformat()},
+            dict(self.entry("2", self.checkin, "bob", 0), device_id=["x"]),
+            {"id": "3", "token": self.checkin, "student": None, "scanned_at": self.start.isoformat()},
+            self.entry("4", self.checkin, "6401", 0),
+        ]).json()["results"]
+        self.assertEqual([r["code"] for r in results], ["invalid_entry"] * 3 + ["recorded"])
+
+    def test_token_checked_at_scan_time(self):
+        """Test a token valid when scanned is accepted late, but not for scans after it expired"""
+        results = self.sync([
+            self.entry("1", self.checkin, "bob", 5),
+            self.entry("2", self.checkin, "6401", 30),
+        ]).json()["results"]
+        self.assertEqual([r["code"] for r in results], ["recorded", "invalid_token"])
+
+    def test_kiosk_page_and_permissions(self):
+        """Test the kiosk page carries a long-lived token and students cannot sync"""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("volunteer_app:activity_kiosk", args=[self.activity.pk, "checkin"]))
+        result = tokens.decode_token(response.context["kiosk"]["token"])
+        self.assertEqual((result.kind, result.activity_id), (tokens.KIND_CHECKIN, self.activity.pk))
+        self.assertGreater(result.expires_at, timezone.now().timestamp() + 3600)
+        self.assertContains(response, "data-kiosk-sync-url")
+
+        self.client.force_login(self.alice)
+        self.assertEqual(
+            self.client.get(reverse("volunteer_app:activity_kiosk", args=[self.activity.pk, "checkin"])).status_code,
+            403,
+        )
+        response = self.client.post(
+            reverse("volunteer_app:kiosk_sync_scans"),
+            json.dumps({"scans": [self.entry("1", self.checkin, "bob", 0)]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["results"][0]["code"], "not_allowed")
+        self.assertFalse(CheckInOut.objects.exists())
+
+    def test_creator_can_sync_own_activity(self):
+        """Test a non-staff creator allowed on the kiosk page can also sync its scans"""
+        creator = User.objects.create_user(username="creator", password="x")
+        Activity.objects.filter(pk=self.activity.pk).update(created_by=creator)
+        self.client.force_login(creator)
+        page = self.client.get(reverse("volunteer_app:activity_kiosk", args=[self.activity.pk, "checkin"]))
+        self.assertEqual(page.status_code, 200)
+        response = self.client.post(
+            reverse("volunteer_app:kiosk_sync_scans"),
+            json.dumps({"scans": [self.entry("1", self.checkin, "bob", 0)]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["results"][0]["code"], "recorded")
+
+    def test_late_sync_rerolls_past_days(self):
+        """Test scans synced into a day already rolled up are added to that day's rollup"""
+        scanned = timezone.now() - timedelta(days=2)
+        day = timezone.localdate(scanned)
+        QRScan.objects.create(activity=self.activity, user=self.bob, token="t", scanned_at=scanned)
+        reporting_service.rollup_days(day, timezone.localdate() - timedelta(days=1))
+        token = tokens.encode_token(tokens.KIND_CHECKIN, self.activity.pk, int(scanned.timestamp()) + 600)
+        results = self.sync([{"id": "1", "token": token, "student": "bob", "scanned_at": scanned.isoformat()}])
+        self.assertEqual(results.json()["results"][0]["code"], "recorded")
+        stat = DailyActivityStat.objects.get(day=day)
+        self.assertEqual((stat.scan_count, stat.checkin_count), (1, 1))
+
+
+class FinalizeActivityTests(TestCase):
+    """Tests for closing finished activities in bulk"""
+
+    def setUp(self):
+        self.start = timezone.now() - timedelta(hours=5)
+        self.activity = Activity.objects.create(
+            title="Cleanup", datetime=self.start, location="L", hours_reward=3, status="ongoing"
+        )
+        self.users = {}
+        for name in ("early", "done", "scanned", "absent", "queued"):
+            self.users[name] = User.objects.create_user(username=name, password="x")
+        for name in ("early", "done", "scanned", "absent"):
+            ActivitySignup.objects.create(activity=self.activity, user=self.users[name], status="confirmed")
+        ActivitySignup.objects.create(activity=self.activity, user=self.users["queued"], status="waitlist")
+        for name, minutes in (("early", 30), ("done", 0)):
+            CheckInOut.objects.create(
+                activity=self.activity, user=self.users[name], check_type="checkin",
+                checked_at=self.start + timedelta(minutes=minutes), token="t",
+            )
+        CheckInOut.objects.create(
+            activity=self.activity, user=self.users["done"], check_type="checkout",
+            checked_at=self.start + timedelta(hours=1), token="t", calculated_hours=1,
+        )
+        QRScan.objects.create(activity=self.activity, user=self.users["scanned"], token="t")
+
+    def test_finalize_checks_out_and_settles_signups(self):
+        """Test open check-ins are closed at the activity end and every signup gets a final status"""
+        with self.captureOnCommitCallbacks(execute=True):
+            report = finalize_service.finalize_activities([self.activity.pk])
+        self.assertEqual(report, {self.activity.pk: {"checked_out": 1, "attended": 3, "no_show": 1}})
+
+        checkout = CheckInOut.objects.get(user=self.users["early"], check_type="checkout")
+        self.assertEqual(checkout.checked_at, self.start + timedelta(hours=3))
+        self.assertEqual(float(checkout.calculated_hours), 2.5)
+        statuses = dict(ActivitySignup.objects.values_list("user__username", "status"))
+        self.assertEqual(statuses, {
+            "early": "attended", "done": "attended", "scanned": "attended", "absent": "no_show", "queued": "waitlist",
+        })
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.status, "completed")
+        self.assertEqual((self.activity.confirmed_count, self.activity.attended_count), (0, 3))
+        self.assertEqual(User.objects.get(username="early").hours_summary.total_hours, 2.5)
+        self.assertEqual(Notification.objects.filter(category="hours").count(), 1)
+        self.assertEqual(Notification.objects.get(category="hours").user, self.users["early"])
+
+    def test_rerun_and_cancelled_are_skipped(self):
+        """Test completed and cancelled activities are left untouched"""
+        finalize_service.finalize_activities([self.activity.pk])
+        cancelled = Activity.objects.create(
+            title="Off", datetime=self.start, location="L", hours_reward=1, status="cancelled"
+        )
+        self.assertEqual(finalize_service.finalize_activities([self.activity.pk, cancelled.pk]), {})
+        self.assertEqual(CheckInOut.objects.filter(check_type="checkout").count(), 2)
+
+    def test_checkouts_reroll_past_days(self):
+        """Test automatic check-outs stamped on a day already rolled up are added to that day's rollup"""
+        start = timezone.now() - timedelta(days=2)
+        old = Activity.objects.create(title="Old", datetime=start, location="L", hours_reward=2, status="ongoing")
+        ActivitySignup.objects.create(activity=old, user=self.users["absent"], status="confirmed")
+        CheckInOut.objects.create(activity=old, user=self.users["absent"], check_type="checkin", checked_at=start, token="t")
+        reporting_service.rollup_days(timezone.localdate(start), timezone.localdate() - timedelta(days=1))
+        finalize_service.finalize_activities([old.pk])
+        day = timezone.localdate(start + timedelta(hours=2))
+        self.assertEqual(DailyActivityStat.objects.get(day=day, activity=old).checkout_count, 1)
+
+    def test_command_picks_ended_activities(self):
+        """Test the command without ids finalizes only activities whose end time has passed"""
+        running = Activity.objects.create(
+            title="Running", datetime=timezone.now() - timedelta(hours=1), location="L", hours_reward=3
+        )
+        out = StringIO()
+        call_command("finalize_activities", stdout=out)
+        self.assertIn("Finalized 1 activities", out.getvalue())
+        running.refresh_from_db()
+        self.assertEqual(running.status, "upcoming")
+        self.assertEqual(Activity.objects.get(pk=self.activity.pk).status, "completed")
+
+
+class NotificationFanOutTests(TestCase):
+    """Tests for batched notification delivery"""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f"n{i}", password="x", email=f"n{i}@ubu.ac.th") for i in range(5)
+        ]
+        NotificationPreference.objects.filter(user=self.users[0]).update(hours_updates=False)
+        NotificationPreference.objects.filter(user=self.users[1]).update(email_enabled=False)
+        # users created before preferences existed
+        NotificationPreference.objects.filter(user=self.users[4]).delete()
+
+    def test_queryset_fan_out_costs_per_batch(self):
+        """Test a queryset is notified in batches of a fixed number of queries and emails are queued at once"""
+        users = User.objects.filter(username__startswith="n")
+        # per batch: users, preferences, notifications (+1 for the batch with a missing preference),
+        # then one insert into the outbox
+        with self.assertNumQueries(11):
+            created = notify_users(
+                users, "ประกาศ", "กิจกรรมเปลี่ยนเวลา", category="activity", channel="both", batch_size=2
+            )
+        self.assertEqual(len(created), 5)
+        self.assertEqual(NotificationPreference.objects.count(), 5)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = EmailOutbox.objects.values_list("to_email", flat=True)
+        self.assertEqual(len(queued), 4)
+        self.assertNotIn("n1@ubu.ac.th", queued)
+
+    def test_category_preferences_respected(self):
+        """Test users who turned a category off get nothing"""
+        created = notify_users(self.users[:2], "ชั่วโมง", "ได้รับชั่วโมงแล้ว", category="hours")
+        self.assertEqual([n.user for n in created], [self.users[1]])
+
+    def test_notify_user_delegates(self):
+        """Test the single-user helper returns its notification and honours email_override"""
+        notification = notify_user(self.users[2], "ทดสอบ", "ข้อความ", email_override=True)
+        self.assertEqual(notification.channel, "both")
+        self.assertEqual(EmailOutbox.objects.get().user, self.users[2])
+        self.assertIsNone(notify_user(self.users[0], "ทดสอบ", "ข้อความ", category="hours"))
+
+    def test_activity_change_announced_to_signups(self):
+        """Test editing an activity's location notifies every active signup in one fan-out"""
+        admin = User.objects.create_user(username="boss", password="x", is_staff=True)
+        activity = Activity.objects.create(title="Move", datetime=timezone.now(), location="A", hours_reward=1)
+        for user in self.users[1:4]:
+            ActivitySignup.objects.create(activity=activity, user=user, status="confirmed")
+        ActivitySignup.objects.filter(user=self.users[3]).update(status="cancelled")
+        self.client.force_login(admin)
+        self.client.post(reverse("volunteer_app:admin_edit_activity", args=[activity.pk]), {"location": "B"})
+        self.assertEqual(
+            set(Notification.objects.filter(category="activity").values_list("user__username", flat=True)),
+            {"n1", "n2"},
+        )
+
+
+class EmailOutboxTests(TestCase):
+    """Tests for the queued email delivery worker"""
+
+    def setUp(self):
+        email_outbox.enqueue_emails([(f"s{i}@ubu.ac.th", f"เรื่อง {i}", "ข้อความ") for i in range(3)])
+
+    def test_batch_sent_over_one_connection(self):
+        """Test due emails go out through a single opened connection and are marked sent"""
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.open") as opened:
+            sent, failed = email_outbox.deliver_pending(batch_size=2)
+        self.assertEqual((sent, failed), (2, 0))
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual([m.to for m in mail.outbox], [["s0@ubu.ac.th"], ["s1@ubu.ac.th"]])
+        out = StringIO()
+        call_command("deliver_emails", stdout=out)
+        self.assertIn("Delivered 1 emails", out.getvalue())
+        self.assertEqual(EmailOutbox.objects.filter(status="sent", sent_at__isnull=False).count(), 3)
+
+    def test_failures_retry_with_backoff_then_give_up(self):
+        """Test a failed message is retried later with a growing delay and marked failed at the limit"""
+        now = timezone.now()
+        with self.settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_DELAY=60), mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=OSError("smtp down")
+        ):
+            self.assertEqual(email_outbox.deliver_pending(now=now), (0, 3))
+            row = EmailOutbox.objects.first()
+            self.assertEqual((row.status, row.attempts, row.last_error), ("pending", 1, "smtp down"))
+            self.assertEqual(row.next_attempt_at, now + timedelta(seconds=60))
+            # not due yet
+            self.assertEqual(email_outbox.deliver_pending(now=now + timedelta(seconds=30)), (0, 0))
+            self.assertEqual(email_outbox.deliver_pending(now=now + timedelta(seconds=61)), (0, 3))
+        self.assertEqual(EmailOutbox.objects.filter(status="failed", attempts=2).count(), 3)
+        self.assertEqual(email_outbox.deliver_pending(now=now + timedelta(days=1)), (0, 0))
+
+
+class EmailDigestTests(TestCase):
+    """Tests for hourly/daily notification digests"""
+
+    def setUp(self):
+        self.hourly = User.objects.create_user(username="hourly", password="x", email="h@ubu.ac.th")
+        self.daily = User.objects.create_user(username="daily", password="x", email="d@ubu.ac.th")
+        self.instant = User.objects.create_user(username="instant", password="x", email="i@ubu.ac.th")
+        NotificationPreference.objects.filter(user=self.hourly).update(email_digest="hourly")
+        NotificationPreference.objects.filter(user=self.daily).update(email_digest="daily")
+
+    def notify(self, title, category):
+        notify_users([self.hourly, self.daily, self.instant], title, "รายละเอียด", category=category, channel="both")
+
+    def test_digest_users_held_and_coalesced(self):
+        """Test digest users get one email per run grouping every notification by category"""
+        for i in range(3):
+            self.notify(f"โหวต {i}", "idea")
+        self.notify("ชั่วโมงใหม่", "hours")
+        self.assertEqual(list(EmailOutbox.objects.values_list("to_email", flat=True).distinct()), ["i@ubu.ac.th"])
+        self.assertEqual(EmailDigestItem.objects.count(), 8)
+        # in-app notifications are not held back
+        self.assertEqual(Notification.objects.filter(user=self.hourly).count(), 4)
+
+        out = StringIO()
+        call_command("send_email_digests", "hourly", stdout=out)
+        self.assertIn("Queued 1 hourly digests", out.getvalue())
+        digest = EmailOutbox.objects.get(to_email="h@ubu.ac.th")
+        self.assertIn("4 รายการ", digest.subject)
+        self.assertIn("ไอเดีย (3)", digest.body)
+        self.assertIn("ชั่วโมงใหม่", digest.body)
+        self.assertEqual(EmailDigestItem.objects.filter(user=self.daily).count(), 4)
+        self.assertEqual(email_digest.send_digests("hourly"), 0)
+
+        self.assertEqual(email_digest.send_digests("daily"), 1)
+        self.assertFalse(EmailDigestItem.objects.exists())
+
+    def test_switching_back_and_email_off(self):
+        """Test held items are flushed after switching to immediate and dropped when email is off"""
+        self.notify("โหวต", "idea")
+        NotificationPreference.objects.filter(user=self.hourly).update(email_digest="immediate")
+        NotificationPreference.objects.filter(user=self.daily).update(email_enabled=False)
+        self.assertEqual(email_digest.send_digests("hourly"), 1)
+        self.assertEqual(email_digest.send_digests("daily"), 0)
+        self.assertFalse(EmailDigestItem.objects.exists())
+
+
+class UnreadCounterTests(TestCase):
+    """Tests for the cached unread-notification badge"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reader", password="x")
+        self.request = mock.Mock(user=self.user)
+
+    def badge(self):
+        return context_processors.unread_notifications(self.request)["unread_notifications_count"]
+
+    def test_count_cached_and_kept_current(self):
+        """Test only the first render queries and creates/reads adjust the cached count"""
+        notify_user(self.user, "หนึ่ง", "ข้อความ")
+        with self.assertNumQueries(1):
+            self.assertEqual(self.badge(), 1)
+        notify_users([self.user], "สอง", "ข้อความ")
+        Notification.objects.create(user=self.user, title="สาม", message="ข้อความ")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.badge(), 3)
+
+        first = Notification.objects.filter(user=self.user).order_by("id").first()
+        first.mark_read()
+        Notification.objects.get(pk=first.pk).mark_read()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.badge(), 2)
+        mark_notifications_read(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.badge(), 0)
+
+    def test_delete_recounts(self):
+        """Test deleting a notification drops the cached value so the next read recounts"""
+        notify_user(self.user, "หนึ่ง", "ข้อความ")
+        notify_user(self.user, "สอง", "ข้อความ")
+        self.assertEqual(self.badge(), 2)
+        Notification.objects.filter(user=self.user).first().delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.badge(), 1)
+
+
+class NotificationInboxTests(TestCase):
+    """Tests for the keyset-paginated notification inbox"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="inbox", password="x")
+        same_time = timezone.now() - timedelta(hours=1)
+        self.notifications = Notification.objects.bulk_create([
+            Notification(user=self.user, title=f"n{i}", message="m", is_read=i % 2 == 0) for i in range(7)
+        ])
+        # several rows share a timestamp so the id tiebreaker matters
+        Notification.objects.filter(user=self.user).update(created_at=same_time)
+        self.client.force_login(self.user)
+
+    def walk(self, **kwargs):
+        titles, cursor = [], None
+        while True:
+            page, cursor = notification_page(self.user, cursor, limit=3, **kwargs)
+            titles.extend(n.title for n in page)
+            if cursor is None:
+                return titles
+
+    def test_pages_cover_inbox_once_in_order(self):
+        """Test walking the cursors returns every notification exactly once, newest first"""
+        self.assertEqual(self.walk(), [f"n{i}" for i in range(6, -1, -1)])
+        self.assertEqual(self.walk(unread_only=True), ["n5", "n3", "n1"])
+
+    def test_page_is_one_query(self):
+        """Test a page costs one query however deep the cursor is, and a bad cursor restarts"""
+        _, cursor = notification_page(self.user, limit=3)
+        with self.assertNumQueries(1):
+            page, _ = notification_page(self.user, cursor, limit=3)
+        self.assertEqual([n.title for n in page], ["n3", "n2", "n1"])
+        self.assertEqual(notification_page(self.user, "junk", limit=1)[0][0].title, "n6")
+
+    def test_views(self):
+        """Test the inbox page links to the next page and the JSON variant returns rendered rows"""
+        with self.settings(NOTIFICATION_PAGE_SIZE=4):
+            response = self.client.get(reverse("volunteer_app:notifications"))
+            self.assertEqual(len(response.context["notifications"]), 4)
+            self.assertContains(response, "notification-more")
+            data = self.client.get(
+                reverse("volunteer_app:notifications_api"), {"cursor": response.context["next_cursor"]}
+            ).json()
+        self.assertEqual([n["title"] for n in data["notifications"]], ["n2", "n1", "n0"])
+        self.assertIsNone(data["next_cursor"])
+        self.assertIn("n2", data["html"])
+        response = self.client.get(reverse("volunteer_app:notifications"), {"unread": "1"})
+        self.assertEqual([n.title for n in response.context["notifications"]], ["n5", "n3", "n1"])
+        self.assertNotContains(response, "notification-more")
+
 
 class RegistrationTests(TestCase):
     """Tests for user registration"""
@@ -0,0 +1,146 @@
+"""Signed activity tokens shared by QR confirm, check-in and check-out.
+
+Two formats are accepted:
+
+* v1: urlsafe base64 of ``"[CHECKIN:|CHECKOUT:]{activity_id}:{expiry_ts}:{sig_hex}"``
+  where ``sig_hex`` is HMAC-SHA256 over everything before it. ~120 chars.
+* v2: 32 chars of RFC 4648 base32 over 20 packed bytes: version/kind (1),
+  activity id (4), expiry (4) and the HMAC truncated to 11 bytes (88 bits).
+  The alphabet fits QR alphanumeric mode, so with the short ``/t/<token>/``
+  path the code needs far fewer modules than a v1 URL.
+
+Both are keyed by ``settings.QR_SECRET``. ``decode_token`` tells them apart,
+parses once, dispatches on the type and reports why a token was rejected, so
+callers never need to try one verifier after another. ``encode_token``
+writes ``settings.QR_TOKEN_VERSION`` (default 2); printed v1 codes keep
+verifying.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import re
+import struct
+import time
+from functools import lru_cache
+from typing import NamedTuple, Optional
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+
+KIND_QR = "qr"
+KIND_CHECKIN = "checkin"
+KIND_CHECKOUT = "checkout"
+
+# payload prefix -> kind; QR confirm tokens have no prefix
+_PREFIX_KINDS = {"CHECKIN": KIND_CHECKIN, "CHECKOUT": KIND_CHECKOUT}
+_KIND_PREFIXES = {kind: f"{prefix}:" for prefix, kind in _PREFIX_KINDS.items()}
+_KIND_PREFIXES[KIND_QR] = ""
+
+_V2_KIND_CODES = {KIND_QR: 0, KIND_CHECKIN: 1, KIND_CHECKOUT: 2}
+_V2_CODE_KINDS = {code: kind for kind, code in _V2_KIND_CODES.items()}
+_V2_HEADER = struct.Struct(">BII")
+_V2_MAC_BYTES = 11
+_V2_PATTERN = re.compile(r"^[A-Z2-7]{32}$")
+
+
+class TokenResult(NamedTuple):
+    ok: bool
+    kind: Optional[str] = None
+    activity_id: Optional[int] = None
+    expires_at: Optional[int] = None
+    error: Optional[str] = None  # "malformed", "bad_signature" or "expired"
+
+
+@lru_cache(maxsize=4)
+def _mac_for_secret(secret: str):
+    # HMAC pads and hashes the key once; copies of this object skip that work
+    return hmac.new(secret.encode(), digestmod=hashlib.sha256)
+
+
+def _mac(payload: bytes):
+    mac = _mac_for_secret(settings.QR_SECRET).copy()
+    mac.update(payload)
+    return mac
+
+
+def _sign(payload: str) -> str:
+    return _mac(payload.encode()).hexdigest()
+
+
+def is_compact(token: str) -> bool:
+    """True for v2 tokens, which live under the short ``/t/<token>/`` path."""
+    return bool(_V2_PATTERN.match(token or ""))
+
+
+def encode_token(kind: str, activity_id: int, expires_at: int, version: Optional[int] = None) -> str:
+    if version is None:
+        version = getattr(settings, "QR_TOKEN_VERSION", 2)
+    if version == 2:
+        header = _V2_HEADER.pack(0x20 | _V2_KIND_CODES[kind], activity_id, int(expires_at))
+        return base64.b32encode(header + _mac(header).digest()[:_V2_MAC_BYTES]).decode()
+    payload = f"{_KIND_PREFIXES[kind]}{activity_id}:{int(expires_at)}"
+    return base64.urlsafe_b64encode(f"{payload}:{_sign(payload)}".encode()).decode()
+
+
+def _decode_v2(token: str, now: Optional[int]) -> TokenResult:
+    try:
+        raw = base64.b32decode(token)
+    except binascii.Error:
+        return TokenResult(False, error="malformed")
+    header, sig = raw[:_V2_HEADER.size], raw[_V2_HEADER.size:]
+    version_kind, activity_id, expires_at = _V2_HEADER.unpack(header)
+    kind = _V2_CODE_KINDS.get(version_kind & 0x0F)
+    if version_kind >> 4 != 2 or kind is None:
+        return TokenResult(False, error="malformed")
+    if not hmac.compare_digest(_mac(header).digest()[:_V2_MAC_BYTES], sig):
+        return TokenResult(False, kind, error="bad_signature")
+    if expires_at < (int(time.time()) if now is None else now):
+        return TokenResult(False, kind, activity_id, expires_at, error="expired")
+    return TokenResult(True, kind, activity_id, expires_at)
+
+
+def decode_token(token: str, now: Optional[int] = None) -> TokenResult:
+    """Decode and verify a v1 or v2 ``token`` in one pass."""
+    token = (token or "").strip()
+    if is_compact(token):
+        return _decode_v2(token, now)
+    try:
+        raw = base64.urlsafe_b64decode(token.encode()).decode()
+        payload, sig = raw.rsplit(":", 1)
+        parts = payload.split(":")
+        if len(parts) == 3:
+            kind = _PREFIX_KINDS.get(parts[0])
+            if kind is None:
+                return TokenResult(False, error="malformed")
+            parts = parts[1:]
+        elif len(parts) == 2:
+            kind = KIND_QR
+        else:
+            return TokenResult(False, error="malformed")
+        activity_id, expires_at = int(parts[0]), int(parts[1])
+    except (ValueError, UnicodeError, AttributeError):
+        return TokenResult(False, error="malformed")
+
+    # bytes, not str: compare_digest raises TypeError on non-ASCII str input
+    if not hmac.compare_digest(_sign(payload).encode(), sig.encode("utf-8", "surrogateescape")):
+        return TokenResult(False, kind, error="bad_signature")
+    if expires_at < (int(time.time()) if now is None else now):
+        return TokenResult(False, kind, activity_id, expires_at, error="expired")
+    return TokenResult(True, kind, activity_id, expires_at)
+
+
+def token_from_qr_data(qr_data: str) -> str:
+    """QR data may be a bare token or a URL carrying it in ?token= or the last path part."""
+    try:
+        parsed_url = urlparse(qr_data)
+    except ValueError:
+        return qr_data
+    query_token = parse_qs(parsed_url.query).get("token")
+    if query_token:
+        return query_token[0]
+    path_parts = parsed_url.path.strip("/").split("/")
+    # tokens are longer than any route segment (v2 is 32 chars, v1 ~120)
+    if path_parts and len(path_parts[-1]) > 20:
+        return path_parts[-1]
+    return qr_data
@@ -1,4 +1,4 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 app_name = "volunteer_app"
@@ -12,12 +12,25 @@ urlpatterns = [
     path("activity/<int:pk>/", views.activity_detail, name="activity_detail"),
     path("activity/create/", views.create_activity, name="create_activity"),
     path("activity/<int:pk>/signup/", views.activity_signup, name="activity_signup"),
+    path("activity/<int:pk>/cancel/", views.activity_cancel_signup, name="activity_cancel_signup"),
+    re_path(
+        r"^activity/(?P<pk>\d+)/kiosk/(?P<kind>confirm|checkin|checkout)/$",
+        views.activity_kiosk,
+        name="activity_kiosk",
+    ),
+    re_path(
+        r"^activity/(?P<pk>\d+)/qr/(?P<kind>confirm|checkin|checkout)\.(?P<fmt>png|svg)$",
+        views.activity_qr_image,
+        name="activity_qr_image",
+    ),
 
     # QR code
     path("qr/scan/", views.qr_scan_page, name="qr_scan"),
     path("qr/verify/", views.qr_verify, name="qr_verify"),
     path("qr/upload/", views.qr_upload, name="qr_upload"),
+    path("qr/upload/status/<str:job_id>/", views.qr_upload_status, name="qr_upload_status"),
     path("qr/confirm/<str:token>/", views.qr_confirm, name="qr_confirm"),
+    path("t/<str:token>/", views.short_token, name="short_token"),
     
     # Check-in / Check-out
     path("check-in/", views.check_in, name="check_in"),
@@ -30,6 +43,7 @@ urlpatterns = [
 
     # Notifications
     path("notifications/", views.notification_list, name="notifications"),
+    path("notifications/api/", views.notification_list_api, name="notifications_api"),
     path("notifications/read-all/", views.notification_mark_all, name="notification_mark_all"),
     path("notifications/<int:pk>/read/", views.notification_mark_read, name="notification_mark_read"),
 
@@ -55,6 +69,7 @@ urlpatterns = [
     # Admin Routes
     path("custom-admin/login/", views.admin_login, name="admin_login"),
     path("custom-admin/dashboard/", views.admin_dashboard, name="admin_dashboard"),
+    path("custom-admin/stats/", views.admin_stats_api, name="admin_stats_api"),
     path("custom-admin/activities/", views.admin_manage_activities, name="admin_manage_activities"),
     path("custom-admin/activity/<int:pk>/edit/", views.admin_edit_activity, name="admin_edit_activity"),
     path("custom-admin/activity/<int:pk>/delete/", views.admin_delete_activity, name="admin_delete_activity"),
@@ -66,6 +81,8 @@ urlpatterns = [
     path("custom-admin/user/<int:pk>/delete/", views.admin_delete_user, name="admin_delete_user"),
     path("custom-admin/user/<int:user_id>/hours/", views.admin_view_user_hours, name="admin_view_user_hours"),
     path("custom-admin/hours/add/", views.admin_add_volunteer_hours, name="admin_add_volunteer_hours"),
+    path("custom-admin/qr-batch/", views.admin_qr_batch_upload, name="admin_qr_batch_upload"),
+    path("custom-admin/kiosk/sync/", views.kiosk_sync_scans, name="kiosk_sync_scans"),
     path("custom-admin/qr-scan/<int:pk>/delete/", views.admin_delete_qr_scan, name="admin_delete_qr_scan"),
     path("custom-admin/logout/", views.admin_logout, name="admin_logout"),
 ]
@@ -1,108 +1,92 @@
-import hmac
-import hashlib
-import base64
+import logging
 import time
 from django.conf import settings
-from PIL import Image
-from pyzbar import pyzbar
-import io
 
+from .services.qr_decode import decode_qr_image
+from .tokens import KIND_CHECKIN, KIND_CHECKOUT, KIND_QR, decode_token, encode_token
 
-def make_qr_token(activity_id: int, expires_in: int = 900) -> str:
+logger = logging.getLogger(__name__)
+
+
+def token_expiry(expires_in: int, aligned: bool = None) -> int:
+    """Return the expiry timestamp for a token meant to live ``expires_in`` seconds.
+
+    In aligned mode (``settings.QR_TOKEN_ALIGNED``, on by default) the expiry
+    snaps to the end of the current ``expires_in``-second window plus
+    ``settings.QR_TOKEN_GRACE``. Every token minted in one window is then
+    byte-identical, so its QR image can be rendered once and shared, and a
+    code shown just before the window rolls still scans during the grace.
+    """
+    now = int(time.time())
+    if aligned is None:
+        aligned = getattr(settings, "QR_TOKEN_ALIGNED", True)
+    if not aligned:
+        return now + int(expires_in)
+    window = max(int(expires_in), 1)
+    return (now // window + 1) * window + int(getattr(settings, "QR_TOKEN_GRACE", 60))
+
+
+def token_refresh_in(expires_in: int, aligned: bool = None) -> int:
+    """Seconds until ``token_expiry`` starts returning a new value.
+
+    Zero when tokens are not aligned, since then every call yields a new token.
+    """
+    if aligned is None:
+        aligned = getattr(settings, "QR_TOKEN_ALIGNED", True)
+    if not aligned:
+        return 0
+    window = max(int(expires_in), 1)
+    return window - int(time.time()) % window
+
+
+def make_qr_token(activity_id: int, expires_in: int = 900, aligned: bool = None) -> str:
     """Create a short signed token for an activity.
 
-    Format (base64 urlsafe): "{activity_id}:{expiry_ts}:{sig_hex}" encoded
+    Format: see ``tokens.encode_token`` (compact v2 unless QR_TOKEN_VERSION=1)
     """
-    ts = int(time.time()) + int(expires_in)
-    payload = f"{activity_id}:{ts}"
-    sig = hmac.new(settings.QR_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
-    token = base64.urlsafe_b64encode(f"{payload}:{sig}".encode()).decode()
-    return token
+    return encode_token(KIND_QR, activity_id, token_expiry(expires_in, aligned))
+
+
+def _verify(token: str, kind: str):
+    result = decode_token(token)
+    if result.ok and result.kind == kind:
+        return True, result.activity_id
+    return False, None
 
 
 def verify_qr_token(token: str):
     """Verify token and return (True, activity_id) or (False, None)."""
-    try:
-        raw = base64.urlsafe_b64decode(token.encode()).decode()
-        parts = raw.split(":")
-        if len(parts) != 3:
-            return False, None
-        activity_id = int(parts[0])
-        ts = int(parts[1])
-        sig = parts[2]
-        if ts < int(time.time()):
-            return False, None
-        payload = f"{activity_id}:{ts}"
-        expected = hmac.new(settings.QR_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
-        return (hmac.compare_digest(expected, sig), activity_id) if hmac.compare_digest(expected, sig) else (False, None)
-    except Exception:
-        return False, None
+    return _verify(token, KIND_QR)
 
 
 # -------------------- CHECK-IN / CHECK-OUT TOKEN FUNCTIONS --------------------
 
-def make_checkin_token(activity_id: int, expires_in: int = 300) -> str:
+def make_checkin_token(activity_id: int, expires_in: int = 300, aligned: bool = None) -> str:
     """Create a signed token for check-in.
     
-    Format (base64 urlsafe): "CHECKIN:{activity_id}:{expiry_ts}:{sig_hex}" encoded
+    Format: see ``tokens.encode_token`` (compact v2 unless QR_TOKEN_VERSION=1)
     expires_in: default 5 minutes (300 seconds)
     """
-    ts = int(time.time()) + int(expires_in)
-    payload = f"CHECKIN:{activity_id}:{ts}"
-    sig = hmac.new(settings.QR_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
-    token = base64.urlsafe_b64encode(f"{payload}:{sig}".encode()).decode()
-    return token
+    return encode_token(KIND_CHECKIN, activity_id, token_expiry(expires_in, aligned))
 
 
-def make_checkout_token(activity_id: int, expires_in: int = 300) -> str:
+def make_checkout_token(activity_id: int, expires_in: int = 300, aligned: bool = None) -> str:
     """Create a signed token for check-out.
     
-    Format (base64 urlsafe): "CHECKOUT:{activity_id}:{expiry_ts}:{sig_hex}" encoded
+    Format: see ``tokens.encode_token`` (compact v2 unless QR_TOKEN_VERSION=1)
     expires_in: default 5 minutes (300 seconds)
     """
-    ts = int(time.time()) + int(expires_in)
-    payload = f"CHECKOUT:{activity_id}:{ts}"
-    sig = hmac.new(settings.QR_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
-    token = base64.urlsafe_b64encode(f"{payload}:{sig}".encode()).decode()
-    return token
+    return encode_token(KIND_CHECKOUT, activity_id, token_expiry(expires_in, aligned))
 
 
 def verify_checkin_token(token: str):
     """Verify check-in token and return (True, activity_id) or (False, None)."""
-    try:
-        raw = base64.urlsafe_b64decode(token.encode()).decode()
-        parts = raw.split(":")
-        if len(parts) != 4 or parts[0] != "CHECKIN":
-            return False, None
-        activity_id = int(parts[1])
-        ts = int(parts[2])
-        sig = parts[3]
-        if ts < int(time.time()):
-            return False, None
-        payload = f"CHECKIN:{activity_id}:{ts}"
-        expected = hmac.new(settings.QR_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
-        return (hmac.compare_digest(expected, sig), activity_id) if hmac.compare_digest(expected, sig) else (False, None)
-    except Exception:
-        return False, None
+    return _verify(token, KIND_CHECKIN)
 
 
 def verify_checkout_token(token: str):
     """Verify check-out token and return (True, activity_id) or (False, None)."""
-    try:
-        raw = base64.urlsafe_b64decode(token.encode()).decode()
-        parts = raw.split(":")
-        if len(parts) != 4 or parts[0] != "CHECKOUT":
-            return False, None
-        activity_id = int(parts[1])
-        ts = int(parts[2])
-        sig = parts[3]
-        if ts < int(time.time()):
-            return False, None
-        payload = f"CHECKOUT:{activity_id}:{ts}"
-        expected = hmac.new(settings.QR_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
-        return (hmac.compare_digest(expected, sig), activity_id) if hmac.compare_digest(expected, sig) else (False, None)
-    except Exception:
-        return False, None
+    return _verify(token, KIND_CHECKOUT)
 
 
 # -------------------- QR CODE IMAGE READING --------------------
@@ -115,6 +99,9 @@ def read_qr_code_from_image(image_file):
         
     Returns:
         tuple: (success: bool, qr_data: str or None, error_message: str or None)
+
+    See ``services.qr_decode.decode_qr_image`` for the decode passes and
+    per-stage timings; they are logged at DEBUG level here.
     """
     try:
         # Read image file
@@ -122,24 +109,9 @@ def read_qr_code_from_image(image_file):
             image_data = image_file.read()
         else:
             image_data = image_file
-        
-        # Open image with PIL
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Convert to RGB if necessary (pyzbar requires RGB)
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Decode QR code using pyzbar
-        qr_codes = pyzbar.decode(image)
-        
-        if not qr_codes:
-            return False, None, "ไม่พบ QR code ในรูปภาพ กรุณาตรวจสอบว่า QR code ชัดเจนและอยู่ในรูปภาพ"
-        
-        # Get the first QR code data
-        qr_data = qr_codes[0].data.decode('utf-8')
-        
-        return True, qr_data, None
-        
     except Exception as e:
-        return False, None, f"เกิดข้อผิดพลาดในการอ่าน QR code: {str(e)}"
\ No newline at end of file
+        return False, None, f"เกิดข้อผิดพลาดในการอ่าน QR code: {str(e)}"
+
+    result = decode_qr_image(image_data)
+    logger.debug("QR decode %s via %s timings=%s", "ok" if result.ok else "failed", result.stage, result.timings)
+    return result.ok, result.data, result.error
@@ -1,24 +1,36 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth import authenticate, login, logout, get_user_model
+from django.conf import settings
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db.models import Q, Sum, Count, Exists, OuterRef
-from django.http import JsonResponse, HttpResponseBadRequest, HttpResponse
+from django.db.models import Q, Sum, Count, Exists, OuterRef, Subquery
+from django.http import JsonResponse, HttpResponseBadRequest, HttpResponse, HttpResponseForbidden, HttpResponseNotModified
 from django.views.decorators.http import require_POST
 from django.utils import timezone
-from django.utils.http import url_has_allowed_host_and_scheme
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag, url_has_allowed_host_and_scheme
 from django.urls import reverse
 
 from .forms import RegistrationForm, ActivityForm, SignupForm, IdeaForm, GroupForm, AdminLoginForm
 from .models import (
     Activity, ActivitySignup, QRScan, IdeaProposal, IdeaVote,
-    Group, GroupMembership, GroupPost, Role, Notification, CheckInOut
+    Group, GroupMembership, GroupPost, Role, Notification
 )
-from .utils import verify_qr_token, verify_checkin_token, verify_checkout_token, read_qr_code_from_image
-from .services.notification_service import notify_user, mark_notifications_read
-
-import qrcode
-from io import BytesIO
-import base64
+from .utils import (
+    verify_qr_token, verify_checkin_token, verify_checkout_token, read_qr_code_from_image, token_refresh_in,
+    make_qr_token, make_checkin_token, make_checkout_token,
+)
+from .ratelimit import rate_limit, rejection_counts
+from .tokens import KIND_CHECKIN, KIND_CHECKOUT, KIND_QR, decode_token, is_compact, token_from_qr_data
+from .services.notification_service import mark_notifications_read, notification_page, notify_user, notify_users
+from .services.leaderboard_service import top_volunteers
+from .services.dashboard_service import DashboardSnapshot
+from .services import attendance_service, batch_ingest, decode_jobs, kiosk_sync, qr_service, reporting_service, unread_counter
+from .services.signup_service import cancel_signup, claim_seat, promote_waitlist
+
+import hashlib
+import json
+import zipfile
 
 User = get_user_model()
 
@@ -281,41 +293,48 @@ def activities(request):
     })
 
 
+def _can_manage_qr(user, activity):
+    return is_admin(user) or (user.is_authenticated and activity.created_by_id == user.pk)
+
+
+# kind -> (token method on Activity, path the QR points to, token lifetime)
+QR_IMAGE_KINDS = {
+    "confirm": ("qr_token", "/qr/confirm/{token}/", Activity.QR_TOKEN_TTL),
+    "checkin": ("checkin_token", "/check-in/?token={token}", Activity.CHECK_TOKEN_TTL),
+    "checkout": ("checkout_token", "/check-out/?token={token}", Activity.CHECK_TOKEN_TTL),
+}
+
+
+def _qr_target(kind, token):
+    """Path a QR code points to; compact v2 tokens all use the short /t/ path."""
+    if is_compact(token):
+        return reverse("volunteer_app:short_token", args=[token])
+    return QR_IMAGE_KINDS[kind][1].format(token=token)
+
+
 def activity_detail(request, pk):
-    activity = get_object_or_404(Activity, pk=pk)
-    user_signed = request.user.is_authenticated and ActivitySignup.objects.filter(activity=activity, user=request.user).exists()
+    activities = Activity.objects.all()
+    if request.user.is_authenticated:
+        activities = activities.annotate(
+            user_signup_status=Subquery(
+                ActivitySignup.objects.filter(activity=OuterRef("pk"), user=request.user).values("status")[:1]
+            )
+        )
+    activity = get_object_or_404(activities, pk=pk)
+    user_signup_status = getattr(activity, "user_signup_status", None)
+    user_signed = user_signup_status is not None
     can_signup = not activity.is_full()
-    qr_token = activity.qr_token()
-    
-    # Generate QR codes for check-in and check-out
-    checkin_token = activity.checkin_token()
-    checkout_token = activity.checkout_token()
-
-    buffer = BytesIO()
-    # generate QR for a confirm URL that includes signed token
-    if qr_token:
-        q = qrcode.make(request.build_absolute_uri(f"/qr/confirm/{qr_token}/"))
-        q.save(buffer, format="PNG")
-        qr_image_data = buffer.getvalue()
-        qr_b64 = base64.b64encode(qr_image_data).decode()
-    else:
-        qr_b64 = None
-    
-    # Generate QR codes for check-in and check-out
-    checkin_qr_b64 = None
-    checkout_qr_b64 = None
-    
-    if checkin_token:
-        buffer_checkin = BytesIO()
-        q_checkin = qrcode.make(request.build_absolute_uri(f"/check-in/?token={checkin_token}"))
-        q_checkin.save(buffer_checkin, format="PNG")
-        checkin_qr_b64 = base64.b64encode(buffer_checkin.getvalue()).decode()
-    
-    if checkout_token:
-        buffer_checkout = BytesIO()
-        q_checkout = qrcode.make(request.build_absolute_uri(f"/check-out/?token={checkout_token}"))
-        q_checkout.save(buffer_checkout, format="PNG")
-        checkout_qr_b64 = base64.b64encode(buffer_checkout.getvalue()).decode()
+
+    # QR codes are only for whoever runs the activity; students scan them.
+    # The images themselves come from activity_qr_image so this page stays small.
+    context = {}
+    if _can_manage_qr(request.user, activity):
+        qr_token = activity.qr_token()
+        context = {
+            "can_manage_qr": True,
+            "qr_token": qr_token,
+            "qr_url": request.build_absolute_uri(_qr_target("confirm", qr_token)),
+        }
 
     return render(
         request,
@@ -323,13 +342,9 @@ def activity_detail(request, pk):
         {
             "activity": activity,
             "user_signed": user_signed,
+            "user_signup_status": user_signup_status,
             "can_signup": can_signup,
-            "qr_token": qr_token,
-            "qr_b64": qr_b64,
-            "checkin_token": checkin_token,
-            "checkout_token": checkout_token,
-            "checkin_qr_b64": checkin_qr_b64,
-            "checkout_qr_b64": checkout_qr_b64,
+            **context,
         }
     )
 
@@ -353,35 +368,116 @@ def create_activity(request):
     return render(request, "create_activity.html", {"form": form})
 
 
+@login_required
+def activity_qr_image(request, pk, kind, fmt):
+    """รูป QR ของกิจกรรม (png/svg) พร้อม ETag และ Cache-Control ตามช่วงอายุ token"""
+    activity = get_object_or_404(Activity, pk=pk)
+    if not _can_manage_qr(request.user, activity):
+        return HttpResponseForbidden("ไม่มีสิทธิ์ดู QR ของกิจกรรมนี้")
+
+    token_method, _, ttl = QR_IMAGE_KINDS[kind]
+    data = request.build_absolute_uri(_qr_target(kind, getattr(activity, token_method)()))
+    refresh_in = token_refresh_in(ttl)
+    # the ETag depends only on what is encoded, so a 304 needs no rendering
+    etag = quote_etag(hashlib.sha1(f"{fmt}:{data}".encode()).hexdigest())
+
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        image = qr_service.render_qr(data, fmt=fmt, timeout=refresh_in or None)
+        response = HttpResponse(image, content_type=qr_service.QR_FORMATS[fmt])
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, max_age=refresh_in)
+    return response
+
+
 @login_required
 def activity_signup(request, pk):
     activity = get_object_or_404(Activity, pk=pk)
-    if ActivitySignup.objects.filter(activity=activity, user=request.user).exists():
-        return HttpResponseBadRequest("คุณสมัครแล้ว")
     if request.method == "POST":
         form = SignupForm(request.POST)
         if form.is_valid():
-            signup = form.save(commit=False)
-            signup.activity = activity
-            signup.user = request.user
-            # determine status: confirm if space, else waitlist
-            if activity.is_full():
-                signup.status = "waitlist"
-            else:
-                signup.status = "confirmed"
-            signup.save()
+            # claim a seat atomically: confirmed if space, else waitlist
+            result = claim_seat(activity.pk, request.user, note=form.cleaned_data.get("note", ""))
+            if result.outcome == "duplicate":
+                return HttpResponseBadRequest("คุณสมัครแล้ว")
             return redirect("volunteer_app:activity_detail", pk=activity.pk)
     else:
+        if ActivitySignup.objects.filter(activity=activity, user=request.user).exists():
+            return HttpResponseBadRequest("คุณสมัครแล้ว")
         form = SignupForm()
     return render(request, "activity_detail.html", {"activity": activity, "form": form})
 
 
+@login_required
+@require_POST
+def activity_cancel_signup(request, pk):
+    signup = get_object_or_404(ActivitySignup.objects.select_related("activity"), activity_id=pk, user=request.user)
+    if signup.status not in ("requested", "confirmed", "waitlist"):
+        return HttpResponseBadRequest("ไม่สามารถยกเลิกการสมัครนี้ได้")
+    # the freed seat goes to the oldest waitlisted student
+    cancel_signup(signup)
+    return redirect("volunteer_app:activity_detail", pk=pk)
+
+
 @login_required
 def qr_scan_page(request):
     return render(request, "qr_scan.html", {})
 
 
+KIOSK_TOKEN_MAKERS = {"confirm": make_qr_token, "checkin": make_checkin_token, "checkout": make_checkout_token}
+
+
+@login_required
+def activity_kiosk(request, pk, kind):
+    """หน้าสแกนบัตรนักศึกษาของเจ้าหน้าที่ เก็บรายการไว้ในเครื่องเมื่อออฟไลน์แล้วส่งรวดเดียวภายหลัง"""
+    activity = get_object_or_404(Activity, pk=pk)
+    if not _can_manage_qr(request.user, activity):
+        return HttpResponseForbidden("ไม่มีสิทธิ์เปิดโหมด kiosk ของกิจกรรมนี้")
+    # one long-lived token for the whole session; scans are checked against the time they were taken
+    ttl = getattr(settings, "KIOSK_TOKEN_TTL", 12 * 3600)
+    return render(request, "qr_scan.html", {
+        "kiosk": {
+            "activity": activity,
+            "kind": kind,
+            "token": KIOSK_TOKEN_MAKERS[kind](activity.pk, expires_in=ttl, aligned=False),
+        },
+    })
+
+
 @login_required
+@require_POST
+def kiosk_sync_scans(request):
+    """รับรายการสแกนที่ค้างอยู่ในเครื่อง kiosk ทีละหลายร้อยรายการ ส่งซ้ำได้โดยไม่บันทึกซ้ำ"""
+    try:
+        payload = json.loads(request.body or b"{}")
+        scans = payload.get("scans")
+    except (ValueError, AttributeError):
+        scans = None
+    if not isinstance(scans, list) or not all(isinstance(entry, dict) for entry in scans):
+        return JsonResponse({"ok": False, "code": "bad_payload", "message": "ข้อมูลที่ส่งมาไม่ถูกต้อง"}, status=400)
+    if len(scans) > kiosk_sync.MAX_BATCH:
+        return JsonResponse({
+            "ok": False,
+            "code": "batch_too_large",
+            "message": f"ส่งได้ครั้งละไม่เกิน {kiosk_sync.MAX_BATCH} รายการ",
+        }, status=400)
+    # same rule as the kiosk page: staff, or the activity's creator
+    results = kiosk_sync.sync_kiosk_scans(
+        scans,
+        device_id=str(payload.get("device_id") or ""),
+        can_manage=lambda activity: _can_manage_qr(request.user, activity),
+    )
+    return JsonResponse({
+        "ok": True,
+        "recorded": sum(1 for r in results if r["code"] == "recorded"),
+        "failed": sum(1 for r in results if not r["ok"]),
+        "results": results,
+    })
+
+
+@login_required
+@rate_limit("scan")
 def qr_verify(request):
     if request.method != "POST":
         return HttpResponseBadRequest("POST required")
@@ -398,84 +494,11 @@ def qr_verify(request):
             "help": "กรุณาลองสแกน QR code ใหม่หรือติดต่อผู้ดูแลกิจกรรม"
         })
 
-    try:
-        activity = Activity.objects.get(pk=activity_id)
-    except Activity.DoesNotExist:
-        return JsonResponse({
-            "ok": False,
-            "code": "activity_not_found",
-            "message": "ไม่พบกิจกรรมนี้ในระบบ",
-            "help": "กรุณาติดต่อผู้ดูแลระบบ"
-        })
-
-    # Check if activity is cancelled
-    if activity.status == "cancelled":
-        return JsonResponse({
-            "ok": False,
-            "code": "activity_cancelled",
-            "message": "กิจกรรมนี้ถูกยกเลิกแล้ว",
-            "help": "ไม่สามารถยืนยันชั่วโมงสำหรับกิจกรรมที่ถูกยกเลิกได้"
-        })
-
-    # require signup existence (any status) to allow scan
-    if not ActivitySignup.objects.filter(activity=activity, user=request.user).exists():
-        return JsonResponse({
-            "ok": False,
-            "code": "not_signed_up",
-            "message": "คุณยังไม่ได้สมัครกิจกรรมนี้",
-            "help": "กรุณาสมัครกิจกรรมก่อนจึงจะสามารถยืนยันได้",
-            "activity": get_activity_details(activity)
-        })
-
-    # atomic create (idempotent)
-    from django.db import transaction, IntegrityError
-    earned_hours = float(activity.hours_reward)
-
-    try:
-        with transaction.atomic():
-            scan, created = QRScan.objects.get_or_create(activity=activity, user=request.user, defaults={
-                'token': token,
-                'ip_address': request.META.get('REMOTE_ADDR'),
-                'user_agent': request.META.get('HTTP_USER_AGENT', '')[:512],
-                'device_id': request.POST.get('device_id') or request.headers.get('X-Device-Id'),
-            })
-            if not created:
-                return JsonResponse({
-                    "ok": False,
-                    "code": "already_attended",
-                    "message": "คุณยืนยันชั่วโมงกิจกรรมนี้แล้ว ได้ {:.1f} ชั่วโมง".format(activity.hours_reward),
-                    "help": "หากเกิดข้อผิดพลาด กรุณาติดต่อผู้ดูแล",
-                    "activity": get_activity_details(activity)
-                })
-
-            # mark signup as attended
-            ActivitySignup.objects.filter(activity=activity, user=request.user).update(status='attended')
-    except IntegrityError:
-        return JsonResponse({
-            "ok": False,
-            "code": "database_error",
-            "message": "เกิดข้อผิดพลาดในการบันทึก ลองอีกครั้ง",
-            "help": "หากปัญหายังคงเกิดขึ้น โปรดติดต่อผู้ดูแลระบบ"
-        }, status=500)
-
-    notify_user(
-        request.user,
-        title="ยืนยันชั่วโมงกิจกรรมสำเร็จ",
-        message=f"คุณได้รับ {earned_hours:.1f} ชั่วโมงจากกิจกรรม “{activity.title}”",
-        category="hours",
-        target_url=request.build_absolute_uri(reverse("volunteer_app:profile")),
-    )
-
-    return JsonResponse({
-        "ok": True,
-        "code": "success",
-        "message": "ยืนยันสำเร็จ!",
-        "hours_reward": earned_hours,
-        "activity": get_activity_details(activity)
-    })
+    return _record_scan(request, KIND_QR, activity_id, token)
 
 
 @login_required
+@rate_limit("upload")
 def qr_upload(request):
     """Upload QR code image and verify it to get volunteer hours."""
     if request.method != "POST":
@@ -512,241 +535,187 @@ def qr_upload(request):
             "message": "ไฟล์ใหญ่เกินไป กรุณาเลือกรูปภาพที่มีขนาดไม่เกิน 10MB"
         })
     
+    # Async mode: decode on the pool, the client polls qr_upload_status
+    if request.POST.get("async") == "1" or getattr(settings, "QR_UPLOAD_ASYNC", False):
+        try:
+            job_id = decode_jobs.submit_decode(image_file.read(), request.user.pk)
+        except decode_jobs.QueueFull:
+            response = JsonResponse({
+                "ok": False,
+                "code": "busy",
+                "message": "มีผู้อัปโหลดจำนวนมาก กรุณาลองใหม่อีกครั้งในอีกสักครู่"
+            }, status=429)
+            response["Retry-After"] = str(getattr(settings, "QR_DECODE_RETRY_AFTER", 5))
+            return response
+        return JsonResponse({
+            "ok": True,
+            "code": "queued",
+            "job_id": job_id,
+            "status_url": reverse("volunteer_app:qr_upload_status", args=[job_id]),
+            # the page stops polling after this many seconds; the job is gone from the cache by then
+            "poll_timeout": getattr(settings, "QR_DECODE_JOB_TTL", 600),
+        }, status=202)
+
     # Read QR code from image
     success, qr_data, error_message = read_qr_code_from_image(image_file)
-    
+    return _handle_uploaded_qr(request, success, qr_data, error_message)
+
+
+@login_required
+def qr_upload_status(request, job_id):
+    """สถานะงานอ่าน QR แบบ async; เมื่ออ่านเสร็จจะยืนยัน token ในคำขอนี้ครั้งเดียว"""
+    job = decode_jobs.get_job(job_id)
+    if not job or job["user_id"] != request.user.pk:
+        return JsonResponse({
+            "ok": False,
+            "code": "job_not_found",
+            "message": "ไม่พบงานอ่าน QR code นี้หรือหมดอายุแล้ว"
+        }, status=404)
+    if job["status"] == decode_jobs.DONE:
+        return JsonResponse(job["response"])
+    if job["status"] == decode_jobs.PENDING or not decode_jobs.claim_job(job_id):
+        return JsonResponse({"ok": False, "code": "pending", "message": "กำลังอ่าน QR code..."}, status=202)
+
+    response = _handle_uploaded_qr(request, job["ok"], job["data"], job["error"])
+    decode_jobs.finish_job(job_id, request.user.pk, json.loads(response.content))
+    return response
+
+
+def _handle_uploaded_qr(request, success, qr_data, error_message):
     if not success:
         return JsonResponse({
             "ok": False,
             "code": "qr_read_failed",
             "message": error_message or "ไม่สามารถอ่าน QR code จากรูปภาพได้"
         })
-    
-    # Extract token from QR data (could be URL or token)
-    token = qr_data
-    try:
-        # If QR data is a URL, extract token from it
-        from urllib.parse import urlparse
-        parsed_url = urlparse(qr_data)
-        if parsed_url.path:
-            # Try to extract token from URL path
-            path_parts = parsed_url.path.strip('/').split('/')
-            if path_parts:
-                # Check if last part looks like a token (base64-like)
-                potential_token = path_parts[-1]
-                if len(potential_token) > 20:  # Tokens are usually longer
-                    token = potential_token
-    except Exception:
-        pass
-    
-    # Verify token using existing qr_verify logic
-    valid, activity_id = verify_qr_token(token)
-    if not valid:
-        # Try check-in token
-        valid, activity_id = verify_checkin_token(token)
-        if not valid:
-            # Try check-out token
-            valid, activity_id = verify_checkout_token(token)
-            if not valid:
-                return JsonResponse({
-                    "ok": False,
-                    "code": "invalid_token",
-                    "message": "QR code ไม่ถูกต้องหรือหมดอายุแล้ว",
-                    "help": "กรุณาลองอัปโหลด QR code ใหม่หรือติดต่อผู้ดูแลกิจกรรม"
-                })
-    
-    try:
-        activity = Activity.objects.get(pk=activity_id)
-    except Activity.DoesNotExist:
-        return JsonResponse({
-            "ok": False,
-            "code": "activity_not_found",
-            "message": "ไม่พบกิจกรรมนี้ในระบบ",
-            "help": "กรุณาติดต่อผู้ดูแลระบบ"
-        })
-    
-    # Check if activity is cancelled
-    if activity.status == "cancelled":
-        return JsonResponse({
-            "ok": False,
-            "code": "activity_cancelled",
-            "message": "กิจกรรมนี้ถูกยกเลิกแล้ว",
-            "help": "ไม่สามารถยืนยันชั่วโมงสำหรับกิจกรรมที่ถูกยกเลิกได้"
-        })
-    
-    # Require signup existence
-    if not ActivitySignup.objects.filter(activity=activity, user=request.user).exists():
+
+    token = token_from_qr_data(qr_data)
+
+    # Decode once; the token type decides between check-in, check-out and QR scan
+    result = decode_token(token)
+    if not result.ok:
         return JsonResponse({
             "ok": False,
-            "code": "not_signed_up",
-            "message": "คุณยังไม่ได้สมัครกิจกรรมนี้",
-            "help": "กรุณาสมัครกิจกรรมก่อนจึงจะสามารถยืนยันได้",
-            "activity": get_activity_details(activity)
+            "code": "invalid_token",
+            "message": "QR code ไม่ถูกต้องหรือหมดอายุแล้ว",
+            "help": "กรุณาลองอัปโหลด QR code ใหม่หรือติดต่อผู้ดูแลกิจกรรม"
         })
-    
-    # Determine if this is a check-in, check-out, or regular QR scan
-    from django.db import transaction, IntegrityError
-    earned_hours = float(activity.hours_reward)
-    
-    try:
-        with transaction.atomic():
-            # Check token type
-            checkin_valid, _ = verify_checkin_token(token)
-            checkout_valid, _ = verify_checkout_token(token)
-            
-            if checkin_valid:
-                # Handle check-in
-                checkin, created = CheckInOut.objects.get_or_create(
-                    activity=activity,
-                    user=request.user,
-                    check_type="checkin",
-                    defaults={
-                        'token': token,
-                        'ip_address': request.META.get('REMOTE_ADDR'),
-                        'user_agent': request.META.get('HTTP_USER_AGENT', '')[:512],
-                    }
-                )
-                if not created:
-                    return JsonResponse({
-                        "ok": False,
-                        "code": "already_checked_in",
-                        "message": f"คุณได้ check-in กิจกรรมนี้แล้วเมื่อ {checkin.checked_at.strftime('%d/%m/%Y %H:%M')}",
-                        "help": "หากต้องการ check-out กรุณาใช้ QR code สำหรับ check-out",
-                        "activity": get_activity_details(activity),
-                        "checked_in_at": checkin.checked_at.isoformat()
-                    })
-                
-                notify_user(
-                    request.user,
-                    title="Check-in สำเร็จ",
-                    message=f"คุณได้ check-in เข้ากิจกรรม \"{activity.title}\" แล้ว",
-                    category="activity",
-                    target_url=request.build_absolute_uri(reverse("volunteer_app:activity_detail", args=[activity.pk])),
-                )
-                
-                return JsonResponse({
-                    "ok": True,
-                    "code": "checkin_success",
-                    "message": "Check-in สำเร็จ!",
-                    "activity": get_activity_details(activity),
-                    "checked_in_at": checkin.checked_at.isoformat()
-                })
-            
-            elif checkout_valid:
-                # Handle check-out
-                checkin_record = CheckInOut.objects.filter(
-                    activity=activity,
-                    user=request.user,
-                    check_type="checkin"
-                ).first()
-                
-                if not checkin_record:
-                    return JsonResponse({
-                        "ok": False,
-                        "code": "not_checked_in",
-                        "message": "คุณยังไม่ได้ check-in กิจกรรมนี้",
-                        "help": "กรุณา check-in ก่อนจึงจะสามารถ check-out ได้",
-                        "activity": get_activity_details(activity)
-                    })
-                
-                checkout, created = CheckInOut.objects.get_or_create(
-                    activity=activity,
-                    user=request.user,
-                    check_type="checkout",
-                    defaults={
-                        'token': token,
-                        'ip_address': request.META.get('REMOTE_ADDR'),
-                        'user_agent': request.META.get('HTTP_USER_AGENT', '')[:512],
-                    }
-                )
-                
-                if not created:
-                    calculated_hours = float(checkout.calculated_hours) if checkout.calculated_hours else float(activity.hours_reward)
-                    return JsonResponse({
-                        "ok": False,
-                        "code": "already_checked_out",
-                        "message": f"คุณได้ check-out กิจกรรมนี้แล้วเมื่อ {checkout.checked_at.strftime('%d/%m/%Y %H:%M')}",
-                        "help": "คุณได้รับชั่วโมงจิตอาสาแล้ว",
-                        "activity": get_activity_details(activity),
-                        "checked_out_at": checkout.checked_at.isoformat(),
-                        "calculated_hours": calculated_hours
-                    })
-                
-                # Calculate hours from actual time difference
-                from datetime import timedelta
-                time_diff = checkout.checked_at - checkin_record.checked_at
-                hours_worked = time_diff.total_seconds() / 3600.0
-                
-                if hours_worked >= 0.1:
-                    calculated_hours = round(hours_worked, 2)
-                else:
-                    calculated_hours = float(activity.hours_reward)
-                
-                checkout.calculated_hours = calculated_hours
-                checkout.save(update_fields=['calculated_hours'])
-                
-                ActivitySignup.objects.filter(activity=activity, user=request.user).update(status='attended')
-                
-                notify_user(
-                    request.user,
-                    title="Check-out สำเร็จ",
-                    message=f"คุณได้ check-out จากกิจกรรม \"{activity.title}\" แล้ว ได้รับ {calculated_hours:.2f} ชั่วโมงจิตอาสา",
-                    category="hours",
-                    target_url=request.build_absolute_uri(reverse("volunteer_app:profile")),
-                )
-                
-                return JsonResponse({
-                    "ok": True,
-                    "code": "checkout_success",
-                    "message": f"Check-out สำเร็จ! คุณได้รับ {calculated_hours:.2f} ชั่วโมงจิตอาสา",
-                    "activity": get_activity_details(activity),
-                    "checked_in_at": checkin_record.checked_at.isoformat(),
-                    "checked_out_at": checkout.checked_at.isoformat(),
-                    "calculated_hours": calculated_hours,
-                    "time_worked_minutes": int(time_diff.total_seconds() / 60)
-                })
-            
-            else:
-                # Regular QR scan (legacy)
-                scan, created = QRScan.objects.get_or_create(activity=activity, user=request.user, defaults={
-                    'token': token,
-                    'ip_address': request.META.get('REMOTE_ADDR'),
-                    'user_agent': request.META.get('HTTP_USER_AGENT', '')[:512],
-                })
-                if not created:
-                    return JsonResponse({
-                        "ok": False,
-                        "code": "already_attended",
-                        "message": "คุณยืนยันชั่วโมงกิจกรรมนี้แล้ว ได้ {:.1f} ชั่วโมง".format(activity.hours_reward),
-                        "help": "หากเกิดข้อผิดพลาด กรุณาติดต่อผู้ดูแล",
-                        "activity": get_activity_details(activity)
-                    })
-                
-                ActivitySignup.objects.filter(activity=activity, user=request.user).update(status='attended')
-                
-                notify_user(
-                    request.user,
-                    title="ยืนยันชั่วโมงกิจกรรมสำเร็จ",
-                    message=f"คุณได้รับ {earned_hours:.1f} ชั่วโมงจากกิจกรรม \"{activity.title}\"",
-                    category="hours",
-                    target_url=request.build_absolute_uri(reverse("volunteer_app:profile")),
-                )
-                
-                return JsonResponse({
-                    "ok": True,
-                    "code": "success",
-                    "message": "ยืนยันสำเร็จ!",
-                    "hours_reward": earned_hours,
-                    "activity": get_activity_details(activity)
-                })
-                
-    except IntegrityError:
-        return JsonResponse({
-            "ok": False,
-            "code": "database_error",
-            "message": "เกิดข้อผิดพลาดในการบันทึก ลองอีกครั้ง",
-            "help": "หากปัญหายังคงเกิดขึ้น โปรดติดต่อผู้ดูแลระบบ"
-        }, status=500)
+    return _record_scan(request, result.kind, result.activity_id, token)
+
+
+# kind -> help text when the activity is cancelled / the student has no signup
+ATTENDANCE_CANCELLED_HELP = {
+    KIND_QR: "ไม่สามารถยืนยันชั่วโมงสำหรับกิจกรรมที่ถูกยกเลิกได้",
+    KIND_CHECKIN: "ไม่สามารถ check-in สำหรับกิจกรรมที่ถูกยกเลิกได้",
+    KIND_CHECKOUT: "ไม่สามารถ check-out สำหรับกิจกรรมที่ถูกยกเลิกได้",
+}
+ATTENDANCE_SIGNUP_HELP = {
+    KIND_QR: "กรุณาสมัครกิจกรรมก่อนจึงจะสามารถยืนยันได้",
+    KIND_CHECKIN: "กรุณาสมัครกิจกรรมก่อนจึงจะสามารถ check-in ได้",
+    KIND_CHECKOUT: "กรุณาสมัครกิจกรรมก่อนจึงจะสามารถ check-out ได้",
+}
+
+
+def _attendance_payload(kind, result):
+    """JSON body for an ``AttendanceResult``; shared by every scan endpoint."""
+    activity = result.activity
+    payload = {"ok": result.ok, "code": result.code}
+    code = result.code
+    if code == "activity_not_found":
+        payload.update(message="ไม่พบกิจกรรมนี้ในระบบ", help="กรุณาติดต่อผู้ดูแลระบบ")
+        return payload
+    if code == "activity_cancelled":
+        payload.update(message="กิจกรรมนี้ถูกยกเลิกแล้ว", help=ATTENDANCE_CANCELLED_HELP[kind])
+        return payload
+    if code == "database_error":
+        payload.update(message="เกิดข้อผิดพลาดในการบันทึก ลองอีกครั้ง", help="หากปัญหายังคงเกิดขึ้น โปรดติดต่อผู้ดูแลระบบ")
+        return payload
+
+    if code == "not_signed_up":
+        payload.update(message="คุณยังไม่ได้สมัครกิจกรรมนี้", help=ATTENDANCE_SIGNUP_HELP[kind])
+    elif code == "not_checked_in":
+        payload.update(message="คุณยังไม่ได้ check-in กิจกรรมนี้", help="กรุณา check-in ก่อนจึงจะสามารถ check-out ได้")
+    elif code == "already_attended":
+        payload.update(
+            message="คุณยืนยันชั่วโมงกิจกรรมนี้แล้ว ได้ {:.1f} ชั่วโมง".format(activity.hours_reward),
+            help="หากเกิดข้อผิดพลาด กรุณาติดต่อผู้ดูแล",
+        )
+    elif code == "already_checked_in":
+        payload.update(
+            message=f"คุณได้ check-in กิจกรรมนี้แล้วเมื่อ {result.checked_in_at.strftime('%d/%m/%Y %H:%M')}",
+            help="หากต้องการ check-out กรุณาใช้ QR code สำหรับ check-out",
+            checked_in_at=result.checked_in_at.isoformat(),
+        )
+    elif code == "already_checked_out":
+        payload.update(
+            message=f"คุณได้ check-out กิจกรรมนี้แล้วเมื่อ {result.checked_out_at.strftime('%d/%m/%Y %H:%M')}",
+            help="คุณได้รับชั่วโมงจิตอาสาแล้ว",
+            checked_out_at=result.checked_out_at.isoformat(),
+            calculated_hours=result.calculated_hours,
+        )
+    elif code == "success":
+        payload.update(message="ยืนยันสำเร็จ!", hours_reward=float(activity.hours_reward))
+    elif code == "checkin_success":
+        payload.update(message="Check-in สำเร็จ!", checked_in_at=result.checked_in_at.isoformat())
+    elif code == "checkout_success":
+        payload.update(
+            message=f"Check-out สำเร็จ! คุณได้รับ {result.calculated_hours:.2f} ชั่วโมงจิตอาสา",
+            checked_in_at=result.checked_in_at.isoformat(),
+            checked_out_at=result.checked_out_at.isoformat(),
+            calculated_hours=result.calculated_hours,
+            time_worked_minutes=int((result.checked_out_at - result.checked_in_at).total_seconds() / 60),
+        )
+    payload["activity"] = get_activity_details(activity)
+    return payload
+
+
+def _notify_attendance(request, kind, result):
+    activity = result.activity
+    if kind == KIND_CHECKIN:
+        notify_user(
+            request.user,
+            title="Check-in สำเร็จ",
+            message=f"คุณได้ check-in เข้ากิจกรรม \"{activity.title}\" แล้ว",
+            category="activity",
+            target_url=request.build_absolute_uri(reverse("volunteer_app:activity_detail", args=[activity.pk])),
+        )
+    elif kind == KIND_CHECKOUT:
+        notify_user(
+            request.user,
+            title="Check-out สำเร็จ",
+            message=f"คุณได้ check-out จากกิจกรรม \"{activity.title}\" แล้ว ได้รับ {result.calculated_hours:.2f} ชั่วโมงจิตอาสา",
+            category="hours",
+            target_url=request.build_absolute_uri(reverse("volunteer_app:profile")),
+        )
+    else:
+        notify_user(
+            request.user,
+            title="ยืนยันชั่วโมงกิจกรรมสำเร็จ",
+            message=f"คุณได้รับ {float(activity.hours_reward):.1f} ชั่วโมงจากกิจกรรม “{activity.title}”",
+            category="hours",
+            target_url=request.build_absolute_uri(reverse("volunteer_app:profile")),
+        )
+
+
+def _record_attendance(request, kind, activity_id, token):
+    result = attendance_service.record_attendance(
+        request.user,
+        kind,
+        activity_id,
+        token,
+        ip_address=request.META.get("REMOTE_ADDR"),
+        user_agent=request.META.get("HTTP_USER_AGENT", ""),
+        device_id=request.POST.get("device_id") or request.headers.get("X-Device-Id"),
+    )
+    if result.ok:
+        _notify_attendance(request, kind, result)
+    return result
+
+
+def _record_scan(request, kind, activity_id, token):
+    """Record a verified token through the attendance service and reply with JSON."""
+    result = _record_attendance(request, kind, activity_id, token)
+    return JsonResponse(_attendance_payload(kind, result), status=500 if result.code == "database_error" else 200)
 
 
 def qr_confirm(request, token):
@@ -762,85 +731,42 @@ def qr_confirm(request, token):
             "help": "กรุณาลองสแกน QR code ใหม่หรือติดต่อผู้ดูแลกิจกรรม"
         })
     
-    try:
-        activity = Activity.objects.get(pk=activity_id)
-    except Activity.DoesNotExist:
-        return render(request, "qr_confirm_result.html", {
-            "success": False,
-            "message": "ไม่พบกิจกรรมนี้ในระบบ",
-            "help": "กรุณาติดต่อผู้ดูแลระบบ"
-        })
-
-    # Check if activity is cancelled
-    if activity.status == "cancelled":
-        return render(request, "qr_confirm_result.html", {
-            "success": False,
-            "message": "กิจกรรมนี้ถูกยกเลิกแล้ว",
-            "help": "ไม่สามารถยืนยันชั่วโมงสำหรับกิจกรรมที่ถูกยกเลิกได้"
-        })
-
-    if not ActivitySignup.objects.filter(activity=activity, user=request.user).exists():
+    result = _record_attendance(request, KIND_QR, activity_id, token)
+    if not result.ok:
+        payload = _attendance_payload(KIND_QR, result)
         return render(request, "qr_confirm_result.html", {
             "success": False,
-            "message": "คุณยังไม่ได้สมัครกิจกรรมนี้",
-            "help": "กรุณาสมัครกิจกรรมก่อนจึงจะสามารถยืนยันได้",
-            "activity": activity
+            "message": payload["message"],
+            "help": payload["help"],
+            "activity": result.activity,
         })
 
-    # Use atomic transaction and get_or_create to prevent duplicates
-    from django.db import transaction, IntegrityError
-    earned_hours = float(activity.hours_reward)
-
-    try:
-        with transaction.atomic():
-            scan, created = QRScan.objects.get_or_create(
-                activity=activity, 
-                user=request.user, 
-                defaults={
-                    'token': token,
-                    'ip_address': request.META.get('REMOTE_ADDR'),
-                    'user_agent': request.META.get('HTTP_USER_AGENT', '')[:512],
-                }
-            )
-            if not created:
-                return render(request, "qr_confirm_result.html", {
-                    "success": False,
-                    "message": f"คุณยืนยันชั่วโมงกิจกรรมนี้แล้ว ได้ {activity.hours_reward} ชั่วโมง",
-                    "help": "หากเกิดข้อผิดพลาด กรุณาติดต่อผู้ดูแล",
-                    "activity": activity
-                })
-
-            # mark signup as attended
-            ActivitySignup.objects.filter(activity=activity, user=request.user).update(status='attended')
-    except IntegrityError:
-        return render(request, "qr_confirm_result.html", {
-            "success": False,
-            "message": "เกิดข้อผิดพลาดในการบันทึก ลองอีกครั้ง",
-            "help": "หากปัญหายังคงเกิดขึ้น โปรดติดต่อผู้ดูแลระบบ"
-        })
-
-    notify_user(
-        request.user,
-        title="ยืนยันชั่วโมงกิจกรรมสำเร็จ",
-        message=f"คุณได้รับ {earned_hours:.1f} ชั่วโมงจากกิจกรรม “{activity.title}”",
-        category="hours",
-        target_url=request.build_absolute_uri(reverse("volunteer_app:profile")),
-    )
-
+    earned_hours = float(result.activity.hours_reward)
     return render(request, "qr_confirm_result.html", {
         "success": True,
         "message": f"ยืนยันสำเร็จ! คุณได้รับ {earned_hours} ชั่วโมงจิตอาสา",
-        "activity": activity,
+        "activity": result.activity,
         "hours_reward": earned_hours
     })
 
 
+def short_token(request, token):
+    """Short QR target /t/<token>/ for compact tokens; dispatches on the token kind."""
+    kind = decode_token(token).kind
+    if kind == KIND_CHECKIN:
+        return check_in(request, token=token)
+    if kind == KIND_CHECKOUT:
+        return check_out(request, token=token)
+    return qr_confirm(request, token)
+
+
 # ------------------ Check-in / Check-out ------------------
 @login_required
-def check_in(request):
+@rate_limit("scan")
+def check_in(request, token=None):
     """Check-in endpoint for activity attendance tracking."""
-    # Support both POST and GET (for direct URL access)
-    token = request.POST.get("token") or request.POST.get("qr_token") or request.GET.get("token") or request.body.decode("utf-8")
+    # Support both POST and GET (for direct URL access) and the short /t/<token>/ path
+    token = token or request.POST.get("token") or request.POST.get("qr_token") or request.GET.get("token") or request.body.decode("utf-8")
     if not token:
         return JsonResponse({
             "ok": False,
@@ -858,93 +784,15 @@ def check_in(request):
             "help": "กรุณาลองสแกน QR code ใหม่ (QR code มีอายุ 5 นาที)"
         })
     
-    try:
-        activity = Activity.objects.get(pk=activity_id)
-    except Activity.DoesNotExist:
-        return JsonResponse({
-            "ok": False,
-            "code": "activity_not_found",
-            "message": "ไม่พบกิจกรรมนี้ในระบบ",
-            "help": "กรุณาติดต่อผู้ดูแลระบบ"
-        })
-    
-    # Check if activity is cancelled
-    if activity.status == "cancelled":
-        return JsonResponse({
-            "ok": False,
-            "code": "activity_cancelled",
-            "message": "กิจกรรมนี้ถูกยกเลิกแล้ว",
-            "help": "ไม่สามารถ check-in สำหรับกิจกรรมที่ถูกยกเลิกได้"
-        })
-    
-    # Require signup existence
-    if not ActivitySignup.objects.filter(activity=activity, user=request.user).exists():
-        return JsonResponse({
-            "ok": False,
-            "code": "not_signed_up",
-            "message": "คุณยังไม่ได้สมัครกิจกรรมนี้",
-            "help": "กรุณาสมัครกิจกรรมก่อนจึงจะสามารถ check-in ได้",
-            "activity": get_activity_details(activity)
-        })
-    
-    # Atomic create check-in record (idempotent - 1 check-in per user per activity)
-    from django.db import transaction, IntegrityError
-    
-    try:
-        with transaction.atomic():
-            checkin, created = CheckInOut.objects.get_or_create(
-                activity=activity,
-                user=request.user,
-                check_type="checkin",
-                defaults={
-                    'token': token,
-                    'ip_address': request.META.get('REMOTE_ADDR'),
-                    'user_agent': request.META.get('HTTP_USER_AGENT', '')[:512],
-                    'device_id': request.POST.get('device_id') or request.headers.get('X-Device-Id'),
-                }
-            )
-            
-            if not created:
-                return JsonResponse({
-                    "ok": False,
-                    "code": "already_checked_in",
-                    "message": f"คุณได้ check-in กิจกรรมนี้แล้วเมื่อ {checkin.checked_at.strftime('%d/%m/%Y %H:%M')}",
-                    "help": "หากต้องการ check-out กรุณาใช้ QR code สำหรับ check-out",
-                    "activity": get_activity_details(activity),
-                    "checked_in_at": checkin.checked_at.isoformat()
-                })
-            
-            # Send notification
-            notify_user(
-                request.user,
-                title="Check-in สำเร็จ",
-                message=f"คุณได้ check-in เข้ากิจกรรม \"{activity.title}\" แล้ว",
-                category="activity",
-                target_url=request.build_absolute_uri(reverse("volunteer_app:activity_detail", args=[activity.pk])),
-            )
-            
-            return JsonResponse({
-                "ok": True,
-                "code": "checkin_success",
-                "message": "Check-in สำเร็จ!",
-                "activity": get_activity_details(activity),
-                "checked_in_at": checkin.checked_at.isoformat()
-            })
-            
-    except IntegrityError:
-        return JsonResponse({
-            "ok": False,
-            "code": "database_error",
-            "message": "เกิดข้อผิดพลาดในการบันทึก ลองอีกครั้ง",
-            "help": "หากปัญหายังคงเกิดขึ้น โปรดติดต่อผู้ดูแลระบบ"
-        }, status=500)
+    return _record_scan(request, KIND_CHECKIN, activity_id, token)
 
 
 @login_required
-def check_out(request):
+@rate_limit("scan")
+def check_out(request, token=None):
     """Check-out endpoint for activity attendance tracking and hours calculation."""
-    # Support both POST and GET (for direct URL access)
-    token = request.POST.get("token") or request.POST.get("qr_token") or request.GET.get("token") or request.body.decode("utf-8")
+    # Support both POST and GET (for direct URL access) and the short /t/<token>/ path
+    token = token or request.POST.get("token") or request.POST.get("qr_token") or request.GET.get("token") or request.body.decode("utf-8")
     if not token:
         return JsonResponse({
             "ok": False,
@@ -962,128 +810,7 @@ def check_out(request):
             "help": "กรุณาลองสแกน QR code ใหม่ (QR code มีอายุ 5 นาที)"
         })
     
-    try:
-        activity = Activity.objects.get(pk=activity_id)
-    except Activity.DoesNotExist:
-        return JsonResponse({
-            "ok": False,
-            "code": "activity_not_found",
-            "message": "ไม่พบกิจกรรมนี้ในระบบ",
-            "help": "กรุณาติดต่อผู้ดูแลระบบ"
-        })
-    
-    # Check if activity is cancelled
-    if activity.status == "cancelled":
-        return JsonResponse({
-            "ok": False,
-            "code": "activity_cancelled",
-            "message": "กิจกรรมนี้ถูกยกเลิกแล้ว",
-            "help": "ไม่สามารถ check-out สำหรับกิจกรรมที่ถูกยกเลิกได้"
-        })
-    
-    # Require signup existence
-    if not ActivitySignup.objects.filter(activity=activity, user=request.user).exists():
-        return JsonResponse({
-            "ok": False,
-            "code": "not_signed_up",
-            "message": "คุณยังไม่ได้สมัครกิจกรรมนี้",
-            "help": "กรุณาสมัครกิจกรรมก่อนจึงจะสามารถ check-out ได้",
-            "activity": get_activity_details(activity)
-        })
-    
-    # Check if user has checked in
-    checkin_record = CheckInOut.objects.filter(
-        activity=activity,
-        user=request.user,
-        check_type="checkin"
-    ).first()
-    
-    if not checkin_record:
-        return JsonResponse({
-            "ok": False,
-            "code": "not_checked_in",
-            "message": "คุณยังไม่ได้ check-in กิจกรรมนี้",
-            "help": "กรุณา check-in ก่อนจึงจะสามารถ check-out ได้",
-            "activity": get_activity_details(activity)
-        })
-    
-    # Atomic create check-out record and calculate hours
-    from django.db import transaction, IntegrityError
-    from datetime import timedelta
-    
-    try:
-        with transaction.atomic():
-            checkout, created = CheckInOut.objects.get_or_create(
-                activity=activity,
-                user=request.user,
-                check_type="checkout",
-                defaults={
-                    'token': token,
-                    'ip_address': request.META.get('REMOTE_ADDR'),
-                    'user_agent': request.META.get('HTTP_USER_AGENT', '')[:512],
-                    'device_id': request.POST.get('device_id') or request.headers.get('X-Device-Id'),
-                }
-            )
-            
-            if not created:
-                # Already checked out - return existing record
-                calculated_hours = float(checkout.calculated_hours) if checkout.calculated_hours else float(activity.hours_reward)
-                return JsonResponse({
-                    "ok": False,
-                    "code": "already_checked_out",
-                    "message": f"คุณได้ check-out กิจกรรมนี้แล้วเมื่อ {checkout.checked_at.strftime('%d/%m/%Y %H:%M')}",
-                    "help": "คุณได้รับชั่วโมงจิตอาสาแล้ว",
-                    "activity": get_activity_details(activity),
-                    "checked_out_at": checkout.checked_at.isoformat(),
-                    "calculated_hours": calculated_hours
-                })
-            
-            # Calculate hours from actual time difference
-            time_diff = checkout.checked_at - checkin_record.checked_at
-            hours_worked = time_diff.total_seconds() / 3600.0  # Convert to hours
-            
-            # Use calculated hours if reasonable (at least 0.1 hours = 6 minutes)
-            # Otherwise fallback to activity.hours_reward
-            if hours_worked >= 0.1:
-                calculated_hours = round(hours_worked, 2)
-            else:
-                # Fallback to activity default hours
-                calculated_hours = float(activity.hours_reward)
-            
-            # Update checkout record with calculated hours
-            checkout.calculated_hours = calculated_hours
-            checkout.save(update_fields=['calculated_hours'])
-            
-            # Mark signup as attended
-            ActivitySignup.objects.filter(activity=activity, user=request.user).update(status='attended')
-            
-            # Send notification
-            notify_user(
-                request.user,
-                title="Check-out สำเร็จ",
-                message=f"คุณได้ check-out จากกิจกรรม \"{activity.title}\" แล้ว ได้รับ {calculated_hours:.2f} ชั่วโมงจิตอาสา",
-                category="hours",
-                target_url=request.build_absolute_uri(reverse("volunteer_app:profile")),
-            )
-            
-            return JsonResponse({
-                "ok": True,
-                "code": "checkout_success",
-                "message": f"Check-out สำเร็จ! คุณได้รับ {calculated_hours:.2f} ชั่วโมงจิตอาสา",
-                "activity": get_activity_details(activity),
-                "checked_in_at": checkin_record.checked_at.isoformat(),
-                "checked_out_at": checkout.checked_at.isoformat(),
-                "calculated_hours": calculated_hours,
-                "time_worked_minutes": int(time_diff.total_seconds() / 60)
-            })
-            
-    except IntegrityError:
-        return JsonResponse({
-            "ok": False,
-            "code": "database_error",
-            "message": "เกิดข้อผิดพลาดในการบันทึก ลองอีกครั้ง",
-            "help": "หากปัญหายังคงเกิดขึ้น โปรดติดต่อผู้ดูแลระบบ"
-        }, status=500)
+    return _record_scan(request, KIND_CHECKOUT, activity_id, token)
 
 
 # ------------------ Idea & Vote ------------------
@@ -1173,11 +900,38 @@ def vote_idea(request, pk):
 # ------------------ Notifications ------------------
 @login_required
 def notification_list(request):
-    notifications = request.user.notifications.all()
-    unread_count = notifications.filter(is_read=False).count()
+    unread_only = request.GET.get("unread") == "1"
+    notifications, next_cursor = notification_page(request.user, request.GET.get("cursor"), unread_only=unread_only)
     return render(request, "notifications.html", {
         "notifications": notifications,
-        "unread_count": unread_count,
+        "unread_count": unread_counter.get(request.user),
+        "unread_only": unread_only,
+        "next_cursor": next_cursor,
+    })
+
+
+@login_required
+def notification_list_api(request):
+    """หน้าถัดไปของกล่องแจ้งเตือนเป็น JSON สำหรับ infinite scroll"""
+    unread_only = request.GET.get("unread") == "1"
+    notifications, next_cursor = notification_page(request.user, request.GET.get("cursor"), unread_only=unread_only)
+    return JsonResponse({
+        "ok": True,
+        "notifications": [
+            {
+                "id": n.pk,
+                "title": n.title,
+                "message": n.message,
+                "category": n.category,
+                "category_display": n.get_category_display(),
+                "target_url": n.target_url,
+                "is_read": n.is_read,
+                "created_at": n.created_at.isoformat(),
+            }
+            for n in notifications
+        ],
+        "next_cursor": next_cursor,
+        "html": render_to_string("notification_items.html", {"notifications": notifications}, request=request),
     })
 
 
@@ -1315,6 +1069,7 @@ def join_group(request, pk):
 
 # ------------------ Chatbot ------------------
 @require_POST
+@rate_limit("chatbot")
 def chatbot_api(request):
     q = request.POST.get("q", "").strip().lower()
     
@@ -1434,34 +1189,34 @@ def admin_login(request):
     })
 
 
+def _leaderboard_filters(request):
+    """Read optional leaderboard filters (faculty, department, year, date range) from GET."""
+    from datetime import date
+
+    filters = {
+        "faculty": request.GET.get("faculty", "").strip() or None,
+        "department": request.GET.get("department", "").strip() or None,
+        "year": None,
+        "date_from": None,
+        "date_to": None,
+    }
+    year = request.GET.get("year", "").strip()
+    if year.isdigit():
+        filters["year"] = int(year)
+    for name in ("date_from", "date_to"):
+        try:
+            filters[name] = date.fromisoformat(request.GET.get(name, ""))
+        except ValueError:
+            pass
+    return filters
+
+
 @login_required(login_url="/admin/login/")
 @user_passes_test(is_admin, login_url="/admin/login/")
 def admin_dashboard(request):
-    from datetime import timedelta
-    
-    total_users = User.objects.count()
-    # Calculate total hours from QR scans (actual volunteer hours)
-    total_hours = sum(scan.activity.hours_reward for scan in QRScan.objects.select_related('activity').all())
-    total_signups = ActivitySignup.objects.count()
-    total_qr_scans = QRScan.objects.count()
-    total_activities = Activity.objects.count()
-    pending_ideas = IdeaProposal.objects.filter(status="pending").count()
-    
-    # Activity statistics by status
-    activities_upcoming = Activity.objects.filter(status="upcoming").count()
-    activities_ongoing = Activity.objects.filter(status="ongoing").count()
-    activities_completed = Activity.objects.filter(status="completed").count()
-    
-    # Time-based statistics
-    today = timezone.now().date()
-    week_ago = today - timedelta(days=7)
-    month_ago = today - timedelta(days=30)
-    
-    new_users_today = User.objects.filter(date_joined__date=today).count()
-    new_users_week = User.objects.filter(date_joined__date__gte=week_ago).count()
-    qr_scans_today = QRScan.objects.filter(scanned_at__date=today).count()
-    qr_scans_week = QRScan.objects.filter(scanned_at__date__gte=week_ago).count()
-    
+    # Headline counters come from a cached snapshot invalidated by model signals
+    stats = DashboardSnapshot.get()
+
     # Recent items
     recent_activities = Activity.objects.order_by('-created_at')[:5]
     upcoming_activities = Activity.objects.filter(status="upcoming", datetime__gte=timezone.now()).order_by('datetime')[:5]
@@ -1469,33 +1224,11 @@ def admin_dashboard(request):
     pending_ideas_list = IdeaProposal.objects.filter(status='pending').order_by('-created_at')[:5]
     recent_qr_scans = QRScan.objects.select_related('user', 'activity').order_by('-scanned_at')[:20]
     
-    # User hours summary - top users by volunteer hours
-    users_with_hours = []
-    for user in User.objects.all():
-        hours = user.total_hours()
-        if hours > 0:
-            users_with_hours.append({
-                'user': user,
-                'total_hours': hours,
-                'scan_count': user.qr_scans.count()
-            })
-    users_with_hours.sort(key=lambda x: x['total_hours'], reverse=True)
-    top_users = users_with_hours[:10]  # Top 10 users
+    # User hours summary - top users by volunteer hours (aggregated by the database, cached)
+    top_users = top_volunteers(limit=10, **_leaderboard_filters(request))
 
     return render(request, "admin_dashboard.html", {
-        "total_users": total_users,
-        "total_hours": total_hours,
-        "total_signups": total_signups,
-        "total_qr_scans": total_qr_scans,
-        "total_activities": total_activities,
-        "pending_ideas": pending_ideas,
-        "activities_upcoming": activities_upcoming,
-        "activities_ongoing": activities_ongoing,
-        "activities_completed": activities_completed,
-        "new_users_today": new_users_today,
-        "new_users_week": new_users_week,
-        "qr_scans_today": qr_scans_today,
-        "qr_scans_week": qr_scans_week,
+        **stats,
         "recent_activities": recent_activities,
         "upcoming_activities": upcoming_activities,
         "recent_users": recent_users,
@@ -1506,6 +1239,33 @@ def admin_dashboard(request):
     })
 
 
+@login_required(login_url="/admin/login/")
+@user_passes_test(is_admin, login_url="/admin/login/")
+def admin_stats_api(request):
+    """สถิติรายสัปดาห์/เดือน/ภาคเรียน สำหรับกราฟ (อ่านจากตาราง rollup รายวัน วันที่ยังไม่ได้ rollup นับสด)"""
+    period = request.GET.get("period", "week")
+    try:
+        start, end = reporting_service.period_bounds(period)
+    except ValueError:
+        return JsonResponse({"ok": False, "message": "period ต้องเป็น week, month หรือ semester"}, status=400)
+
+    faculty = request.GET.get("faculty", "").strip() or None
+    totals = reporting_service.period_stats(start, end, faculty=faculty)
+    series = reporting_service.daily_series(start, end, faculty=faculty)
+    return JsonResponse({
+        "ok": True,
+        "period": period,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "totals": {**totals, "hours_earned": float(totals["hours_earned"])},
+        "series": [
+            {**row, "day": row["day"].isoformat(), "hours_earned": float(row["hours_earned"] or 0)}
+            for row in series
+        ],
+        "rate_limited": rejection_counts(),
+    })
+
+
 @login_required(login_url="/admin/login/")
 @user_passes_test(is_admin, login_url="/admin/login/")
 def admin_manage_activities(request):
@@ -1524,11 +1284,13 @@ def admin_edit_activity(request, pk):
     activity = get_object_or_404(Activity, pk=pk)
     
     if request.method == "POST":
+        announced = (activity.status, activity.location)
         activity.title = request.POST.get("title", activity.title)
         activity.description = request.POST.get("description", activity.description)
         activity.category = request.POST.get("category", activity.category)
         activity.status = request.POST.get("status", activity.status)
         activity.location = request.POST.get("location", activity.location)
+        old_capacity = activity.capacity
         activity.capacity = int(request.POST.get("capacity", activity.capacity))
         activity.hours_reward = float(request.POST.get("hours_reward", activity.hours_reward))
         
@@ -1536,6 +1298,19 @@ def admin_edit_activity(request, pk):
             activity.image = request.FILES["image"]
         
         activity.save()
+        if activity.capacity > old_capacity:
+            promote_waitlist(activity.pk)
+        if (activity.status, activity.location) != announced:
+            notify_users(
+                User.objects.filter(
+                    signups__activity=activity, signups__status__in=("requested", "confirmed", "waitlist")
+                ),
+                title="กิจกรรมมีการเปลี่ยนแปลง",
+                message=f"กิจกรรม “{activity.title}” มีการเปลี่ยนแปลง: สถานะ {activity.get_status_display()} สถานที่ {activity.location}",
+                category="activity",
+                target_url=request.build_absolute_uri(reverse("volunteer_app:activity_detail", args=[activity.pk])),
+                channel="both",
+            )
         return redirect("volunteer_app:admin_manage_activities")
     
     return render(request, "admin_edit_activity.html", {
@@ -1691,6 +1466,33 @@ def admin_delete_qr_scan(request, pk):
     return redirect("volunteer_app:admin_dashboard")
 
 
+@login_required(login_url="/admin/login/")
+@user_passes_test(is_admin, login_url="/admin/login/")
+@require_POST
+def admin_qr_batch_upload(request):
+    """นำเข้ารูป QR หลายรูป (หรือไฟล์ zip) พร้อมกัน ชื่อไฟล์คือรหัสนักศึกษาหรือ username"""
+    files = [(f.name, f.read()) for f in request.FILES.getlist("files")]
+    if not files:
+        return JsonResponse({"ok": False, "code": "no_files", "message": "กรุณาเลือกรูปภาพหรือไฟล์ zip"}, status=400)
+    try:
+        reports = batch_ingest.ingest_qr_images(files, allow_expired=request.POST.get("allow_expired") == "1")
+    except zipfile.BadZipFile:
+        return JsonResponse({"ok": False, "code": "bad_zip", "message": "ไฟล์ zip เสียหายหรืออ่านไม่ได้"}, status=400)
+    except batch_ingest.BatchTooLarge:
+        return JsonResponse({
+            "ok": False,
+            "code": "batch_too_large",
+            "message": f"นำเข้าได้ครั้งละไม่เกิน {batch_ingest.MAX_BATCH_IMAGES} รูป "
+                       f"และไม่เกิน {batch_ingest.MAX_BATCH_BYTES // (1024 * 1024)} MB กรุณาแบ่งไฟล์",
+        }, status=400)
+    return JsonResponse({
+        "ok": True,
+        "recorded": sum(1 for r in reports if r["code"] == "recorded"),
+        "failed": sum(1 for r in reports if not r["ok"]),
+        "files": reports,
+    })
+
+
 @login_required(login_url="/admin/login/")
 @user_passes_test(is_admin, login_url="/admin/login/")
 def admin_add_volunteer_hours(request):
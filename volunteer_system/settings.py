@@ -63,6 +63,41 @@ SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 # Secret for signing QR tokens (can be overridden via env)
 QR_SECRET = os.environ.get("QR_SECRET", SECRET_KEY)
 
+# ให้วันหมดอายุของ token ตรงกับช่วงเวลาคงที่ (เช่น ทุก 5 นาที) ทุกคนในช่วงเดียวกันจึงได้ token
+# และรูป QR เดียวกัน; QR_TOKEN_GRACE คือเวลาที่ token เก่ายังใช้ได้หลังเปลี่ยนช่วง (วินาที)
+QR_TOKEN_ALIGNED = os.environ.get("QR_TOKEN_ALIGNED", "True").lower() == "true"
+QR_TOKEN_GRACE = int(os.environ.get("QR_TOKEN_GRACE", "60"))
+# รูปแบบ token ที่ออกใหม่: 2 = base32 สั้น (/t/<token>/) ทำให้ QR โปร่งกว่า, 1 = แบบเดิม
+# การตรวจสอบรับได้ทั้งสองแบบ QR ที่พิมพ์ไปแล้วจึงยังใช้ได้
+QR_TOKEN_VERSION = int(os.environ.get("QR_TOKEN_VERSION", "2"))
+
+# รูปที่อัปโหลดเพื่ออ่าน QR จะถูกย่อให้ด้านยาวไม่เกินค่านี้ (พิกเซล) ก่อนถอดรหัส
+QR_DECODE_MAX_SIDE = int(os.environ.get("QR_DECODE_MAX_SIDE", "1600"))
+
+# อ่าน QR จากรูปใน pool แยกจาก request worker (ส่ง async=1 หรือเปิด QR_UPLOAD_ASYNC)
+# QR_DECODE_EXECUTOR: "process" หรือ "thread"; เมื่อคิวเต็มจะตอบ 429 พร้อม Retry-After
+# หลาย process ต้องใช้ CACHES ร่วมกัน (เช่น Redis) เพราะสถานะงานเก็บใน cache
+QR_UPLOAD_ASYNC = os.environ.get("QR_UPLOAD_ASYNC", "False").lower() == "true"
+QR_DECODE_EXECUTOR = os.environ.get("QR_DECODE_EXECUTOR", "process")
+QR_DECODE_WORKERS = int(os.environ.get("QR_DECODE_WORKERS", "0")) or None
+QR_DECODE_QUEUE_SIZE = int(os.environ.get("QR_DECODE_QUEUE_SIZE", "32"))
+QR_DECODE_JOB_TTL = int(os.environ.get("QR_DECODE_JOB_TTL", "600"))
+QR_DECODE_RETRY_AFTER = int(os.environ.get("QR_DECODE_RETRY_AFTER", "5"))
+
+# จำกัดอัตราคำขอแบบ token bucket ต่อผู้ใช้และต่อ IP ("จำนวน/s|m|h") เกินแล้วตอบ 429 พร้อม Retry-After
+# งบต่อ IP ต้องเผื่อนักศึกษาหลายร้อยคนที่ใช้ Wi-Fi เดียวกันในงาน; อัปโหลดรูปใช้ CPU มากจึงเข้มกว่า
+# หลัง reverse proxy ให้ตั้ง RATE_LIMIT_IP_META=HTTP_X_FORWARDED_FOR
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "True").lower() == "true"
+RATE_LIMIT_IP_META = os.environ.get("RATE_LIMIT_IP_META", "REMOTE_ADDR")
+RATE_LIMITS = {
+    "scan": {"user": "30/m", "ip": "1200/m"},
+    "upload": {"user": "6/m", "ip": "120/m"},
+    "chatbot": {"user": "20/m", "ip": "60/m"},
+}
+
+# อายุ token ของหน้า kiosk (วินาที) ใช้ได้ตลอดทั้งงานแม้เครื่องจะออฟไลน์
+KIOSK_TOKEN_TTL = int(os.environ.get("KIOSK_TOKEN_TTL", str(12 * 3600)))
+
 
 # ------------------------
 # INSTALLED APPS
@@ -152,6 +187,47 @@ DATABASES = {
 }
 
 
+# ------------------------
+# CACHE
+# ------------------------
+# ค่าเริ่มต้นใช้ cache ในหน่วยความจำ (ต่อ process) ถ้ารันหลาย worker ควรตั้ง CACHE_BACKEND/CACHE_LOCATION
+# ให้ใช้ cache ร่วมกัน เช่น redis หรือ memcached
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "volunteer-system"),
+    }
+}
+if CACHES["default"]["BACKEND"].endswith("LocMemCache"):
+    # จำกัดจำนวน key ใน cache หน่วยความจำ (ค่าเริ่มต้นของ Django คือ 300)
+    CACHES["default"]["OPTIONS"] = {"MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", "5000"))}
+
+# คำตอบ "สแกนซ้ำ" ของ (กิจกรรม, ผู้ใช้, ชนิด) ที่บันทึกแล้ว ตอบได้โดยไม่ต้องถามฐานข้อมูล
+# การลบ scan จะล้าง key นี้ หลาย process จึงต้องใช้ cache ร่วมกัน (เช่น Redis)
+CACHES["recent_scans"] = {
+    "BACKEND": CACHES["default"]["BACKEND"],
+    "LOCATION": CACHES["default"]["LOCATION"],
+    "KEY_PREFIX": "recent-scan",
+    "TIMEOUT": int(os.environ.get("RECENT_SCAN_TTL", "600")),
+}
+if CACHES["recent_scans"]["BACKEND"].endswith("LocMemCache"):
+    CACHES["recent_scans"]["LOCATION"] += "-recent-scans"
+    CACHES["recent_scans"]["OPTIONS"] = {"MAX_ENTRIES": int(os.environ.get("RECENT_SCAN_CACHE_SIZE", "10000"))}
+
+# อายุ cache ของ leaderboard ผู้ทำชั่วโมงสูงสุด (วินาที)
+LEADERBOARD_CACHE_TTL = int(os.environ.get("LEADERBOARD_CACHE_TTL", "300"))
+
+# อายุสูงสุดของสถิติหน้า dashboard (วินาที) ปกติจะถูกล้างด้วย signal เมื่อข้อมูลเปลี่ยน
+DASHBOARD_SNAPSHOT_TTL = int(os.environ.get("DASHBOARD_SNAPSHOT_TTL", "600"))
+
+# รูป QR ที่ render แล้ว: จำนวนรูปใน LRU ต่อ process และอายุใน CACHES (วินาที)
+QR_RENDER_CACHE_SIZE = int(os.environ.get("QR_RENDER_CACHE_SIZE", "256"))
+QR_RENDER_CACHE_TTL = int(os.environ.get("QR_RENDER_CACHE_TTL", "900"))
+
+# เดือนที่เริ่มภาคเรียน ใช้คำนวณสถิติรายภาคเรียน (ภาคต้น มิ.ย., ภาคปลาย พ.ย.)
+SEMESTER_START_MONTHS = (6, 11)
+
+
 # ------------------------
 # PASSWORD VALIDATION
 # ------------------------
@@ -216,6 +292,17 @@ EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS", "True").lower() == "true"
 EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
 DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "noreply@ubu.ac.th")
+# จำนวนผู้รับต่อ batch เมื่อแจ้งเตือนหลายคนพร้อมกัน (notify_users)
+NOTIFY_BATCH_SIZE = int(os.environ.get("NOTIFY_BATCH_SIZE", "500"))
+# อายุ cache ของจำนวนแจ้งเตือนที่ยังไม่อ่าน (วินาที) หมดอายุแล้วนับใหม่จากฐานข้อมูล
+UNREAD_COUNT_TTL = int(os.environ.get("UNREAD_COUNT_TTL", "3600"))
+# จำนวนแจ้งเตือนต่อหน้าในกล่องแจ้งเตือน (keyset pagination)
+NOTIFICATION_PAGE_SIZE = int(os.environ.get("NOTIFICATION_PAGE_SIZE", "20"))
+# อีเมลแจ้งเตือนเข้าคิว EmailOutbox แล้วส่งโดย `manage.py deliver_emails --loop`
+# ส่งไม่สำเร็จจะลองใหม่หลัง RETRY_DELAY * 2^(ครั้งที่ล้มเหลว - 1) วินาที (60, 120, 240, ...) จนครบ MAX_ATTEMPTS ครั้ง
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("EMAIL_OUTBOX_MAX_ATTEMPTS", "5"))
+EMAIL_OUTBOX_RETRY_DELAY = int(os.environ.get("EMAIL_OUTBOX_RETRY_DELAY", "60"))
+EMAIL_OUTBOX_LEASE = int(os.environ.get("EMAIL_OUTBOX_LEASE", "300"))
 
 
 # ------------------------